@@ -0,0 +1,83 @@
+import importlib
+from typing import Any, Dict, List
+from tree_sitter import Parser, Language
+from .language import NODE_TYPES
+
+class UniversalParser:
+    def __init__(self):
+        self.parsers = {}
+
+    def get_language(self, language_name: str):
+        """Dynamically load the tree-sitter language module."""
+        # Special case for TypeScript/TSX which share a package
+        if language_name in ["typescript", "tsx"]:
+            try:
+                module = importlib.import_module("tree_sitter_typescript")
+                func_name = "language_typescript" if language_name == "typescript" else "language_tsx"
+                return Language(getattr(module, func_name)())
+            except Exception as e:
+                raise ValueError(f"Could not load tree_sitter_typescript: {e}")
+
+        module_name = f"tree_sitter_{language_name}"
+        try:
+            module = importlib.import_module(module_name)
+            if hasattr(module, "language"):
+                return Language(module.language())
+            raise AttributeError(f"Module {module_name} has no 'language()' function.")
+        except Exception as e:
+            raise ValueError(f"Could not load tree-sitter language for {language_name}: {e}")
+
+
+    def get_parser(self, language_name: str):
+        if language_name not in self.parsers:
+            lang = self.get_language(language_name)
+            self.parsers[language_name] = Parser(lang)
+        return self.parsers[language_name]
+
+    def parse(self, content: str, language_name: str):
+        """Parses content and returns (tree, source bytes)."""
+        source = content.encode("utf8")
+        return self.get_parser(language_name).parse(source), source
+
+    def extract_symbols(self, content: str, language_name: str) -> List[Dict[str, Any]]:
+        """
+        Lists every class/function definition (see NODE_TYPES) with its name, kind,
+        1-based start line and byte range, in source order. Nested definitions are included.
+        """
+        mapping = NODE_TYPES.get(language_name, {})
+        tree, _ = self.parse(content, language_name)
+        symbols = []
+        cursor = tree.walk()
+        while True:
+            node = cursor.node
+            if node.type in mapping:
+                symbols.append({
+                    "name": self._extract_name(node),
+                    "kind": mapping[node.type],
+                    "line": node.start_point[0] + 1,
+                    "start_byte": node.start_byte,
+                    "end_byte": node.end_byte
+                })
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return symbols
+
+    def _extract_name(self, node):
+        """Finds the most logical identifier for a definition node."""
+        # Generic name-holding child types across many grammars
+        name_types = {"identifier", "type_identifier", "field_identifier", "property_identifier", "constant", "name"}
+        
+        # 1. Look for direct children first (standard case)
+        for child in node.children:
+            if child.type in name_types:
+                return child.text.decode("utf8")
+        
+        # 2. Look one level deeper (for Go type_spec or C++ complex declarators)
+        for child in node.children:
+            for grandchild in child.children:
+                if grandchild.type in name_types:
+                    return grandchild.text.decode("utf8")
+                    
+        return "unknown"
@@ -0,0 +1,91 @@
+import json
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from .code_parser.language import language_for_file
+from .git_operations.base_ops import BaseOps
+from .symbol_index import symbol_index
+from .state import state_manager
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class DefinitionIndex:
+    """
+    Repo-wide map from symbol name to where it is defined, for one tree.
+
+    Built lazily on the first find_definition of a tree and stored as `defs:{repo}:{tree}`.
+    It is assembled from the per-blob symbol index, so a new commit only parses
+    the blobs it actually changed; every other file is reused from the previous build.
+    """
+    @staticmethod
+    def _key(repo_id: str, tree_key: str) -> str:
+        return f"defs:{repo_id}:{tree_key}"
+
+    async def find_definition(self, scm: BaseOps, repo_id: str, ref: str, symbol: str) -> str:
+        """
+        Returns the source of up to DEFINITION_MAX_RESULTS definitions of `symbol`,
+        each with its file and line, in a single tool hop.
+        """
+        if not symbol:
+            return "find_definition requires a 'symbol' argument."
+        # One file past the cap tells _build the tree was cut short
+        tree_key, files = await scm.list_tree(
+            repo_id, ref, path_filter=language_for_file, max_files=settings.DEFINITION_INDEX_MAX_FILES + 1
+        )
+        key = self._key(repo_id, tree_key)
+        if not await state_manager.redis.exists(key):
+            await self._build(scm, repo_id, ref, key, files)
+
+        raw = await state_manager.redis.hget(key, symbol)
+        if not raw:
+            return f"No definition of '{symbol}' found in {repo_id}@{ref}."
+
+        definitions = json.loads(raw)
+        sections = []
+        for definition in definitions[:settings.DEFINITION_MAX_RESULTS]:
+            content = await scm.get_file_content(repo_id, definition["path"], ref)
+            source = await symbol_index.get_symbol_source(content, definition["path"], symbol)
+            sections.append(f"{definition['path']} (Line {definition['line']}, {definition['kind']}):\n{source}")
+        if len(definitions) > settings.DEFINITION_MAX_RESULTS:
+            others = ", ".join(f"{d['path']}:{d['line']}" for d in definitions[settings.DEFINITION_MAX_RESULTS:])
+            sections.append(f"Other definitions: {others}")
+        return "\n\n".join(sections)
+
+    async def _build(self, scm: BaseOps, repo_id: str, ref: str, key: str, files: List[Dict[str, str]]):
+        if len(files) > settings.DEFINITION_INDEX_MAX_FILES:
+            logger.warning(f"{repo_id}@{ref} has more than {settings.DEFINITION_INDEX_MAX_FILES} source files, indexing the first of them")
+            files = files[:settings.DEFINITION_INDEX_MAX_FILES]
+
+        # Only blobs never seen before are fetched and parsed
+        indexed = await symbol_index.indexed_blobs([f["sha"] for f in files])
+        missing = [f for f in files if f["sha"] not in indexed]
+        logger.info(f"Building definition index for {repo_id}@{ref}: {len(files)} files, {len(missing)} new blobs")
+
+        limit = asyncio.Semaphore(settings.DEFINITION_INDEX_CONCURRENCY)
+
+        async def index_file(file: Dict[str, str]):
+            async with limit:
+                try:
+                    content = await scm.get_file_content(repo_id, file["path"], ref)
+                    await symbol_index.index_blob(content, file["path"], blob_sha=file["sha"])
+                except Exception as e:
+                    logger.warning(f"Could not index {file['path']}: {e}")
+
+        await asyncio.gather(*[index_file(f) for f in missing])
+
+        symbols = await symbol_index.get_many([f["sha"] for f in files])
+        definitions: Dict[str, List[Dict]] = {}
+        for file in files:
+            for name, entries in symbols.get(file["sha"], {}).items():
+                definitions.setdefault(name, []).extend(
+                    {"path": file["path"], "line": entry["line"], "kind": entry["kind"]} for entry in entries
+                )
+
+        pipe = state_manager.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping={"": "1", **{name: json.dumps(defs) for name, defs in definitions.items()}})
+        pipe.expire(key, settings.DEFINITION_INDEX_TTL)
+        await pipe.execute()
+
+definition_index = DefinitionIndex()
@@ -1,19 +1,68 @@
+import logging
 from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .blob_cache import blob_cache
+
+logger = logging.getLogger(__name__)
 
 class BaseOps(ABC):
     def __init__(self):
         pass
 
     @abstractmethod
-    def post_pr_comment(self, repo_id: str, pr_id: int, commit_sha: str, file: str, line: int, body: str) -> bool:
+    async def post_pr_comment(self, repo_id: str, pr_id: int, commit_sha: str, file: str, line: int, body: str) -> bool:
         """
         Post a comment on a specific line of a Pull Request / Merge Request.
         """
         raise NotImplementedError
 
+    async def post_review(self, repo_id: str, pr_id: int, commit_sha: str, comments: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Post many inline comments ({"file", "line", "body"}) as one review.
+        Returns whether each comment was posted. Providers with a review API override
+        this; the default posts the comments one by one.
+        """
+        results = []
+        for comment in comments:
+            try:
+                results.append(await self.post_pr_comment(
+                    repo_id, pr_id, commit_sha, comment["file"], comment["line"], comment["body"]
+                ))
+            except Exception as e:
+                logger.warning(f"Failed to post comment on {comment['file']}:{comment['line']}: {e}")
+                results.append(False)
+        return results
+
+    @abstractmethod
+    async def _fetch_file_content(self, repo_id: str, file_path: str, ref: str) -> str:
+        """
+        Download the content of a file at a specific reference from the provider.
+        """
+        raise NotImplementedError
+
     @abstractmethod
-    def get_file_content(self, repo_id: str, file_path: str, ref: str) -> str:
+    async def list_tree(
+        self,
+        repo_id: str,
+        ref: str,
+        path_filter: Optional[Callable[[str], bool]] = None,
+        max_files: Optional[int] = None
+    ) -> Tuple[str, List[Dict[str, str]]]:
         """
-        Fetch the content of a file at a specific reference (commit/branch).
+        List every file of the repository at a reference.
+        Returns an immutable key for that tree and [{"path", "sha"}] with git blob SHAs,
+        keeping only paths accepted by `path_filter` and at most `max_files` of them.
         """
         raise NotImplementedError
+
+    async def get_file_content(self, repo_id: str, file_path: str, ref: str) -> str:
+        """
+        Fetch the content of a file at a specific reference (commit/branch),
+        served from the blob cache when this version was seen before.
+        """
+        cached = await blob_cache.get_many(repo_id, [(file_path, ref)])
+        if (file_path, ref) in cached:
+            return cached[(file_path, ref)]
+        content = await self._fetch_file_content(repo_id, file_path, ref)
+        await blob_cache.put_many(repo_id, {(file_path, ref): content})
+        return content
@@ -0,0 +1,157 @@
+import re
+import zlib
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Only commit SHAs are immutable; branch names must never be cached
+_COMMIT_SHA_RE = re.compile(r"^(?:[0-9a-f]{40}|[0-9a-f]{64})$")
+
+
+class _ByteLRU:
+    """
+    In-process LRU bounded by the total size of its values.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key: str, value: str):
+        cost = len(value.encode("utf-8"))
+        if cost > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old:
+            self.size -= old[1]
+        self._items[key] = (value, cost)
+        self.size += cost
+        while self.size > self.max_bytes:
+            _, (_, evicted_cost) = self._items.popitem(last=False)
+            self.size -= evicted_cost
+
+
+class BlobCache:
+    """
+    Content-addressed cache for file contents, shared by the orchestrator
+    and the git worker (both use the same Redis key scheme).
+
+    (repo, ref, path) resolves to a git blob SHA, and each blob is stored once,
+    zlib-compressed in Redis with an in-process LRU in front of it.
+    Redis-side eviction relies on BLOB_CACHE_TTL plus the server's maxmemory policy.
+    """
+    def __init__(self):
+        self.redis = aioredis.from_url(settings.REDIS_URL)
+        self._blobs = _ByteLRU(settings.BLOB_CACHE_LRU_MAX_BYTES)
+        self._refs = _ByteLRU(settings.BLOB_CACHE_LRU_MAX_BYTES // 64)
+
+    @staticmethod
+    def blob_sha(content: str) -> str:
+        """Git blob SHA-1 of the content (matches `git hash-object`)."""
+        data = content.encode("utf-8")
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    @staticmethod
+    def is_cacheable_ref(ref: Optional[str]) -> bool:
+        return bool(ref) and bool(_COMMIT_SHA_RE.match(ref))
+
+    @staticmethod
+    def _ref_key(repo_id: str, path: str, ref: str) -> str:
+        return f"blob_ref:{repo_id}:{ref}:{path.lstrip('/')}"
+
+    @staticmethod
+    def _blob_key(blob_sha: str) -> str:
+        return f"blob:{blob_sha}"
+
+    async def get_many(
+        self,
+        repo_id: str,
+        files: List[Tuple[str, str]],
+        blob_shas: Optional[Dict[Tuple[str, str], str]] = None
+    ) -> Dict[Tuple[str, str], str]:
+        """
+        Returns the cached contents for the (path, ref) pairs that are present.
+        `blob_shas` lets callers that already know a file's blob SHA skip the pointer lookup.
+        """
+        blob_shas = dict(blob_shas or {})
+        files = [f for f in files if self.is_cacheable_ref(f[1])]
+        try:
+            # 1. Resolve (path, ref) -> blob SHA, in-process first, then Redis
+            unresolved = []
+            for item in files:
+                if item not in blob_shas:
+                    sha = self._refs.get(self._ref_key(repo_id, *item))
+                    if sha:
+                        blob_shas[item] = sha
+                    else:
+                        unresolved.append(item)
+            if unresolved:
+                values = await self.redis.mget([self._ref_key(repo_id, *item) for item in unresolved])
+                for item, value in zip(unresolved, values):
+                    if value:
+                        blob_shas[item] = value.decode()
+                        self._refs.put(self._ref_key(repo_id, *item), blob_shas[item])
+
+            # 2. Resolve blob SHA -> content, in-process first, then Redis
+            wanted = {blob_shas[item] for item in files if item in blob_shas}
+            blobs = {}
+            for sha in wanted:
+                content = self._blobs.get(sha)
+                if content is not None:
+                    blobs[sha] = content
+            missing = [sha for sha in wanted if sha not in blobs]
+            if missing:
+                values = await self.redis.mget([self._blob_key(sha) for sha in missing])
+                for sha, value in zip(missing, values):
+                    if value:
+                        blobs[sha] = zlib.decompress(value).decode("utf-8")
+                        self._blobs.put(sha, blobs[sha])
+
+            results = {}
+            for item in files:
+                content = blobs.get(blob_shas.get(item))
+                if content is not None:
+                    results[item] = content
+            return results
+        except Exception as e:
+            logger.warning(f"Blob cache lookup failed: {e}")
+            return {}
+
+    async def put_many(self, repo_id: str, contents: Dict[Tuple[str, str], Optional[str]]):
+        """
+        Stores fetched contents. Blobs already present in Redis are not rewritten.
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for (path, ref), content in contents.items():
+                if content is None or not self.is_cacheable_ref(ref):
+                    continue
+                data = content.encode("utf-8")
+                if len(data) > settings.BLOB_CACHE_MAX_BLOB_BYTES:
+                    continue
+                sha = self.blob_sha(content)
+                self._refs.put(self._ref_key(repo_id, path, ref), sha)
+                self._blobs.put(sha, content)
+                pipe.set(self._ref_key(repo_id, path, ref), sha, ex=settings.BLOB_CACHE_TTL)
+                pipe.set(self._blob_key(sha), zlib.compress(data), ex=settings.BLOB_CACHE_TTL, nx=True)
+            if len(pipe):
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Blob cache store failed: {e}")
+
+
+blob_cache = BlobCache()
@@ -1,10 +1,12 @@
-import requests
+import httpx
 import logging
 import os
 import base64
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from ..config import settings
 from .base_ops import BaseOps
+from .http_client import get_http_client
+from .rate_limiter import PRIORITY_HIGH
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +18,17 @@ class GithubOps(BaseOps):
             "Authorization": f"token {os.getenv('GITHUB_TOKEN')}",
             "Accept": "application/vnd.github.v3+json"
         }
+        self.http = get_http_client("github", self.headers)
 
-    def _request(self, method: str, endpoint: str, accept: str = None, **kwargs) -> requests.Response:
+    async def _request(self, method: str, endpoint: str, accept: str = None, **kwargs) -> httpx.Response:
         """
         Internal helper for making GitHub API requests.
         """
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        headers = self.headers.copy()
-        if accept:
-            headers["Accept"] = accept
+        headers = {"Accept": accept} if accept else None
             
         try:
-            response = requests.request(method, url, headers=headers, timeout=30, **kwargs)
+            response = await self.http.request(method, url, headers=headers, **kwargs)
             
             # Diagnostic for debugging token permissions if needed
             scopes = response.headers.get("X-OAuth-Scopes")
@@ -40,11 +41,11 @@ class GithubOps(BaseOps):
                     f"GitHub API error: [{response.status_code}] {response.text}"
                 )
             return response
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.exception(f"Request to GitHub failed: {e}")
             raise RuntimeError(f"Failed to communicate with GitHub: {str(e)}")
 
-    def post_pr_comment(self, repo_id: str, pr_id: int, commit_sha: str, file: str, line: int, body: str) -> bool:
+    async def post_pr_comment(self, repo_id: str, pr_id: int, commit_sha: str, file: str, line: int, body: str) -> bool:
         """
         Post a comment on a specific line of a Pull Request.
         """
@@ -55,15 +56,35 @@ class GithubOps(BaseOps):
             "line": line,
             "side": "RIGHT"
         }
-        self._request("POST", f"repos/{repo_id}/pulls/{pr_id}/comments", json=data)
+        await self._request("POST", f"repos/{repo_id}/pulls/{pr_id}/comments", json=data, priority=PRIORITY_HIGH)
         return True
 
-    def get_file_content(self, repo_id: str, file_path: str, ref: str) -> str:
+    async def post_review(self, repo_id: str, pr_id: int, commit_sha: str, comments: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Submit all comments as a single Pull Request Review (one call, one notification).
+        """
+        data = {
+            "commit_id": commit_sha,
+            "event": "COMMENT",
+            "comments": [
+                {"path": c["file"], "line": c["line"], "side": "RIGHT", "body": c["body"]}
+                for c in comments
+            ]
+        }
+        try:
+            await self._request("POST", f"repos/{repo_id}/pulls/{pr_id}/reviews", json=data, priority=PRIORITY_HIGH)
+            return [True] * len(comments)
+        except RuntimeError as e:
+            # A single line outside the diff rejects the whole review; keep the valid ones
+            logger.warning(f"Review submission for {repo_id}#{pr_id} failed, posting comments one by one: {e}")
+            return await super().post_review(repo_id, pr_id, commit_sha, comments)
+
+    async def _fetch_file_content(self, repo_id: str, file_path: str, ref: str) -> str:
         """
         Fetch file content from GitHub.
         """
         endpoint = f"repos/{repo_id}/contents/{file_path.lstrip('/')}?ref={ref}"
-        response = self._request("GET", endpoint)
+        response = await self._request("GET", endpoint)
         data = response.json()
         
         content = data.get("content", "")
@@ -71,3 +92,24 @@ class GithubOps(BaseOps):
             content = base64.b64decode(content).decode("utf-8")
             
         return content
+
+    async def list_tree(
+        self,
+        repo_id: str,
+        ref: str,
+        path_filter: Optional[Callable[[str], bool]] = None,
+        max_files: Optional[int] = None
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        List all blobs of the commit's tree in one recursive call, keyed by tree SHA.
+        """
+        response = await self._request("GET", f"repos/{repo_id}/git/trees/{ref}", params={"recursive": "1"})
+        data = response.json()
+        if data.get("truncated"):
+            logger.warning(f"Tree of {repo_id}@{ref} is truncated by GitHub, indexing a partial tree")
+        files = [
+            {"path": item["path"], "sha": item["sha"]}
+            for item in data.get("tree", [])
+            if item.get("type") == "blob" and (path_filter is None or path_filter(item["path"]))
+        ]
+        return data.get("sha", ref), files[:max_files]
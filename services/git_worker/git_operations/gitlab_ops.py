@@ -1,10 +1,12 @@
-import requests
+import httpx
 import logging
 import os
 import base64
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from ..config import settings
 from .base_ops import BaseOps
+from .http_client import get_http_client
+from .rate_limiter import PRIORITY_HIGH
 
 logger = logging.getLogger(__name__)
 
@@ -14,44 +16,106 @@ class GitlabOps(BaseOps):
         self.headers = {
             "PRIVATE-TOKEN": os.getenv("GITLAB_TOKEN", "")
         }
+        self.http = get_http_client("gitlab", self.headers)
 
-    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+    async def _request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         try:
-            response = requests.request(method, url, headers=self.headers, timeout=30, **kwargs)
+            response = await self.http.request(method, url, **kwargs)
             if response.status_code not in (200, 201):
                 logger.error(f"GitLab API Error [{response.status_code}]: {response.text}")
                 response.raise_for_status()
             return response
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.exception(f"Request to GitLab failed: {e}")
             raise RuntimeError(f"Failed to communicate with GitLab: {str(e)}")
 
-    def post_pr_comment(self, repo_id: str, pr_id: int, commit_sha: str, file: str, line: int, body: str) -> bool:
+    async def post_pr_comment(self, repo_id: str, pr_id: int, commit_sha: str, file: str, line: int, body: str) -> bool:
         """
         Post a comment on a specific line of a Merge Request.
         """
         endpoint = f"projects/{repo_id}/merge_requests/{pr_id}/discussions"
         data = {
             "body": body,
-            "position": {
-                "base_sha": commit_sha,
-                "head_sha": commit_sha,
-                "start_sha": commit_sha,
-                "new_path": file,
-                "new_line": line,
-                "position_type": "text"
-            }
+            "position": self._position(commit_sha, file, line)
         }
-        self._request("POST", endpoint, json=data)
+        await self._request("POST", endpoint, json=data, priority=PRIORITY_HIGH)
         return True
 
-    def get_file_content(self, repo_id: str, file_path: str, ref: str) -> str:
+    async def post_review(self, repo_id: str, pr_id: int, commit_sha: str, comments: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Create the comments as draft notes and publish them together with one bulk_publish.
+        """
+        endpoint = f"projects/{repo_id}/merge_requests/{pr_id}/draft_notes"
+        results = []
+        draft_ids = []
+        for comment in comments:
+            data = {"note": comment["body"], "position": self._position(commit_sha, comment["file"], comment["line"])}
+            try:
+                response = await self._request("POST", endpoint, json=data, priority=PRIORITY_HIGH)
+                draft_ids.append(response.json()["id"])
+                results.append(True)
+            except RuntimeError as e:
+                logger.warning(f"Failed to create draft note on {comment['file']}:{comment['line']}: {e}")
+                results.append(False)
+        if not draft_ids:
+            return results
+        try:
+            await self._request("POST", f"{endpoint}/bulk_publish", priority=PRIORITY_HIGH)
+        except RuntimeError:
+            # Unpublished drafts would be created a second time by the retry
+            for draft_id in draft_ids:
+                try:
+                    await self._request("DELETE", f"{endpoint}/{draft_id}", priority=PRIORITY_HIGH)
+                except RuntimeError as e:
+                    logger.warning(f"Failed to delete draft note {draft_id} of {repo_id}!{pr_id}: {e}")
+            raise
+        return results
+
+    @staticmethod
+    def _position(commit_sha: str, file: str, line: int) -> Dict[str, Any]:
+        return {
+            "base_sha": commit_sha,
+            "head_sha": commit_sha,
+            "start_sha": commit_sha,
+            "new_path": file,
+            "new_line": line,
+            "position_type": "text"
+        }
+
+    async def _fetch_file_content(self, repo_id: str, file_path: str, ref: str) -> str:
         """
         Fetch file content from GitLab.
         """
         import urllib.parse
         encoded_path = urllib.parse.quote(file_path, safe='')
         endpoint = f"projects/{repo_id}/repository/files/{encoded_path}/raw?ref={ref}"
-        response = self._request("GET", endpoint)
+        response = await self._request("GET", endpoint)
         return response.text
+
+    async def list_tree(
+        self,
+        repo_id: str,
+        ref: str,
+        path_filter: Optional[Callable[[str], bool]] = None,
+        max_files: Optional[int] = None
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        List all blobs of the repository tree at a commit, following X-Next-Page
+        until `max_files` blobs passed `path_filter`.
+        GitLab does not expose the root tree SHA, so the commit SHA keys the tree.
+        """
+        files = []
+        page = "1"
+        while page and (max_files is None or len(files) < max_files):
+            response = await self._request(
+                "GET", f"projects/{repo_id}/repository/tree",
+                params={"ref": ref, "recursive": "true", "per_page": 100, "page": page}
+            )
+            files.extend(
+                {"path": item["path"], "sha": item["id"]}
+                for item in response.json()
+                if item.get("type") == "blob" and (path_filter is None or path_filter(item["path"]))
+            )
+            page = response.headers.get("X-Next-Page")
+        return ref, files[:max_files]
@@ -0,0 +1,132 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import redis.asyncio as aioredis
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Comment posting may spend the whole budget; reads leave SCM_RATE_LIMIT_RESERVE for it
+PRIORITY_HIGH = "high"
+PRIORITY_LOW = "low"
+
+METRICS_KEY = "metrics:scm_rate_limit"
+
+# Returns how long the caller must wait (0 = go), spending one request when it may go
+_ACQUIRE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'remaining', 'reset', 'blocked_until')
+local now = tonumber(ARGV[1])
+local blocked = tonumber(state[3])
+if blocked and blocked > now then
+    return tostring(blocked - now)
+end
+local remaining = tonumber(state[1])
+local reset = tonumber(state[2])
+if not remaining or not reset or reset <= now then
+    return '0'
+end
+if remaining > tonumber(ARGV[2]) then
+    redis.call('HINCRBY', KEYS[1], 'remaining', -1)
+    return '0'
+end
+return tostring(reset - now)
+"""
+
+
+class RateLimiter:
+    """
+    Request budget per provider API, shared by every process through Redis.
+
+    The bucket holds what the provider last reported (X-RateLimit-* on GitHub,
+    RateLimit-* on GitLab) and is refilled when the window resets. Each call spends
+    one token atomically; when the bucket is empty, or the provider asked to back off
+    with Retry-After, callers sleep until it refills instead of failing.
+    Fails open when Redis is unavailable.
+    """
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+
+    def _bucket(self, url: str) -> str:
+        # GitHub meters REST, search and GraphQL separately
+        path = urlsplit(url).path
+        if self.provider == "github":
+            resource = "graphql" if path.endswith("/graphql") else "search" if "/search/" in path else "core"
+        else:
+            resource = "api"
+        return f"{self.provider}:{resource}"
+
+    async def acquire(self, url: str, priority: str = PRIORITY_LOW) -> float:
+        """
+        Waits until one request may be sent; returns the seconds spent waiting.
+        """
+        if not settings.SCM_RATE_LIMIT_ENABLED:
+            return 0.0
+        bucket = self._bucket(url)
+        reserve = 0 if priority == PRIORITY_HIGH else settings.SCM_RATE_LIMIT_RESERVE
+        waited = 0.0
+        try:
+            while True:
+                wait = float(await self._acquire(keys=[f"ratelimit:{bucket}"], args=[time.time(), reserve]))
+                if wait <= 0:
+                    break
+                wait = min(wait, settings.SCM_RATE_LIMIT_MAX_WAIT - waited)
+                if wait <= 0:
+                    logger.warning(f"{bucket} budget still exhausted after {waited:.0f}s, sending anyway")
+                    break
+                if not waited:
+                    logger.info(f"{bucket} budget exhausted, delaying {priority} priority request {wait:.0f}s")
+                    await self.redis.hincrby(METRICS_KEY, f"{bucket}:delayed", 1)
+                await asyncio.sleep(wait)
+                waited += wait
+        except aioredis.RedisError as e:
+            logger.warning(f"Rate limiter unavailable, sending without it: {e}")
+        return waited
+
+    async def record(self, url: str, response: httpx.Response) -> Tuple[Optional[float], bool]:
+        """
+        Stores the budget reported by a response. Returns the back-off in seconds
+        when the response is a rate-limit rejection that should be retried (else None),
+        and whether it was stored for `acquire` to enforce.
+        """
+        if not settings.SCM_RATE_LIMIT_ENABLED:
+            return None, False
+        bucket = self._bucket(url)
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining") or headers.get("RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+        retry_after = headers.get("Retry-After")
+
+        backoff = None
+        if response.status_code == 429 or (response.status_code == 403 and (retry_after or remaining == "0")):
+            if retry_after and retry_after.isdigit():
+                backoff = float(retry_after)
+            elif reset:
+                backoff = max(float(reset) - time.time(), 1.0)
+            else:
+                backoff = 60.0
+
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            if remaining is not None and reset is not None:
+                pipe.hset(f"ratelimit:{bucket}", mapping={"remaining": remaining, "reset": reset})
+                pipe.expireat(f"ratelimit:{bucket}", int(float(reset)) + 60)
+                pipe.hset(METRICS_KEY, mapping={f"{bucket}:remaining": remaining, f"{bucket}:reset": reset})
+            if backoff is not None:
+                pipe.hset(f"ratelimit:{bucket}", "blocked_until", time.time() + backoff)
+                pipe.hincrby(METRICS_KEY, f"{bucket}:throttled", 1)
+            await pipe.execute()
+        except aioredis.RedisError as e:
+            logger.warning(f"Failed to record rate limit of {bucket}: {e}")
+            return backoff, False
+        return backoff, True
+
+    async def get_stats(self) -> Dict[str, str]:
+        return await self.redis.hgetall(METRICS_KEY)
+
@@ -1,53 +1,57 @@
 import asyncio
-import logging
-import sys
-import os
-import json
+import signal
 
 from .queue_manager import queue_manager
 from .workflow import workflow_manager
 from .config import settings
+from .consumer import Consumer
 from .utils.logging_utils import setup_logging, get_logger
+from .state import state_manager
 from .models import Action
+from .git_operations.http_client import close_http_clients
+from .review_batcher import review_batcher
 
 # Configure logging
 setup_logging()
 logger = get_logger("git_worker")
 
+async def handle_task(task: dict):
+    action = task.get("action")
+    logger.info("Processing action: %s", action)
+
+    if action == Action.GIT_COMMENT.value:
+        await workflow_manager.git_inline_comment(task)
+    elif action == Action.TOOL_CALL.value:
+        await workflow_manager.tool_call(task)
+    else:
+        logger.warning("Unknown action received: %s", action)
+        # Acked by the consumer like any handled message
+
 async def worker_loop():
     logger.info("Git worker started. Listening to queue: %s", settings.GIT_QUEUE)
-    
+    consumer = Consumer(
+        settings.GIT_QUEUE,
+        handle_task,
+        concurrency=settings.WORKER_CONCURRENCY,
+        prefetch=settings.WORKER_PREFETCH,
+        drain_timeout=settings.WORKER_DRAIN_TIMEOUT
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, consumer.stop)
+
     try:
         # Establish connection
         await queue_manager.connect()
-        
-        # Consume messages
-        async for message in queue_manager.consume(settings.GIT_QUEUE):
-            async with message.process():
-                try:
-                    task = json.loads(message.body)
-                    action = task.get("action")
-                    logger.info("Processing action: %s", action)
-                    
-                    if action == Action.GIT_COMMENT.value:
-                        await workflow_manager.git_inline_comment(task)
-                    elif action == Action.TOOL_CALL.value:
-                        await workflow_manager.tool_call(task)
-                    else:
-                        logger.warning("Unknown action received: %s", action)
-                        # Implicit Ack via message.process() closure
-                        
-                except Exception as e:
-                    logger.exception("Error processing Git task: %s", e)
-                    # Implicit Nack (or Ack if handled, depending on policy). 
-                    # aio_pika's message.process(requeue=True/False) handles this. 
-                    # Default is to Nack without requeue if error propagates? 
-                    # Actually standard process context manager behavior:
-                    # If exception -> Nack (requeue=True by default in some versions, False in others, let's trust default or handle manually if needed).
-                    # For safety, let's catch criticals.
-                    
+        # Posts buffered comments past their deadline, including a crashed replica's
+        review_batcher.start(workflow_manager.get_scm)
+        await consumer.run()
     except Exception as e:
         logger.critical("Critical Git worker failure: %s", e)
+    finally:
+        await review_batcher.drain()
+        await close_http_clients()
+        await state_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(worker_loop())
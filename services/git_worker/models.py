@@ -9,7 +9,9 @@ class ChunkStatus(str, Enum):
     CONTEXT_READY = "CONTEXT_READY"
     COMMENT_READY = "COMMENT_READY"
     POSTED = "POSTED"
+    COMPLETED = "COMPLETED"
     FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
 
 class Chunk(BaseModel):
     chunk_id: str
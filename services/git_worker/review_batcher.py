@@ -0,0 +1,151 @@
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .git_operations.base_ops import BaseOps
+from .models import Chunk, ChunkStatus, ReviewRequest
+from .state import state_manager
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Flush deadline of every buffered review, shared by all git worker replicas
+DUE_KEY = "review_comments:due"
+
+class ReviewBatcher:
+    """
+    Buffers ready comments per review request and posts them as one provider review.
+
+    Chunk IDs are appended to a Redis list (`review_comments:{id}`), so every git worker
+    replica feeds the same buffer. The buffer is flushed when it reaches
+    REVIEW_BATCH_MAX_COMMENTS, when no chunk of the review is still in flight, or
+    REVIEW_BATCH_MAX_WAIT seconds after its first comment. That deadline lives in the
+    `review_comments:due` sorted set, which every replica sweeps, so a crashed worker's
+    buffer is still posted. Taking the buffer is one MULTI (LRANGE + DEL), so concurrent
+    flushes never post a comment twice.
+    """
+    def __init__(self):
+        self._sweeper: Optional[asyncio.Task] = None
+        # Reviews this process buffered comments for, flushed on shutdown
+        self._buffered: Dict[str, Tuple[BaseOps, ReviewRequest]] = {}
+
+    @staticmethod
+    def _key(review_request_id: str) -> str:
+        return f"review_comments:{review_request_id}"
+
+    def start(self, get_scm: Callable[[str], BaseOps]):
+        """
+        Starts sweeping overdue buffers in the background; `get_scm` maps a provider to its ops.
+        """
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_forever(get_scm))
+
+    async def add(self, scm: BaseOps, review_request: ReviewRequest, chunk: Chunk):
+        """
+        Buffers a COMMENT_READY chunk and flushes the review if a threshold is met.
+        """
+        rrid = review_request.review_request_id
+        key = self._key(rrid)
+        pipe = state_manager.redis.pipeline(transaction=True)
+        pipe.rpush(key, chunk.chunk_id)
+        pipe.expire(key, settings.REVIEW_BATCH_TTL)
+        pipe.zadd(DUE_KEY, {rrid: time.time() + settings.REVIEW_BATCH_MAX_WAIT}, nx=True)
+        pipe.zscore(DUE_KEY, rrid)
+        size, _, _, due = await pipe.execute()
+
+        if size >= settings.REVIEW_BATCH_MAX_COMMENTS:
+            reason = f"{size} comments buffered"
+        elif time.time() >= float(due or 0):
+            reason = "buffer is older than the max wait"
+        elif await self._review_finished(rrid):
+            reason = "review finished"
+        else:
+            self._buffered[rrid] = (scm, review_request)
+            return
+
+        logger.info(f"Flushing comments of review {rrid}: {reason}")
+        await self.flush(scm, review_request)
+
+    async def _review_finished(self, review_request_id: str) -> bool:
+        return not await state_manager.count_in_flight(review_request_id)
+
+    async def _sweep_forever(self, get_scm: Callable[[str], BaseOps]):
+        while True:
+            try:
+                await self.sweep(get_scm)
+            except Exception as e:
+                logger.error(f"Failed to sweep buffered review comments: {e}")
+            await asyncio.sleep(settings.REVIEW_BATCH_SWEEP_SECONDS)
+
+    async def sweep(self, get_scm: Callable[[str], BaseOps]):
+        """
+        Flushes every buffered review past its deadline, whichever replica buffered it.
+        """
+        for rrid in await state_manager.redis.zrangebyscore(DUE_KEY, "-inf", time.time()):
+            review_request = await state_manager.get_review_request(rrid)
+            if not review_request:
+                await state_manager.redis.zrem(DUE_KEY, rrid)
+                continue
+            logger.info(f"Flushing comments of review {rrid}: deadline passed")
+            await self.flush(get_scm(review_request.provider), review_request)
+
+    async def flush(self, scm: BaseOps, review_request: ReviewRequest):
+        """
+        Takes every buffered comment of the review and posts them as one review.
+        """
+        rrid = review_request.review_request_id
+        self._buffered.pop(rrid, None)
+
+        key = self._key(rrid)
+        pipe = state_manager.redis.pipeline(transaction=True)
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key)
+        pipe.zrem(DUE_KEY, rrid)
+        chunk_ids, _, _ = await pipe.execute()
+        if not chunk_ids:
+            return
+
+        chunks: List[Chunk] = []
+        repo_id, pr_id = review_request.repo_id, review_request.pr_id
+        for chunk in await state_manager.get_chunks(list(dict.fromkeys(chunk_ids))):
+            if await state_manager.is_comment_posted(self.idempotency_key(repo_id, pr_id, chunk)):
+                chunk.status = ChunkStatus.POSTED
+                await state_manager.save_chunk(chunk)
+            else:
+                chunks.append(chunk)
+        if not chunks:
+            return
+
+        try:
+            results = await scm.post_review(
+                repo_id, pr_id, review_request.metadata.get("head_sha"),
+                [{"file": c.filename, "line": c.line_number, "body": c.comment_body} for c in chunks]
+            )
+        except Exception as e:
+            logger.exception(f"Failed to post review for {repo_id}#{pr_id}: {e}")
+            results = [False] * len(chunks)
+
+        for chunk, posted in zip(chunks, results):
+            chunk.status = ChunkStatus.POSTED if posted else ChunkStatus.FAILED
+            if posted:
+                await state_manager.mark_comment_posted(self.idempotency_key(repo_id, pr_id, chunk))
+            await state_manager.save_chunk(chunk)
+        logger.info(f"Posted {sum(results)}/{len(chunks)} comments as one review on {repo_id}#{pr_id}")
+
+    @staticmethod
+    def idempotency_key(repo_id: str, pr_id: int, chunk: Chunk) -> str:
+        return f"posted:{repo_id}:{pr_id}:{chunk.idempotency_hash}"
+
+    async def drain(self):
+        """
+        Stops sweeping and flushes the reviews this process buffered. Call on shutdown.
+        """
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        buffered, self._buffered = self._buffered, {}
+        for scm, review_request in buffered.values():
+            await self.flush(scm, review_request)
+
+review_batcher = ReviewBatcher()
@@ -0,0 +1,72 @@
+import redis.asyncio as aioredis
+from typing import List, Optional
+from .config import settings
+from .models import Chunk, ChunkStatus, ReviewRequest
+
+# Chunks in these states may still produce a comment; `review_inflight_chunks:{id}`
+# holds them so the git worker can tell a review finished without reading every chunk
+IN_FLIGHT_STATUSES = {
+    ChunkStatus.PENDING, ChunkStatus.LLM_IN_PROGRESS,
+    ChunkStatus.TOOL_REQUIRED, ChunkStatus.CONTEXT_READY
+}
+
+def track_in_flight(pipe, chunk: Chunk):
+    """Queues the in-flight set update for the chunk's current status on `pipe`."""
+    key = f"review_inflight_chunks:{chunk.review_request_id}"
+    if chunk.status in IN_FLIGHT_STATUSES:
+        pipe.sadd(key, chunk.chunk_id)
+    else:
+        pipe.srem(key, chunk.chunk_id)
+
+class StateManager:
+    """
+    Async Redis access for chunks, review requests and posted-comment markers.
+    All calls share one connection pool, so concurrent tasks never block the event loop.
+    """
+    def __init__(self):
+        self.pool = aioredis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True
+        )
+        self.redis = aioredis.Redis(connection_pool=self.pool)
+
+    async def close(self):
+        await self.redis.aclose()
+        await self.pool.disconnect()
+
+    async def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
+        data = await self.redis.get(f"chunk:{chunk_id}")
+        if data:
+            return Chunk.model_validate_json(data)
+        return None
+
+    async def save_chunk(self, chunk: Chunk):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(f"chunk:{chunk.chunk_id}", chunk.model_dump_json())
+        track_in_flight(pipe, chunk)
+        await pipe.execute()
+
+    async def get_chunks(self, chunk_ids: List[str]) -> List[Chunk]:
+        if not chunk_ids:
+            return []
+        values = await self.redis.mget([f"chunk:{cid}" for cid in chunk_ids])
+        return [Chunk.model_validate_json(v) for v in values if v]
+
+    async def count_in_flight(self, review_request_id: str) -> int:
+        """Number of chunks of a review request that may still produce a comment."""
+        return await self.redis.scard(f"review_inflight_chunks:{review_request_id}")
+
+    async def get_review_request(self, review_request_id: str) -> Optional[ReviewRequest]:
+        data = await self.redis.get(f"review_request:{review_request_id}")
+        if data:
+            return ReviewRequest.model_validate_json(data)
+        return None
+
+    async def is_comment_posted(self, idempotency_key: str) -> bool:
+        return bool(await self.redis.exists(idempotency_key))
+
+    async def mark_comment_posted(self, idempotency_key: str, ttl: int = 86400):
+        await self.redis.set(idempotency_key, "1", ex=ttl)
+
+state_manager = StateManager()
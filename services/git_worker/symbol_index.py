@@ -0,0 +1,126 @@
+import json
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from .code_parser.tree_sitter_parser import UniversalParser
+from .code_parser.language import language_for_file
+from .git_operations.blob_cache import BlobCache
+from .state import state_manager
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Marks a blob as indexed even when it defines nothing
+_INDEXED_FIELD = ""
+
+class SymbolIndex:
+    """
+    Per-blob index of class/function definitions, stored in Redis.
+
+    Each file version is keyed by its git blob SHA (`symbols:{sha}`), so an index built
+    once serves every commit and PR that contains the same blob. The hash maps a symbol
+    name to its [{kind, line, start_byte, end_byte}] entries, which makes a lookup one
+    HGET plus a slice of the already cached file content.
+    """
+    def __init__(self):
+        self.parser = UniversalParser()
+
+    @staticmethod
+    def _key(blob_sha: str) -> str:
+        return f"symbols:{blob_sha}"
+
+    async def _ensure_index(self, content: str, language: str, blob_sha: Optional[str] = None) -> str:
+        key = self._key(blob_sha or BlobCache.blob_sha(content))
+        if await state_manager.redis.exists(key):
+            return key
+
+        # Parsing is CPU-bound; keep it off the event loop
+        symbols = await asyncio.to_thread(self.parser.extract_symbols, content, language)
+        by_name: Dict[str, List[Dict[str, Any]]] = {}
+        for symbol in symbols:
+            by_name.setdefault(symbol.pop("name"), []).append(symbol)
+
+        pipe = state_manager.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping={
+            _INDEXED_FIELD: "1",
+            **{name: json.dumps(entries) for name, entries in by_name.items()}
+        })
+        pipe.expire(key, settings.SYMBOL_INDEX_TTL)
+        await pipe.execute()
+        return key
+
+    async def index_blob(self, content: str, filename: str, blob_sha: Optional[str] = None):
+        """
+        Indexes a file version up front; `blob_sha` skips rehashing when the provider already sent it.
+        """
+        language = language_for_file(filename)
+        if language:
+            await self._ensure_index(content, language, blob_sha)
+
+    async def indexed_blobs(self, blob_shas: List[str]) -> Set[str]:
+        """
+        Returns the subset of blob SHAs that already have an index, in one round-trip.
+        """
+        if not blob_shas:
+            return set()
+        pipe = state_manager.redis.pipeline(transaction=False)
+        for sha in blob_shas:
+            pipe.exists(self._key(sha))
+        found = await pipe.execute()
+        return {sha for sha, exists in zip(blob_shas, found) if exists}
+
+    async def get_many(self, blob_shas: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """
+        Returns {blob_sha: {name: entries}} for the indexed blobs among `blob_shas`.
+        """
+        if not blob_shas:
+            return {}
+        pipe = state_manager.redis.pipeline(transaction=False)
+        for sha in blob_shas:
+            pipe.hgetall(self._key(sha))
+        indexes = await pipe.execute()
+        return {
+            sha: {name: json.loads(raw) for name, raw in index.items() if name != _INDEXED_FIELD}
+            for sha, index in zip(blob_shas, indexes) if index
+        }
+
+    async def get_outline(self, content: str, filename: str) -> Optional[str]:
+        """
+        Returns "Line N: Kind name" for every definition in the file,
+        or None when the language is not supported.
+        """
+        language = language_for_file(filename)
+        if not language:
+            return None
+        key = await self._ensure_index(content, language)
+        index = await state_manager.redis.hgetall(key)
+        rows = sorted(
+            (entry["line"], f"Line {entry['line']}: {entry['kind']} {name}")
+            for name, raw in index.items() if name != _INDEXED_FIELD
+            for entry in json.loads(raw)
+        )
+        return "\n".join(row for _, row in rows) if rows else "No classes or functions found."
+
+    async def get_symbol_source(self, content: str, filename: str, name: str) -> Optional[str]:
+        """
+        Returns the source of every definition called `name` in the file,
+        "" when there is none, or None when the language is not supported.
+        """
+        language = language_for_file(filename)
+        if not language:
+            return None
+        if name == _INDEXED_FIELD:
+            # The empty field is the "indexed" marker, not a symbol
+            return ""
+        key = await self._ensure_index(content, language)
+        raw = await state_manager.redis.hget(key, name)
+        if not raw:
+            return ""
+        data = content.encode("utf8")
+        return "\n\n".join(
+            data[entry["start_byte"]:entry["end_byte"]].decode("utf8", errors="replace")
+            for entry in json.loads(raw)
+        )
+
+symbol_index = SymbolIndex()
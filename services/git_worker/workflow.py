@@ -1,4 +1,3 @@
-import redis
 import logging
 import json
 import hashlib
@@ -7,6 +6,10 @@ from .git_operations import gitlab_ops
 from .git_operations import github_ops
 from .models import ReviewRequest, Chunk, ChunkStatus
 from .config import settings
+from .state import state_manager
+from .symbol_index import symbol_index
+from .definition_index import definition_index
+from .review_batcher import review_batcher
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +17,6 @@ class WorkflowManager:
     def __init__(self):
         self.gitlab_ops = gitlab_ops.GitlabOps()
         self.github_ops = github_ops.GithubOps()
-        self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
     def get_scm(self, provider: str):
         if provider == "gitlab":
@@ -24,17 +26,6 @@ class WorkflowManager:
         else:
             raise ValueError(f"Unsupported provider: {provider}")
     
-    def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
-        key = f"chunk:{chunk_id}"
-        data = self.redis.get(key)
-        if data:
-            return Chunk.model_validate_json(data)
-        return None
-
-    def update_chunk(self, chunk: Chunk):
-        key = f"chunk:{chunk.chunk_id}"
-        self.redis.set(key, chunk.model_dump_json())
-
     async def git_inline_comment(self, payload: Dict[str, Any]):
         """
         Posts an inline comment to GitHub/GitLab.
@@ -44,18 +35,16 @@ class WorkflowManager:
             logger.error("No chunk_id in payload")
             return
 
-        chunk = self.get_chunk(chunk_id)
+        chunk = await state_manager.get_chunk(chunk_id)
         if not chunk:
             logger.error(f"Chunk {chunk_id} not found")
             return
 
-        rr_key = f"review_request:{chunk.review_request_id}"
-        rr_data = self.redis.get(rr_key)
-        if not rr_data:
+        review_request = await state_manager.get_review_request(chunk.review_request_id)
+        if not review_request:
             logger.error(f"Review request {chunk.review_request_id} not found")
             return
-            
-        review_request = ReviewRequest.model_validate_json(rr_data)
+
         repo_id = review_request.repo_id
         pr_id = review_request.pr_id
         provider = review_request.provider
@@ -64,18 +53,18 @@ class WorkflowManager:
         if not chunk.comment_body or not chunk.filename or chunk.line_number is None:
             logger.warning(f"Chunk {chunk_id} missing comment data")
             chunk.status = ChunkStatus.FAILED
-            self.update_chunk(chunk)
+            await state_manager.save_chunk(chunk)
             return
 
         if not chunk.idempotency_hash:
             content_to_hash = f"{chunk.filename}:{chunk.line_number}:{chunk.comment_body}"
             chunk.idempotency_hash = hashlib.sha256(content_to_hash.encode()).hexdigest()
 
-        idempotency_key = f"posted:{repo_id}:{pr_id}:{chunk.idempotency_hash}"
-        if self.redis.get(idempotency_key):
+        idempotency_key = review_batcher.idempotency_key(repo_id, pr_id, chunk)
+        if await state_manager.is_comment_posted(idempotency_key):
             logger.info(f"Comment already posted for chunk {chunk_id} (idempotency hit)")
             chunk.status = ChunkStatus.POSTED
-            self.update_chunk(chunk)
+            await state_manager.save_chunk(chunk)
             return
 
         try:
@@ -83,10 +72,16 @@ class WorkflowManager:
             if not commit_sha:
                 logger.error(f"head_sha missing for PR {repo_id}#{pr_id}")
                 chunk.status = ChunkStatus.FAILED
-                self.update_chunk(chunk)
+                await state_manager.save_chunk(chunk)
+                return
+
+            if settings.REVIEW_BATCH_ENABLED:
+                # Posted later with the rest of the review's comments
+                await state_manager.save_chunk(chunk)
+                await review_batcher.add(scm, review_request, chunk)
                 return
 
-            success = scm.post_pr_comment(
+            success = await scm.post_pr_comment(
                 repo_id=repo_id,
                 pr_id=pr_id,
                 commit_sha=commit_sha,
@@ -97,7 +92,7 @@ class WorkflowManager:
 
             if success:
                 chunk.status = ChunkStatus.POSTED
-                self.redis.setex(idempotency_key, 86400, "1")
+                await state_manager.mark_comment_posted(idempotency_key)
                 logger.info(f"Successfully posted comment for chunk {chunk_id}")
             else:
                 chunk.status = ChunkStatus.FAILED
@@ -107,7 +102,26 @@ class WorkflowManager:
             logger.exception(f"Error posting comment for chunk {chunk_id}: {e}")
             chunk.status = ChunkStatus.FAILED
         
-        self.update_chunk(chunk)
+        await state_manager.save_chunk(chunk)
+
+    async def _run_file_tool(self, tool_name: str, tool_args: Dict[str, Any], file_path: str, content: str) -> str:
+        """
+        Answers file tools from the symbol index, so only the requested definition
+        (or the outline) enters the LLM context. Unsupported languages get the whole file.
+        """
+        if tool_name == "get_file_structure":
+            outline = await symbol_index.get_outline(content, file_path)
+            if outline is not None:
+                return f"Structure of {file_path}:\n{outline}"
+        elif tool_name == "get_function_content":
+            name = tool_args.get("function_name", "")
+            source = await symbol_index.get_symbol_source(content, file_path, name)
+            if source:
+                return source
+            if source == "":
+                outline = await symbol_index.get_outline(content, file_path)
+                return f"Could not find function/class '{name}' in {file_path}. Structure of the file:\n{outline}"
+        return content
 
     async def tool_call(self, payload: Dict[str, Any]):
         """
@@ -118,7 +132,7 @@ class WorkflowManager:
             logger.error("No chunk_id in payload")
             return
 
-        chunk = self.get_chunk(chunk_id)
+        chunk = await state_manager.get_chunk(chunk_id)
         if not chunk:
             logger.error(f"Chunk {chunk_id} not found")
             return
@@ -129,27 +143,29 @@ class WorkflowManager:
         logger.info(f"Executing Tool Call: {tool_name} for chunk {chunk_id}")
 
         # Fetch PR Metadata
-        rr_key = f"review_request:{chunk.review_request_id}"
-        rr_data = self.redis.get(rr_key)
-        if not rr_data:
+        review_request = await state_manager.get_review_request(chunk.review_request_id)
+        if not review_request:
             logger.error(f"Review request {chunk.review_request_id} not found")
             return
-        
-        review_request = ReviewRequest.model_validate_json(rr_data)
+
         scm = self.get_scm(review_request.provider)
-        commit_sha = review_request.metadata.get("head_sha", "main")
+        head_sha = review_request.metadata.get("head_sha")
+        commit_sha = head_sha or "main"
 
         try:
             output = ""
             if tool_name in ["get_file_structure", "read_file", "get_function_content"]:
                 # Use filename from args if present, else fallback to chunk's filename
                 file_path = tool_args.get("file_path", chunk.filename)
-                output = scm.get_file_content(review_request.repo_id, file_path, commit_sha)
-                
-                # If tool was 'structure', we just summarize for now
-                if tool_name == "get_file_structure":
-                    # Simple simulation of structure
-                    output = f"Structure of {file_path}:\n(Full content provided for analysis)\n\n" + output
+                content = await scm.get_file_content(review_request.repo_id, file_path, commit_sha)
+                output = await self._run_file_tool(tool_name, tool_args, file_path, content)
+            elif tool_name == "find_definition" and not head_sha:
+                # The index belongs to one immutable tree; a moving branch would serve stale definitions
+                output = "find_definition is unavailable: the review has no head commit."
+            elif tool_name == "find_definition":
+                output = await definition_index.find_definition(
+                    scm, review_request.repo_id, commit_sha, tool_args.get("symbol", "")
+                )
             else:
                 output = f"Unknown tool: {tool_name}"
 
@@ -157,7 +173,7 @@ class WorkflowManager:
             chunk.metadata["tool_output"] = output
             chunk.context_level += 1
             chunk.status = ChunkStatus.CONTEXT_READY
-            self.update_chunk(chunk)
+            await state_manager.save_chunk(chunk)
 
             # Enqueue back to Orchestrator for re-evaluation
             from .queue_manager import queue_manager
@@ -170,6 +186,6 @@ class WorkflowManager:
         except Exception as e:
             logger.exception(f"Error executing tool {tool_name} for chunk {chunk_id}: {e}")
             chunk.status = ChunkStatus.FAILED
-            self.update_chunk(chunk)
+            await state_manager.save_chunk(chunk)
 
 workflow_manager = WorkflowManager()
\ No newline at end of file
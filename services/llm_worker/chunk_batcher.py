@@ -0,0 +1,88 @@
+import logging
+from typing import List, Optional
+
+from .models import Chunk, ChunkStatus
+from .state import state_manager
+from .config import settings
+from .utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Claims a chunk for a batch owner; succeeds again for the same owner (redelivery)
+_CLAIM_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 1
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return 1
+end
+return 0
+"""
+
+# Claim owner of chunks handed back by a batch to be reviewed on their own
+SOLO = "solo"
+
+class ChunkBatcher:
+    """
+    Packs first-pass chunks of one review and file into a single LLM request.
+
+    The chunk whose message arrives first becomes the batch owner: it claims itself
+    and as many siblings as fit in LLM_BATCH_TOKEN_BUDGET (`llm_claim:{chunk_id}`
+    holds the owner). Only siblings the orchestrator already handed over
+    (LLM_IN_PROGRESS) are taken, since it no longer writes those records. When a sibling's own message arrives, its claim belongs to
+    another owner and it is skipped; a redelivered owner message re-takes its batch.
+    Chunks a batch could not answer are released to SOLO and never batched again.
+    """
+    @staticmethod
+    def _key(chunk_id: str) -> str:
+        return f"llm_claim:{chunk_id}"
+
+    async def _claim(self, chunk_id: str, owner: str) -> bool:
+        return bool(await state_manager.redis.eval(
+            _CLAIM_SCRIPT, 1, self._key(chunk_id), owner, settings.LLM_BATCH_CLAIM_TTL
+        ))
+
+    async def get_owner(self, chunk_id: str) -> Optional[str]:
+        return await state_manager.redis.get(self._key(chunk_id))
+
+    async def release(self, chunks: List[Chunk]):
+        """
+        Hands chunks back to be reviewed on their own, by whichever message comes first.
+        """
+        pipe = state_manager.redis.pipeline(transaction=False)
+        for chunk in chunks:
+            pipe.set(self._key(chunk.chunk_id), SOLO, ex=settings.LLM_BATCH_CLAIM_TTL)
+        await pipe.execute()
+
+    async def take_batch(self, chunk: Chunk) -> Optional[List[Chunk]]:
+        """
+        Returns the chunks to review together (the given chunk first),
+        or None when the chunk was already taken into another chunk's batch.
+        """
+        if not await self._claim(chunk.chunk_id, chunk.chunk_id):
+            return None
+
+        batch = [chunk]
+        budget = settings.LLM_BATCH_TOKEN_BUDGET - estimate_tokens(chunk.diff_snippet)
+        siblings = sorted(
+            (
+                c for c in await state_manager.get_file_chunks(chunk.review_request_id, chunk.filename)
+                if c.chunk_id != chunk.chunk_id
+                and c.context_level == 0 and c.status == ChunkStatus.LLM_IN_PROGRESS
+            ),
+            key=lambda c: c.metadata.get("start_line", 0)
+        )
+        for sibling in siblings:
+            if len(batch) >= settings.LLM_BATCH_MAX_CHUNKS:
+                break
+            cost = estimate_tokens(sibling.diff_snippet)
+            if cost > budget:
+                continue
+            if await self._claim(sibling.chunk_id, chunk.chunk_id):
+                batch.append(sibling)
+                budget -= cost
+        if len(batch) > 1:
+            logger.info(f"Batching {len(batch)} chunks of {chunk.filename} with {chunk.chunk_id}")
+        return batch
+
+chunk_batcher = ChunkBatcher()
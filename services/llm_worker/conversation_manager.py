@@ -1,26 +1,68 @@
-import json
-import redis
+import logging
+from typing import List
+
+from .state import state_manager
 from .config import settings
+from .utils.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# The system prompt and the initial review request (with the diff) are always sent
+PINNED_MESSAGES = 2
 
 class ConversationManager:
-    def __init__(self):
-        self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    """
+    Token-aware conversation store for a chunk's review.
+
+    Messages are appended to a Redis list (`conversation:{review}:{chunk}`), so a turn
+    only writes its new messages. Each stored message carries its token estimate.
+    A fetch returns the pinned system prompt and diff plus the latest
+    LLM_CONVERSATION_WINDOW messages that fit in LLM_CONVERSATION_TOKEN_BUDGET.
+    """
 
     def _get_key(self, review_request_id: str, chunk_id: str):
         return f"conversation:{review_request_id}:{chunk_id}"
 
-    def fetch_conversation(self, review_request_id: str, chunk_id: str) -> list:
+    async def fetch_conversation(self, review_request_id: str, chunk_id: str) -> list:
         key = self._get_key(review_request_id, chunk_id)
-        data = self.redis.get(key)
-        if data:
-            return json.loads(data)
-        return []
-    
-    def save_conversation(self, review_request_id: str, chunk_id: str, conversation: list):
+        pinned, recent, length = await state_manager.get_conversation(
+            key, PINNED_MESSAGES, settings.LLM_CONVERSATION_WINDOW
+        )
+        # Short conversations overlap the pinned head
+        recent = recent[max(PINNED_MESSAGES - (length - len(recent)), 0):]
+
+        budget = settings.LLM_CONVERSATION_TOKEN_BUDGET - sum(m.get("tokens", 0) for m in pinned)
+        window: List[dict] = []
+        for message in reversed(recent):
+            # The latest message (the pending tool call) is always kept
+            if window and message.get("tokens", 0) > budget:
+                break
+            window.insert(0, message)
+            budget -= message.get("tokens", 0)
+        # Resume on an assistant turn, so roles keep alternating after the pinned request
+        while window and window[0]["role"] != "assistant":
+            window.pop(0)
+
+        dropped = length - len(pinned) - len(window)
+        if dropped > 0:
+            logger.info(f"Conversation of chunk {chunk_id}: {dropped} older messages left out of the window")
+        return [self.create_message(m["role"], m["content"]) for m in pinned + window]
+
+    async def append_messages(self, review_request_id: str, chunk_id: str, messages: List[dict]):
+        """
+        Appends a turn's new messages to the stored conversation.
+        """
         key = self._get_key(review_request_id, chunk_id)
-        self.redis.set(key, json.dumps(conversation))
+        stored = [{**m, "tokens": estimate_tokens(m["content"])} for m in messages]
+        await state_manager.append_conversation(key, stored, settings.LLM_CONVERSATION_TTL)
 
     def create_message(self, role: str, content: str) -> dict:
         return {"role": role, "content": content}
 
-conversation_manager = ConversationManager()
\ No newline at end of file
+    def fit_tool_output(self, output: str) -> str:
+        """
+        Cuts a tool output (e.g. a whole file) down to LLM_TOOL_OUTPUT_TOKEN_BUDGET.
+        """
+        return truncate_to_tokens(output, settings.LLM_TOOL_OUTPUT_TOKEN_BUDGET)
+
+conversation_manager = ConversationManager()
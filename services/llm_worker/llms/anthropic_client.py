@@ -1,28 +1,37 @@
-import requests
-from typing import List, Dict
+import json
+from typing import Any, Dict, List, Optional
 from ..config import settings
 from .base_client import LLMClient
 
 class AnthropicLLM(LLMClient):
+    name = "Anthropic"
+    timeout = 60.0
+
     def __init__(self):
         self.api_key = settings.ANTHROPIC_API_KEY
         self.model = settings.ANTHROPIC_MODEL
-        self.api_url = settings.ANTHROPIC_BASE_URL
+        self._api_url = settings.ANTHROPIC_BASE_URL
+
+    @property
+    def api_url(self) -> str:
+        return self._api_url
 
-    def generate_response(self, messages: List[Dict[str, str]]) -> str:
+    def _check_configured(self):
         if not self.api_key:
             raise RuntimeError("Anthropic API key not configured")
 
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json"
         }
 
+    def _build_payload(self, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
         # Extract system prompt if present, as Anthropic handles it separately
         system_prompt = None
         filtered_messages = []
-        
+
         for msg in messages:
             if msg["role"] == "system":
                 system_prompt = msg["content"]
@@ -34,17 +43,63 @@ class AnthropicLLM(LLMClient):
             "max_tokens": 4096,
             "messages": filtered_messages
         }
-        
+
         if system_prompt:
             data["system"] = system_prompt
+        if settings.LLM_PROMPT_CACHING:
+            self._add_cache_breakpoints(data)
+        if stream:
+            data["stream"] = True
+        return data
+
+    @staticmethod
+    def _add_cache_breakpoints(data: Dict[str, Any]):
+        """
+        Marks the static system prompt, and the conversation so far, as cacheable.
+        The system prompt is shared by every chunk. The conversation prefix is only
+        marked once it holds a tool round trip: a first turn is chunk-specific and
+        would be written to the cache without ever being read back.
+        """
+        if isinstance(data.get("system"), str):
+            data["system"] = [{"type": "text", "text": data["system"], "cache_control": {"type": "ephemeral"}}]
+        messages = data["messages"]
+        has_tool_turn = any(m.get("role") == "assistant" for m in messages)
+        if has_tool_turn and isinstance(messages[-1].get("content"), str):
+            messages[-1] = {
+                "role": messages[-1]["role"],
+                "content": [{"type": "text", "text": messages[-1]["content"], "cache_control": {"type": "ephemeral"}}]
+            }
+
+    def _parse_usage(self, result: Dict[str, Any]) -> Dict[str, int]:
+        # input_tokens only counts the uncached part of the prompt here
+        usage = result.get("usage") or {}
+        counts = {
+            "input_tokens": usage.get("input_tokens"),
+            "cached_input_tokens": usage.get("cache_read_input_tokens"),
+            "cache_write_tokens": usage.get("cache_creation_input_tokens"),
+            "output_tokens": usage.get("output_tokens")
+        }
+        return {k: v for k, v in counts.items() if v is not None}
+
+    def _parse_stream_usage(self, line: str) -> Dict[str, int]:
+        # Input and cache counts arrive with message_start, output counts with message_delta
+        if not line.startswith("data: "):
+            return {}
+        event = json.loads(line[6:])
+        if event.get("type") == "message_start":
+            return self._parse_usage(event.get("message", {}))
+        if event.get("type") == "message_delta":
+            return self._parse_usage(event)
+        return {}
+
+    def _parse_response(self, result: Dict[str, Any]) -> str:
+        return result["content"][0]["text"]
 
-        try:
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=60)
-            if response.status_code != 200:
-                raise RuntimeError(f"Anthropic API Error: {response.status_code} - {response.text}")
-            
-            result = response.json()
-            return result["content"][0]["text"]
-            
-        except Exception as e:
-            raise RuntimeError(f"Failed to communicate with Anthropic: {str(e)}")
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        # Server-sent events; the text arrives in content_block_delta events
+        if not line.startswith("data: "):
+            return None
+        event = json.loads(line[6:])
+        if event.get("type") != "content_block_delta":
+            return None
+        return event.get("delta", {}).get("text")
@@ -1,11 +1,107 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from ..config import settings
+from .http_client import get_http_client
+from .json_stream import JsonStreamAssembler
+from ..usage import usage_recorder
 
 class LLMClient(ABC):
+    """
+    Async chat client on the shared keep-alive HTTP pool.
+
+    Providers describe their request and response shapes; sending, error handling
+    and streaming live here. In streaming mode the answer is assembled from the
+    deltas up to the end of the JSON answer; the stream is still read to its end,
+    where providers report the final token usage. Token usage, including provider
+    prompt-cache hits, is recorded per call.
+    """
+    name: str = "LLM"
+    timeout: float = 60.0
+
+    @property
+    @abstractmethod
+    def api_url(self) -> str:
+        raise NotImplementedError
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Content-Type": "application/json"}
+
+    @abstractmethod
+    def _build_payload(self, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
+        """
+        Provider request body for the given messages.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _parse_response(self, result: Dict[str, Any]) -> str:
+        """
+        Text of a non-streamed response.
+        """
+        raise NotImplementedError
+
     @abstractmethod
-    def generate_response(self, messages: List[Dict[str, str]]) -> str:
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        """
+        Text delta carried by one line of a streamed response, if any.
+        """
+        raise NotImplementedError
+
+    def _parse_usage(self, result: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Token counts of a non-streamed response: input_tokens, cached_input_tokens,
+        cache_write_tokens, output_tokens (missing ones are left out).
+        """
+        return {}
+
+    def _parse_stream_usage(self, line: str) -> Dict[str, int]:
+        """
+        Token counts carried by one line of a streamed response, if any.
+        """
+        return {}
+
+    def _check_configured(self):
+        pass
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], stream: Optional[bool] = None) -> str:
         """
         Generate a text response for the given list of messages.
         Messages should be in the format: [{"role": "user/system", "content": "..."}]
         """
-        pass
+        self._check_configured()
+        stream = settings.LLM_STREAMING if stream is None else stream
+        http = get_http_client()
+        payload = self._build_payload(messages, stream)
+        try:
+            if not stream:
+                response = await http.post(self.api_url, headers=self._headers(), json=payload, timeout=self.timeout)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{self.name} API Error: {response.status_code} - {response.text}")
+                result = response.json()
+                await usage_recorder.record(self.name, self._parse_usage(result))
+                return self._parse_response(result)
+
+            assembler = JsonStreamAssembler()
+            raw = []
+            usage: Dict[str, int] = {}
+            async with http.stream("POST", self.api_url, headers=self._headers(), json=payload, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise RuntimeError(f"{self.name} API Error: {response.status_code} - {response.text}")
+                async for line in response.aiter_lines():
+                    # Output token counts only arrive with the last events
+                    usage.update(self._parse_stream_usage(line))
+                    if assembler.complete:
+                        continue
+                    delta = self._parse_stream_line(line)
+                    if delta:
+                        raw.append(delta)
+                        assembler.feed(delta)
+            await usage_recorder.record(self.name, usage)
+            return assembler.text if assembler.complete else "".join(raw)
+
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Failed to communicate with {self.name}: {str(e)}")
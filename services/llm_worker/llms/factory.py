@@ -1,5 +1,6 @@
 from .open_ai_client import OpenAILLM
 from .ollama_client import OllamaLLM
+from .anthropic_client import AnthropicLLM
 from ..config import settings
 
 def get_llm_client():
@@ -0,0 +1,52 @@
+class JsonStreamAssembler:
+    """
+    Collects streamed text deltas and detects when the first top-level JSON object
+    is complete, so the caller can stop reading the stream right there.
+
+    Only string/escape state and brace depth are tracked, which is enough to know
+    where the object ends; text before the opening brace (e.g. a ```json fence) is dropped.
+    """
+    def __init__(self):
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self.complete = False
+
+    def feed(self, delta: str) -> bool:
+        """
+        Adds a delta; returns True once the JSON object is complete.
+        """
+        if self.complete:
+            return True
+        start = 0
+        for i, char in enumerate(delta):
+            if not self._started:
+                if char != "{":
+                    start = i + 1
+                    continue
+                self._started = True
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(delta[start:i + 1])
+                    self.complete = True
+                    return True
+        self._parts.append(delta[start:])
+        return False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
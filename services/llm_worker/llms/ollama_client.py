@@ -1,27 +1,45 @@
-import requests
 import json
-from typing import List, Dict
+from typing import Any, Dict, List, Optional
 from ..config import settings
 from .base_client import LLMClient
 
 class OllamaLLM(LLMClient):
+    name = "Ollama"
+    # Local models can be slow on the first token
+    timeout = 300.0
+
     def __init__(self):
         self.base_url = getattr(settings, "OLLAMA_BASE_URL", "http://localhost:11434")
         self.model = getattr(settings, "OLLAMA_MODEL", "llama2")
 
-    def generate_response(self, messages: List[Dict[str, str]]) -> str:
-        url = f"{self.base_url}/api/chat"
-        data = {
+    @property
+    def api_url(self) -> str:
+        return f"{self.base_url}/api/chat"
+
+    def _build_payload(self, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
+        return {
             "model": self.model,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
             "format": "json"
         }
-        try:
-            response = requests.post(url, json=data, timeout=300) 
-            if response.status_code != 200:
-                raise RuntimeError(f"Ollama API Error: {response.text}")
-            
-            return response.json().get("message", {}).get("content", "")
-        except Exception as e:
-            raise RuntimeError(f"Failed to connect to Ollama: {str(e)}")
\ No newline at end of file
+
+    def _parse_response(self, result: Dict[str, Any]) -> str:
+        return result.get("message", {}).get("content", "")
+
+    def _parse_usage(self, result: Dict[str, Any]) -> Dict[str, int]:
+        if "prompt_eval_count" not in result:
+            return {}
+        return {"input_tokens": result.get("prompt_eval_count", 0), "output_tokens": result.get("eval_count", 0)}
+
+    def _parse_stream_usage(self, line: str) -> Dict[str, int]:
+        # The final line (done: true) carries the totals
+        if not line.strip():
+            return {}
+        return self._parse_usage(json.loads(line))
+
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        # Newline-delimited JSON, one message delta per line
+        if not line.strip():
+            return None
+        return json.loads(line).get("message", {}).get("content")
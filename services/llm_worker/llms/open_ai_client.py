@@ -1,37 +1,66 @@
-import requests
-from typing import List, Dict
+import json
+from typing import Any, Dict, List, Optional
 from ..config import settings
 from .base_client import LLMClient
 
 class OpenAILLM(LLMClient):
+    name = "OpenAI"
+    timeout = 60.0
+
     def __init__(self):
         self.api_key = getattr(settings, "OPENAI_API_KEY", None)
         self.model = getattr(settings, "OPENAI_MODEL", "gpt-4")
-        self.api_url = getattr(settings, "OPENAI_BASE_URL", "https://api.openai.com/v1/chat/completions")
+        self._api_url = getattr(settings, "OPENAI_BASE_URL", "https://api.openai.com/v1/chat/completions")
+
+    @property
+    def api_url(self) -> str:
+        return self._api_url
 
-    def generate_response(self, messages: List[Dict[str, str]]) -> str:
+    def _check_configured(self):
         if not self.api_key:
             raise RuntimeError("OpenAI API key not configured")
 
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+
+    def _build_payload(self, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
         data = {
             "model": self.model,
             "messages": messages,
             "temperature": 0.1, # Set low for more deterministic reviews
             "response_format": { "type": "json_object" }
         }
+        if stream:
+            data["stream"] = True
+            data["stream_options"] = {"include_usage": True}
+        return data
+
+    def _parse_response(self, result: Dict[str, Any]) -> str:
+        return result["choices"][0]["message"]["content"]
+
+    def _parse_usage(self, result: Dict[str, Any]) -> Dict[str, int]:
+        # Prefix caching is automatic; hits show up as cached prompt tokens
+        usage = result.get("usage") or {}
+        if not usage:
+            return {}
+        return {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "cached_input_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0)
+        }
+
+    def _parse_stream_usage(self, line: str) -> Dict[str, int]:
+        # With include_usage, the last event before [DONE] carries the totals
+        if not line.startswith("data: ") or line == "data: [DONE]":
+            return {}
+        return self._parse_usage(json.loads(line[6:]))
 
-        try:
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=60)
-            if response.status_code != 200:
-                raise RuntimeError(f"OpenAI API Error: {response.text}")
-            
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-            
-        except Exception as e:
-            raise RuntimeError(f"Failed to communicate with OpenAI: {str(e)}")
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        # Server-sent events: "data: {...}" per delta, "data: [DONE]" at the end
+        if not line.startswith("data: ") or line == "data: [DONE]":
+            return None
+        choices = json.loads(line[6:]).get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content")
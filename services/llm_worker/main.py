@@ -1,38 +1,45 @@
 import asyncio
-import logging
-import sys
-import os
-import json
+import signal
 
 from .queue_manager import queue_manager
 from .workflow import workflow_manager
 from .config import settings
+from .consumer import Consumer
 from .utils.logging_utils import setup_logging, get_logger
+from .state import state_manager
+from .llms.http_client import close_http_client
 
 # Configure logging
 setup_logging()
 logger = get_logger("llm_worker")
 
+async def handle_task(task: dict):
+    logger.info("Task received: %s", task.get("chunk_id", "Unknown ID"))
+    await workflow_manager.pr_review_workflow(task)
+
 async def worker_loop():
     logger.info("LLM worker started. Listening to queue: %s", settings.LLM_QUEUE)
-    
+    # Each handler mostly waits on the model API, so many can share one process
+    consumer = Consumer(
+        settings.LLM_QUEUE,
+        handle_task,
+        concurrency=settings.WORKER_CONCURRENCY,
+        prefetch=settings.WORKER_PREFETCH,
+        drain_timeout=settings.WORKER_DRAIN_TIMEOUT
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, consumer.stop)
+
     try:
         # Establish connection
         await queue_manager.connect()
-        
-        # Consume messages
-        async for message in queue_manager.consume(settings.LLM_QUEUE):
-            async with message.process():
-                try:
-                    task = json.loads(message.body)
-                    logger.info("Task received: %s", task.get("chunk_id", "Unknown ID"))
-                    await workflow_manager.pr_review_workflow(task)
-                except Exception as e:
-                    logger.exception("Error processing LLM task: %s", e)
-                    # Automatically Nacked/Acked based on success/failure in block
-                    
+        await consumer.run()
     except Exception as e:
         logger.critical("Critical LLM worker failure: %s", e)
+    finally:
+        await close_http_client()
+        await state_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(worker_loop())
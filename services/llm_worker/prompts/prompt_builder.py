@@ -5,7 +5,7 @@ class PromptBuilder:
         # 1. Get System Prompt
         system_prompt = get_system_prompt()
         
-        # 2. Build User Message
+        # 2. Build User Message (everything chunk-specific goes after the cached system prompt)
         user_message = (
             f"Repository ID: {repo_id}\n"
             f"PR ID: {pr_id}\n"
@@ -20,6 +20,29 @@ class PromptBuilder:
             {"role": "user", "content": user_message}
         ]
 
+    def build_batch_messages(self, chunks: list, repo_id: str, pr_id: str) -> list:
+        # Several chunks of one file under a single system prompt
+        system_prompt = get_system_prompt()
+
+        sections = "\n\n".join(
+            f"### Chunk {chunk.get('chunk_id')}\n{chunk.get('diff_snippet')}" for chunk in chunks
+        )
+        user_message = (
+            f"Repository ID: {repo_id}\n"
+            f"PR ID: {pr_id}\n"
+            f"File: {chunks[0].get('filename')}\n"
+            f"This file has {len(chunks)} separate diff chunks. Review each one on its own.\n\n"
+            f"{sections}\n\n"
+            f"Return one JSON object of the form {{\"reviews\": [...]}} with exactly one entry per chunk. "
+            f"Each entry is the usual response object plus the \"chunk_id\" it answers. "
+            f"If a chunk needs more context, set its \"model\" to \"tool\" and it will be reviewed separately."
+        )
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+
     def build_context_message(self, context_data: dict) -> dict:
         # This is used when the git worker returns with additional context
         tool_name = context_data.get("tool")
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from .reviewer_prompt import PERFORMANCE_FOCUSED_PROMPT
 from ..config import settings
 
@@ -5,19 +7,25 @@ PROMPT_REGISTRY = {
     "performance": PERFORMANCE_FOCUSED_PROMPT
 }
 
+@lru_cache(maxsize=32)
+def _render(system_prompt_name: str, values: tuple) -> str:
+    return PROMPT_REGISTRY[system_prompt_name].format(**dict(values))
+
 def get_system_prompt(**kwargs) -> str:
+    """
+    The system prompt is the shared prefix that provider prompt caching keys on, so
+    it is rendered once per set of values and must not carry per-chunk data.
+    """
     # Use config if available, otherwise default to performance
     system_prompt_name = getattr(settings, "SYSTEM_PROMPT_NAME", "performance")
     
     if system_prompt_name not in PROMPT_REGISTRY:
         system_prompt_name = "performance"
     
-    prompt_template = PROMPT_REGISTRY.get(system_prompt_name)
-    
     # Default values for common keys if not provided
     defaults = {
         "previous_feedback": "None"
     }
     defaults.update(kwargs)
     
-    return prompt_template.format(**defaults)
\ No newline at end of file
+    return _render(system_prompt_name, tuple(sorted(defaults.items())))
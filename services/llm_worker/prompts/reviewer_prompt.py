@@ -24,7 +24,10 @@ You have access to tools to fetch more context if the 10-line diff is insufficie
 2. `get_function_content(repo_id, file_path, function_name)`:
    - Returns the FULL source code of a specific function or class.
    - Use this if you need to understand the logic surrounding a change (e.g. error handling, global variables).
-3. `read_file(repo_id, file_path)`:
+3. `find_definition(symbol)`:
+   - Returns the source of a function/class defined anywhere in the repository, with its file and line.
+   - Use this when the diff calls or extends a symbol from another file and you do not know where it lives.
+4. `read_file(repo_id, file_path)`:
    - Returns the ENTIRE content of a file.
    - Use this as a fallback if you need the complete context of a file.
 
@@ -59,7 +62,7 @@ Rules:
    - Set "model": "tool"
    - Fill "tool_call" with a dictionary:
      {{
-       "tool": "get_function_structure",
+       "tool": "get_function_content",
        "args": {{
          "file_path": "path/to/file.py",
          "function_name": "function_name"
@@ -40,17 +40,14 @@ class QueueManager:
             routing_key=queue_name
         )
 
-    async def consume(self, queue_name: str):
+    async def get_queue(self, queue_name: str, prefetch_count: int = 1):
+        """
+        Declares a queue for consuming; prefetch_count caps unacked deliveries on this channel.
+        """
         if not self.channel or self.channel.is_closed:
             await self.connect()
-            
-        queue = await self.channel.declare_queue(queue_name, durable=True)
-        # Set persistent prefetch count to 1 for fair dispatch
-        await self.channel.set_qos(prefetch_count=1)
-        
-        # Return the async iterator
-        async with queue.iterator() as queue_iter:
-            async for message in queue_iter:
-                yield message
+
+        await self.channel.set_qos(prefetch_count=prefetch_count)
+        return await self.channel.declare_queue(queue_name, durable=True)
 
 queue_manager = QueueManager()
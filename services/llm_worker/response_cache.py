@@ -0,0 +1,98 @@
+import time
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from .models import Chunk
+from .state import state_manager
+from .config import settings
+from .utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "metrics:llm_response_cache"
+LRU_KEY = "llm_cache:lru"
+
+class ResponseCache:
+    """
+    Reuses LLM answers for byte-identical chunks across PRs and branches.
+
+    The key hashes the provider, model, system prompt, filename, the diff snippet with
+    line endings and trailing whitespace normalized, and every message after the initial
+    review request (tool calls and their context). Repository and PR IDs are left out, so
+    a backport or cherry-pick of the same change hits. Line numbers stay in the snippet,
+    so a cached comment always points at the right line.
+
+    Entries live in `llm_cache:{hash}` for LLM_RESPONSE_CACHE_TTL; `llm_cache:lru` ranks
+    them by last use and the least recently used are evicted past
+    LLM_RESPONSE_CACHE_MAX_ENTRIES. Fails open when Redis is unavailable.
+    """
+    @staticmethod
+    def _normalize(snippet: str) -> str:
+        lines = (snippet or "").replace("\r\n", "\n").split("\n")
+        return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+    def key(self, llm, system_prompt: str, chunk: Chunk, context: List[Dict[str, str]]) -> str:
+        identity = json.dumps([
+            f"{llm.name}/{llm.model}",
+            hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+            chunk.filename,
+            self._normalize(chunk.diff_snippet),
+            [[m["role"], m["content"]] for m in context]
+        ])
+        return f"llm_cache:{hashlib.sha256(identity.encode('utf-8')).hexdigest()}"
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached answer for the key, or None.
+        """
+        if not settings.LLM_RESPONSE_CACHE_ENABLED:
+            return None
+        redis = state_manager.redis
+        try:
+            entry = await redis.hgetall(key)
+            pipe = redis.pipeline(transaction=False)
+            if entry:
+                pipe.zadd(LRU_KEY, {key: time.time()})
+                pipe.expire(key, settings.LLM_RESPONSE_CACHE_TTL)
+                pipe.hincrby(METRICS_KEY, "hits", 1)
+                pipe.hincrby(METRICS_KEY, "tokens_saved", int(entry.get("tokens", 0)))
+            else:
+                pipe.hincrby(METRICS_KEY, "misses", 1)
+            await pipe.execute()
+        except aioredis.RedisError as e:
+            logger.warning(f"LLM response cache unavailable: {e}")
+            return None
+        return entry.get("response") if entry else None
+
+    async def put(self, key: str, response: str, prompt: str):
+        """
+        Stores an answer with the tokens a hit will save, then evicts past the size limit.
+        """
+        if not settings.LLM_RESPONSE_CACHE_ENABLED:
+            return
+        redis = state_manager.redis
+        try:
+            pipe = redis.pipeline(transaction=True)
+            pipe.hset(key, mapping={"response": response, "tokens": estimate_tokens(prompt) + estimate_tokens(response)})
+            pipe.expire(key, settings.LLM_RESPONSE_CACHE_TTL)
+            pipe.zadd(LRU_KEY, {key: time.time()})
+            pipe.zcard(LRU_KEY)
+            size = (await pipe.execute())[-1]
+
+            excess = size - settings.LLM_RESPONSE_CACHE_MAX_ENTRIES
+            if excess > 0:
+                evicted = [member for member, _ in await redis.zpopmin(LRU_KEY, excess)]
+                if evicted:
+                    await redis.delete(*evicted)
+                    await redis.hincrby(METRICS_KEY, "evictions", len(evicted))
+        except aioredis.RedisError as e:
+            logger.warning(f"Failed to cache LLM response: {e}")
+
+    async def get_stats(self) -> Dict[str, int]:
+        return {k: int(v) for k, v in (await state_manager.redis.hgetall(METRICS_KEY)).items()}
+
+response_cache = ResponseCache()
@@ -0,0 +1,97 @@
+import json
+import redis.asyncio as aioredis
+from typing import Optional, List, Tuple
+from .config import settings
+from .models import Chunk, ChunkStatus, ReviewRequest
+
+# Chunks in these states may still produce a comment; `review_inflight_chunks:{id}`
+# holds them so the git worker can tell a review finished without reading every chunk
+IN_FLIGHT_STATUSES = {
+    ChunkStatus.PENDING, ChunkStatus.LLM_IN_PROGRESS,
+    ChunkStatus.TOOL_REQUIRED, ChunkStatus.CONTEXT_READY
+}
+
+def track_in_flight(pipe, chunk: Chunk):
+    """Queues the in-flight set update for the chunk's current status on `pipe`."""
+    key = f"review_inflight_chunks:{chunk.review_request_id}"
+    if chunk.status in IN_FLIGHT_STATUSES:
+        pipe.sadd(key, chunk.chunk_id)
+    else:
+        pipe.srem(key, chunk.chunk_id)
+
+class StateManager:
+    """
+    Async Redis access for chunks, review requests and conversations.
+    All calls share one connection pool, so concurrent tasks never block the event loop.
+    """
+    def __init__(self):
+        self.pool = aioredis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True
+        )
+        self.redis = aioredis.Redis(connection_pool=self.pool)
+
+    async def close(self):
+        await self.redis.aclose()
+        await self.pool.disconnect()
+
+    async def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
+        data = await self.redis.get(f"chunk:{chunk_id}")
+        if data:
+            return Chunk.model_validate_json(data)
+        return None
+
+    async def save_chunk(self, chunk: Chunk):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(f"chunk:{chunk.chunk_id}", chunk.model_dump_json())
+        track_in_flight(pipe, chunk)
+        await pipe.execute()
+
+    async def get_file_chunks(self, review_request_id: str, filename: str) -> List[Chunk]:
+        """Loads the chunks of one file of a review, through the per-file index."""
+        chunk_ids = list(await self.redis.smembers(f"review_file_chunks:{review_request_id}:{filename}"))
+        if not chunk_ids:
+            return []
+        values = await self.redis.mget([f"chunk:{cid}" for cid in chunk_ids])
+        return [Chunk.model_validate_json(v) for v in values if v]
+
+    async def get_review_request(self, review_request_id: str) -> Optional[ReviewRequest]:
+        data = await self.redis.get(f"review_request:{review_request_id}")
+        if data:
+            return ReviewRequest.model_validate_json(data)
+        return None
+
+    async def is_review_cancelled(self, review_request_id: str) -> bool:
+        """True once the webhook has superseded this review with a newer head."""
+        return bool(await self.redis.exists(f"review_cancelled:{review_request_id}"))
+
+    async def get_conversation(self, key: str, head: int, tail: int) -> Tuple[List[dict], List[dict], int]:
+        """
+        Reads the first `head` and last `tail` messages of a conversation list, with
+        its length, without loading the messages in between.
+        """
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrange(key, 0, head - 1)
+        pipe.lrange(key, -tail, -1)
+        pipe.llen(key)
+        try:
+            first, last, length = await pipe.execute()
+        except aioredis.ResponseError:
+            # Stored as one JSON blob by an older worker: convert it to a list in place
+            messages = json.loads(await self.redis.get(key))
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.delete(key)
+            if messages:
+                pipe.rpush(key, *[json.dumps(m) for m in messages])
+            await pipe.execute()
+            return messages[:head], messages[-tail:], len(messages)
+        return [json.loads(m) for m in first], [json.loads(m) for m in last], length
+
+    async def append_conversation(self, key: str, messages: List[dict], ttl: int):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.rpush(key, *[json.dumps(m) for m in messages])
+        pipe.expire(key, ttl)
+        await pipe.execute()
+
+state_manager = StateManager()
@@ -0,0 +1,34 @@
+import logging
+from typing import Dict
+
+from .state import state_manager
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "metrics:llm_usage"
+
+class UsageRecorder:
+    """
+    Adds the token counts of every LLM call to a Redis hash shared by all workers
+    (`{provider}:{counter}` fields), so prompt-cache savings can be read directly:
+    cached_input_tokens against input_tokens.
+    """
+    async def record(self, provider: str, usage: Dict[str, int]):
+        if not usage:
+            return
+        provider = provider.lower()
+        try:
+            pipe = state_manager.redis.pipeline(transaction=False)
+            pipe.hincrby(METRICS_KEY, f"{provider}:requests", 1)
+            for counter, value in usage.items():
+                if value:
+                    pipe.hincrby(METRICS_KEY, f"{provider}:{counter}", int(value))
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record LLM usage: {e}")
+        logger.debug(f"{provider} usage: {usage}")
+
+    async def get_stats(self) -> Dict[str, int]:
+        return {k: int(v) for k, v in (await state_manager.redis.hgetall(METRICS_KEY)).items()}
+
+usage_recorder = UsageRecorder()
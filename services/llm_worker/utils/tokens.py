@@ -0,0 +1,18 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count of a text (~4 characters per token), good enough for budgets.
+    """
+    return len(text or "") // 4 + 1
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Cuts a text down to about `budget` tokens, keeping its beginning and end on line
+    boundaries and marking what was left out.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    max_chars = budget * 4
+    head = text[:max_chars * 2 // 3].rsplit("\n", 1)[0]
+    tail = text[-(max_chars // 3):].split("\n", 1)[-1]
+    omitted = len(text) - len(head) - len(tail)
+    return f"{head}\n[... {omitted} characters omitted to fit the token budget ...]\n{tail}"
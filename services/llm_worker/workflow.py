@@ -1,28 +1,25 @@
 import json
 import logging
-import redis
+from typing import List
 from .conversation_manager import conversation_manager
 from .llms.factory import get_llm_client
 from .prompts.prompt_builder import prompt_builder
+from .prompts.prompt_registry import get_system_prompt
 from .models import Chunk, ChunkStatus, Action
 from .config import settings
 from .queue_manager import queue_manager
+from .state import state_manager
+from .chunk_batcher import chunk_batcher, SOLO
+from .response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
+# A chunk message is only acted on while the orchestrator has handed the chunk to the LLM
+REVIEWABLE_STATUSES = {ChunkStatus.LLM_IN_PROGRESS, ChunkStatus.CONTEXT_READY}
+
 class WorkflowManager:
     def __init__(self):
         self.llm = get_llm_client()
-        self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
-
-    def _get_chunk(self, chunk_id: str) -> Chunk:
-        data = self.redis.get(f"chunk:{chunk_id}")
-        if data:
-            return Chunk.model_validate_json(data)
-        return None
-
-    def _update_chunk(self, chunk: Chunk):
-        self.redis.set(f"chunk:{chunk.chunk_id}", chunk.model_dump_json())
 
     async def pr_review_workflow(self, payload: dict):
         chunk_id = payload.get("chunk_id")
@@ -30,58 +27,99 @@ class WorkflowManager:
             logger.error("No chunk_id in payload")
             return
 
-        chunk = self._get_chunk(chunk_id)
+        chunk = await state_manager.get_chunk(chunk_id)
         if not chunk:
             logger.error(f"Chunk {chunk_id} not found")
             return
 
+        # Skip chunks of reviews superseded by a newer push
+        if await state_manager.is_review_cancelled(chunk.review_request_id):
+            chunk.status = ChunkStatus.CANCELLED
+            await state_manager.save_chunk(chunk)
+            logger.info(f"Chunk {chunk_id} belongs to a superseded review, cancelled.")
+            return
+
+        # Duplicate messages (e.g. a sibling already answered by a batch) have nothing left to do
+        if chunk.status not in REVIEWABLE_STATUSES:
+            logger.info(f"Chunk {chunk_id} in status {chunk.status}, skipping.")
+            return
+        owner = await chunk_batcher.get_owner(chunk_id) if settings.LLM_BATCH_ENABLED else None
+        if owner not in (None, chunk_id, SOLO):
+            logger.info(f"Chunk {chunk_id} is reviewed in {owner}'s batch, skipping.")
+            return
+
         logger.info(f"LLM Worker processing chunk {chunk_id} (context_level={chunk.context_level})")
 
         # 1. Load Conversation
-        conversation = conversation_manager.fetch_conversation(
+        conversation = await conversation_manager.fetch_conversation(
             chunk.review_request_id, chunk_id
         )
 
+        # First pass: small chunks of the same file share one request
+        if not conversation and settings.LLM_BATCH_ENABLED and owner != SOLO:
+            batch = await chunk_batcher.take_batch(chunk)
+            if batch is None:
+                logger.info(f"Chunk {chunk_id} is reviewed in another chunk's batch, skipping.")
+                return
+            if len(batch) > 1:
+                await self.review_batch(batch)
+                return
+
+        await self.review_chunk(chunk, conversation)
+
+    async def review_chunk(self, chunk: Chunk, conversation: list):
+        """
+        Runs one LLM turn of a chunk's own conversation and routes the result.
+        """
+        chunk_id = chunk.chunk_id
+
         # Optimization: Need repo/pr info for prompt
         # We can fetch this once if conversation is empty
         repo_id = "unknown"
         pr_id = "unknown"
         
         if not conversation:
-            from .models import ReviewRequest 
-            rr_data = self.redis.get(f"review_request:{chunk.review_request_id}")
-            if rr_data:
-                # We need a ReviewRequest model in llm_worker/models.py to parse this cleanly
-                # Or just use json.loads since we only need fields.
-                # Let's verify models.py has ReviewRequest
-                rr = json.loads(rr_data)
-                repo_id = rr.get("repo_id")
-                pr_id = rr.get("pr_id")
+            review_request = await state_manager.get_review_request(chunk.review_request_id)
+            if review_request:
+                repo_id = review_request.repo_id
+                pr_id = review_request.pr_id
 
         # 2. Add New Message based on Context
+        # Only the messages of this turn are appended to the stored conversation
+        new_messages = []
         if not conversation:
             # Initial review
             conversation = prompt_builder.build_initial_messages(chunk.model_dump(), repo_id, pr_id)
+            new_messages = list(conversation)
         elif chunk.status == ChunkStatus.CONTEXT_READY:
             # Re-evaluating after tool call
             # Assuming metadata contains the tool output
             context_msg = prompt_builder.build_context_message({
                 "tool": chunk.metadata.get("last_tool"),
-                "content": chunk.metadata.get("tool_output", "No content found")
+                "content": conversation_manager.fit_tool_output(chunk.metadata.get("tool_output", "No content found"))
             })
             conversation.append(context_msg)
+            new_messages.append(context_msg)
         
         # 3. Call LLM
         try:
             chunk.status = ChunkStatus.LLM_IN_PROGRESS
-            self._update_chunk(chunk)
+            await state_manager.save_chunk(chunk)
 
-            response_text = self.llm.generate_response(conversation)
-            llm_result = json.loads(response_text)
+            # Identical snippet and tool context seen before (e.g. a backport): reuse the answer
+            cache_key = response_cache.key(self.llm, conversation[0]["content"], chunk, conversation[2:])
+            response_text = await response_cache.get(cache_key)
+            if response_text is not None:
+                logger.info(f"Chunk {chunk_id} answered from the response cache")
+                llm_result = json.loads(response_text)
+            else:
+                response_text = await self.llm.agenerate_response(conversation)
+                llm_result = json.loads(response_text)
+                await response_cache.put(cache_key, response_text, "".join(m["content"] for m in conversation))
             
             # Save assistant response to history
-            conversation.append(conversation_manager.create_message("assistant", response_text))
-            conversation_manager.save_conversation(chunk.review_request_id, chunk_id, conversation)
+            new_messages.append(conversation_manager.create_message("assistant", response_text))
+            await conversation_manager.append_messages(chunk.review_request_id, chunk_id, new_messages)
 
             # 4. Parse Result & Route
             model_type = llm_result.get("model") # 'answer' or 'tool'
@@ -91,7 +129,7 @@ class WorkflowManager:
                 chunk.status = ChunkStatus.TOOL_REQUIRED
                 chunk.metadata["last_tool"] = tool_call.get("tool")
                 chunk.metadata["tool_args"] = tool_call.get("args")
-                self._update_chunk(chunk)
+                await state_manager.save_chunk(chunk)
                 
                 # Enqueue to GIT_QUEUE for tool execution
                 await queue_manager.enqueue(settings.GIT_QUEUE, {
@@ -101,30 +139,90 @@ class WorkflowManager:
                 logger.info(f"Chunk {chunk_id} needs tool call: {chunk.metadata['last_tool']}")
 
             elif model_type == "answer":
-                comments = llm_result.get("content", [])
-                if comments:
-                    # For now, we only handle the first comment as per git_worker current structure
-                    # Ideally, we should loop or handle multiple.
-                    # Fixing for current git_worker flow:
-                    main_comment = comments[0]
-                    chunk.comment_body = main_comment.get("comment")
-                    chunk.line_number = main_comment.get("line")
-                    chunk.status = ChunkStatus.COMMENT_READY
-                    self._update_chunk(chunk)
-                    
-                    await queue_manager.enqueue(settings.GIT_QUEUE, {
-                        "action": Action.GIT_COMMENT.value,
-                        "chunk_id": chunk_id
-                    })
-                    logger.info(f"Chunk {chunk_id} generated comment on line {chunk.line_number}")
-                else:
-                    chunk.status = ChunkStatus.COMPLETED
-                    self._update_chunk(chunk)
-                    logger.info(f"Chunk {chunk_id} completed (no issues)")
+                await self._apply_answer(chunk, llm_result.get("content", []))
 
         except Exception as e:
             logger.exception(f"Error in LLM workflow for chunk {chunk_id}: {e}")
             chunk.status = ChunkStatus.FAILED
-            self._update_chunk(chunk)
+            await state_manager.save_chunk(chunk)
+
+    async def review_batch(self, chunks: List[Chunk]):
+        """
+        Reviews several chunks of one file in a single request and demultiplexes the
+        answer by chunk_id. Chunks that ask for a tool, or that the answer leaves out,
+        are released from the batch and re-enqueued to be reviewed on their own.
+        """
+        review_request = await state_manager.get_review_request(chunks[0].review_request_id)
+        repo_id = review_request.repo_id if review_request else "unknown"
+        pr_id = review_request.pr_id if review_request else "unknown"
+
+        for chunk in chunks:
+            chunk.status = ChunkStatus.LLM_IN_PROGRESS
+            await state_manager.save_chunk(chunk)
+
+        # Each chunk is cached under the same key as its own first turn
+        system_prompt = get_system_prompt()
+        cache_keys = {c.chunk_id: response_cache.key(self.llm, system_prompt, c, []) for c in chunks}
+        reviews = {}
+        for chunk in chunks:
+            cached = await response_cache.get(cache_keys[chunk.chunk_id])
+            if cached is not None:
+                reviews[chunk.chunk_id] = json.loads(cached)
+
+        uncached = [c for c in chunks if c.chunk_id not in reviews]
+        try:
+            if uncached:
+                messages = prompt_builder.build_batch_messages([c.model_dump() for c in uncached], repo_id, pr_id)
+                llm_result = json.loads(await self.llm.agenerate_response(messages))
+                for review in llm_result.get("reviews", []):
+                    chunk_id = review.get("chunk_id") if isinstance(review, dict) else None
+                    if chunk_id not in cache_keys or chunk_id in reviews:
+                        continue
+                    reviews[chunk_id] = review
+                    if review.get("model") == "answer":
+                        answer = {k: v for k, v in review.items() if k != "chunk_id"}
+                        snippet = next(c.diff_snippet for c in uncached if c.chunk_id == chunk_id)
+                        await response_cache.put(cache_keys[chunk_id], json.dumps(answer), system_prompt + snippet)
+        except Exception as e:
+            logger.warning(f"Batched review of {len(uncached)} chunks failed, re-enqueuing them one by one: {e}")
+
+        leftovers = []
+        for chunk in chunks:
+            review = reviews.get(chunk.chunk_id)
+            if review and review.get("model") == "answer":
+                await self._apply_answer(chunk, review.get("content", []))
+            else:
+                leftovers.append(chunk)
+
+        logger.info(
+            f"Batch of {len(chunks)} chunks answered {len(chunks) - len(leftovers)} in one request "
+            f"({len(chunks) - len(uncached)} from the response cache)"
+        )
+        if leftovers:
+            await chunk_batcher.release(leftovers)
+            for chunk in leftovers:
+                await queue_manager.enqueue(settings.LLM_QUEUE, {"chunk_id": chunk.chunk_id})
+
+    async def _apply_answer(self, chunk: Chunk, comments: List[dict]):
+        chunk_id = chunk.chunk_id
+        if comments:
+            # For now, we only handle the first comment as per git_worker current structure
+            # Ideally, we should loop or handle multiple.
+            # Fixing for current git_worker flow:
+            main_comment = comments[0]
+            chunk.comment_body = main_comment.get("comment")
+            chunk.line_number = main_comment.get("line")
+            chunk.status = ChunkStatus.COMMENT_READY
+            await state_manager.save_chunk(chunk)
+
+            await queue_manager.enqueue(settings.GIT_QUEUE, {
+                "action": Action.GIT_COMMENT.value,
+                "chunk_id": chunk_id
+            })
+            logger.info(f"Chunk {chunk_id} generated comment on line {chunk.line_number}")
+        else:
+            chunk.status = ChunkStatus.COMPLETED
+            await state_manager.save_chunk(chunk)
+            logger.info(f"Chunk {chunk_id} completed (no issues)")
 
 workflow_manager = WorkflowManager()
\ No newline at end of file
@@ -1,3 +1,5 @@
+from typing import Optional
+
 NODE_TYPES = {
     "python": {
         "class_definition": "Class",
@@ -45,4 +47,23 @@ NODE_TYPES = {
         "method": "Function",
         "module": "Class",
     }
-}
\ No newline at end of file
+}
+
+# Maps file extensions to tree-sitter language names
+EXTENSION_LANGUAGES = {
+    'py': 'python',
+    'js': 'javascript',
+    'ts': 'typescript',
+    'tsx': 'tsx',
+    'go': 'go',
+    'java': 'java',
+    'rs': 'rust',
+    'cpp': 'cpp',
+    'cc': 'cpp',
+    'c': 'c',
+    'rb': 'ruby'
+}
+
+def language_for_file(filename: str) -> Optional[str]:
+    """Maps a file name to its tree-sitter language name, if supported."""
+    return EXTENSION_LANGUAGES.get(filename.split('.')[-1].lower())
@@ -1,7 +1,26 @@
 import importlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from tree_sitter import Parser, Language
 from .language import NODE_TYPES
 
+def _line_offsets(source: bytes) -> List[int]:
+    """Byte offset of every line start, followed by the end of the source."""
+    offsets = [0]
+    index = source.find(b"\n")
+    while index != -1:
+        offsets.append(index + 1)
+        index = source.find(b"\n", index + 1)
+    if offsets[-1] != len(source):
+        offsets.append(len(source))
+    return offsets
+
+def _advance(point: Tuple[int, int], text: bytes) -> Tuple[int, int]:
+    """Point reached after inserting text at point (columns are in bytes)."""
+    newlines = text.count(b"\n")
+    if not newlines:
+        return (point[0], point[1] + len(text))
+    return (point[0] + newlines, len(text) - text.rfind(b"\n") - 1)
+
 class UniversalParser:
     def __init__(self):
         self.parsers = {}
@@ -33,32 +52,97 @@ class UniversalParser:
             self.parsers[language_name] = Parser(lang)
         return self.parsers[language_name]
 
-    def get_semantic_tokens(self, content: str, language_name: str) -> str:
-        """Extracts a normalized string of semantic tokens (ignoring comments/whitespace)."""
-        try:
-            parser = self.get_parser(language_name)
-            tree = parser.parse(bytes(content, "utf8"))
-            tokens = []
-            self._walk_semantic(tree.root_node, tokens)
-            return "".join(tokens)
-        except Exception:
-            return ""
-
-    def _walk_semantic(self, node, tokens):
-        """Recursively collects semantic tokens, ignoring comments."""
-        # Tree-sitter 'extra' nodes are usually comments/whitespace
-        # We also check for 'comment' in the type string for robustness
-        if node.is_extra or "comment" in node.type:
-            return
-
-        if not node.children:
-            text = node.text.decode("utf8").strip()
-            if text:
-                tokens.append(text)
-            return
+    def parse(self, content: str, language_name: str):
+        """Parses content and returns (tree, source bytes)."""
+        source = content.encode("utf8")
+        return self.get_parser(language_name).parse(source), source
 
-        for child in node.children:
-            self._walk_semantic(child, tokens)
+    def reparse_with_hunks(
+        self,
+        old_tree,
+        old_source: bytes,
+        new_content: str,
+        language_name: str,
+        hunks: List[Tuple[int, int, int, int]]
+    ) -> Optional[Tuple[Any, bytes]]:
+        """
+        Builds the head tree from the base tree instead of parsing from scratch:
+        each diff hunk (old_start, old_count, new_start, new_count) becomes a Tree.edit,
+        then the head is reparsed incrementally. Returns (tree, source), or None when
+        the hunks do not turn old_source into new_content exactly.
+        """
+        new_source = new_content.encode("utf8")
+        old_offsets = _line_offsets(old_source)
+        new_offsets = _line_offsets(new_source)
+
+        spans = []
+        for old_start, old_count, new_start, new_count in hunks:
+            # A zero count means "insert/delete after this line"
+            old_row = old_start - 1 if old_count else old_start
+            new_row = new_start - 1 if new_count else new_start
+            if old_row + old_count >= len(old_offsets) or new_row + new_count >= len(new_offsets):
+                return None
+            spans.append((
+                old_row,
+                old_offsets[old_row], old_offsets[old_row + old_count],
+                new_offsets[new_row], new_offsets[new_row + new_count]
+            ))
+
+        # A stale or truncated patch would silently corrupt the tree, so the edits
+        # must rebuild the head byte for byte
+        rebuilt, position = [], 0
+        for _, old_begin, old_end, new_begin, new_end in spans:
+            if old_begin < position:
+                return None
+            rebuilt.append(old_source[position:old_begin])
+            rebuilt.append(new_source[new_begin:new_end])
+            position = old_end
+        rebuilt.append(old_source[position:])
+        if b"".join(rebuilt) != new_source:
+            return None
+
+        edited = old_tree.copy()
+        # Last hunk first, so every edit's offsets are still those of the base
+        for row, old_begin, old_end, new_begin, new_end in reversed(spans):
+            start = (row, 0)
+            edited.edit(
+                start_byte=old_begin,
+                old_end_byte=old_end,
+                new_end_byte=old_begin + (new_end - new_begin),
+                start_point=start,
+                old_end_point=_advance(start, old_source[old_begin:old_end]),
+                new_end_point=_advance(start, new_source[new_begin:new_end])
+            )
+        # Tree.changed_ranges is not used: on tree-sitter 0.26 it returns garbage
+        # rows (and can crash the process) when several edits hit a large tree
+        return self.get_parser(language_name).parse(new_source, edited), new_source
+
+    def iter_tree_tokens(self, tree, source: bytes, first_row: int = 0, last_row: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Yields the non-comment leaves of an already parsed tree that overlap rows
+        [first_row, last_row] (0-based, inclusive). Subtrees outside the rows are skipped.
+        Walks the tree with a TreeCursor, so deep files cannot hit the recursion limit
+        and consumers can stop at the first token they care about.
+        """
+        cursor = tree.walk()
+        while True:
+            node = cursor.node
+            if last_row is not None and node.start_point[0] > last_row:
+                # Everything after this node starts later still
+                return
+            # Tree-sitter 'extra' nodes are usually comments/whitespace
+            # We also check for 'comment' in the type string for robustness
+            skip = node.is_extra or "comment" in node.type or node.end_point[0] < first_row
+            if not skip:
+                if node.child_count == 0:
+                    token = source[node.start_byte:node.end_byte].strip()
+                    if token:
+                        yield token
+                elif cursor.goto_first_child():
+                    continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return
 
     def parse_structure(self, content: str, language_name: str) -> str:
         try:
@@ -95,6 +179,31 @@ class UniversalParser:
         for child in node.children:
             self._walk(child, lang, results, visited_lines)
 
+    def extract_symbols(self, content: str, language_name: str) -> List[Dict[str, Any]]:
+        """
+        Lists every class/function definition (see NODE_TYPES) with its name, kind,
+        1-based start line and byte range, in source order. Nested definitions are included.
+        """
+        mapping = NODE_TYPES.get(language_name, {})
+        tree, _ = self.parse(content, language_name)
+        symbols = []
+        cursor = tree.walk()
+        while True:
+            node = cursor.node
+            if node.type in mapping:
+                symbols.append({
+                    "name": self._extract_name(node),
+                    "kind": mapping[node.type],
+                    "line": node.start_point[0] + 1,
+                    "start_byte": node.start_byte,
+                    "end_byte": node.end_byte
+                })
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return symbols
+
     def _extract_name(self, node):
         """Finds the most logical identifier for a definition node."""
         # Generic name-holding child types across many grammars
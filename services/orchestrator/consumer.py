@@ -0,0 +1,84 @@
+import json
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from .queue_manager import queue_manager
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class Consumer:
+    """
+    Consumes a queue with up to `concurrency` handlers in flight per process.
+
+    The broker prefetch bounds how many unacked messages are delivered, the semaphore
+    bounds how many handlers run; each message is acked when its own handler finishes.
+    `stop()` cancels the subscription, and `run()` returns once in-flight handlers have
+    drained (or `drain_timeout` expires, in which case the rest are requeued).
+    """
+    def __init__(
+        self,
+        queue_name: str,
+        handler: Handler,
+        concurrency: int,
+        prefetch: Optional[int] = None,
+        drain_timeout: float = 60.0
+    ):
+        self.queue_name = queue_name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.prefetch = prefetch or concurrency
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopped = asyncio.Event()
+
+    async def run(self):
+        queue = await queue_manager.get_queue(self.queue_name, prefetch_count=self.prefetch)
+        consumer_tag = await queue.consume(self._on_message)
+        logger.info(f"Consuming {self.queue_name} (concurrency={self.concurrency}, prefetch={self.prefetch})")
+        try:
+            await self._stopped.wait()
+        finally:
+            try:
+                await queue.cancel(consumer_tag)
+            except Exception as e:
+                logger.warning(f"Failed to cancel consumer on {self.queue_name}: {e}")
+            await self.drain()
+
+    def stop(self):
+        """Stops taking new messages; safe to call from a signal handler."""
+        self._stopped.set()
+
+    async def _on_message(self, message):
+        task = asyncio.create_task(self._handle(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, message):
+        async with self._slots:
+            # Unfinished messages (cancelled during shutdown) go back to the queue
+            async with message.process(requeue=True):
+                try:
+                    task = json.loads(message.body)
+                except ValueError as e:
+                    logger.error(f"Dropping malformed message on {self.queue_name}: {e}")
+                    return
+                try:
+                    await self.handler(task)
+                except Exception as e:
+                    logger.exception(f"Error processing message from {self.queue_name}: {e}")
+
+    async def drain(self):
+        """Waits for in-flight handlers; cancels whatever outlives the drain timeout."""
+        if not self._tasks:
+            return
+        logger.info(f"Draining {len(self._tasks)} in-flight messages from {self.queue_name}")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"{len(pending)} messages did not finish within {self.drain_timeout}s and were requeued")
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -1,28 +1,106 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple, Awaitable, Iterable, AsyncIterator
+from ..config import settings
+from .blob_cache import blob_cache
 
 class BaseOps(ABC):
     def __init__(self):
         pass
 
     @abstractmethod
-    def get_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> List[Dict[str, Any]]:
+    def iter_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> AsyncIterator[List[Dict[str, Any]]]:
         """
-        Fetch the list of files changed in a PR with their patches.
+        Stream the files changed in a PR, one API page at a time, following
+        the provider's pagination until every file has been yielded.
+        """
+        raise NotImplementedError
+
+    async def get_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> List[Dict[str, Any]]:
+        """
+        Fetch the full list of files changed in a PR with their patches.
+        """
+        files = []
+        async for page in self.iter_pull_request_file_diffs(repo_id, pr_id):
+            files.extend(page)
+        return files
+
+    @abstractmethod
+    async def get_compare_file_diffs(self, repo_id: str, base_ref: str, head_ref: str) -> List[Dict[str, Any]]:
+        """
+        Fetch the files changed between two commits (used for incremental re-reviews).
         """
         raise NotImplementedError
 
     @abstractmethod
-    def get_pull_request(self, repo_id: str, pr_id: int) -> dict:
+    async def get_pull_request(self, repo_id: str, pr_id: int) -> dict:
         """
         Fetch the pull request metadata.
         """
         raise NotImplementedError
 
     @abstractmethod
-    def get_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
+    async def _fetch_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
         """
-        Fetch the content of a specific file at a given ref (SHA or branch).
+        Download the content of a specific file at a given ref from the provider.
         """
         raise NotImplementedError
 
-    
+    async def _fetch_file_contents(self, repo_id: str, files: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Download many (file_path, ref) pairs. Providers with a batch API should
+        override this; the default fans out _fetch_file_content with bounded concurrency.
+        """
+        async def fetch(item: Tuple[str, str]) -> Optional[str]:
+            try:
+                return await self._fetch_file_content(repo_id, item[0], ref=item[1])
+            except Exception:
+                return None
+
+        contents = await self._gather_bounded(fetch(item) for item in files)
+        return dict(zip(files, contents))
+
+    async def get_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
+        """
+        Fetch the content of a specific file at a given ref (SHA or branch),
+        served from the blob cache when this version was seen before.
+        """
+        cached = await blob_cache.get_many(repo_id, [(file_path, ref)])
+        if (file_path, ref) in cached:
+            return cached[(file_path, ref)]
+        content = await self._fetch_file_content(repo_id, file_path, ref=ref)
+        await blob_cache.put_many(repo_id, {(file_path, ref): content})
+        return content
+
+    async def get_file_contents(
+        self,
+        repo_id: str,
+        files: List[Tuple[str, str]],
+        blob_shas: Optional[Dict[Tuple[str, str], str]] = None
+    ) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Fetch many (file_path, ref) pairs at once.
+        Pairs that cannot be fetched (missing, binary) map to None.
+        Cached versions are served from the blob cache; only the rest hit the provider.
+        """
+        unique = list(dict.fromkeys(files))
+        if not unique:
+            return {}
+        results: Dict[Tuple[str, str], Optional[str]] = await blob_cache.get_many(repo_id, unique, blob_shas)
+        missing = [item for item in unique if item not in results]
+        if missing:
+            fetched = await self._fetch_file_contents(repo_id, missing)
+            await blob_cache.put_many(repo_id, fetched)
+            results.update(fetched)
+        return results
+
+    @staticmethod
+    async def _gather_bounded(coros: Iterable[Awaitable], limit: int = None) -> List[Any]:
+        """Like asyncio.gather, but runs at most `limit` awaitables at a time."""
+        semaphore = asyncio.Semaphore(limit or settings.SCM_MAX_CONCURRENCY)
+
+        async def run(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(c) for c in coros))
@@ -1,9 +1,11 @@
-import requests
+import httpx
 import logging
 import os
-from typing import List, Dict, Any
+import base64
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from ..config import settings
 from .base_ops import BaseOps
+from .http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -15,18 +17,17 @@ class GithubOps(BaseOps):
             "Authorization": f"token {os.getenv('GITHUB_TOKEN')}",
             "Accept": "application/vnd.github.v3+json"
         }
+        self.http = get_http_client("github", self.headers)
 
-    def _request(self, method: str, endpoint: str, accept: str = None, **kwargs) -> requests.Response:
+    async def _request(self, method: str, endpoint: str, accept: str = None, **kwargs) -> httpx.Response:
         """
         Internal helper for making GitHub API requests.
         """
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        headers = self.headers.copy()
-        if accept:
-            headers["Accept"] = accept
+        url = endpoint if endpoint.startswith("http") else f"{self.base_url}/{endpoint.lstrip('/')}"
+        headers = {"Accept": accept} if accept else None
             
         try:
-            response = requests.request(method, url, headers=headers, timeout=30, **kwargs)
+            response = await self.http.request(method, url, headers=headers, **kwargs)
             
             # Diagnostic for debugging token permissions if needed
             scopes = response.headers.get("X-OAuth-Scopes")
@@ -39,36 +40,101 @@ class GithubOps(BaseOps):
                     f"GitHub API error: [{response.status_code}] {response.text}"
                 )
             return response
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.exception(f"Request to GitHub failed: {e}")
             raise RuntimeError(f"Failed to communicate with GitHub: {str(e)}")
 
-    def get_pull_request(self, repo_id: str, pr_id: int) -> dict:
+    async def get_pull_request(self, repo_id: str, pr_id: int) -> dict:
         """
         Fetch the pull request metadata.
         """
-        response = self._request("GET", f"repos/{repo_id}/pulls/{pr_id}")
+        response = await self._request("GET", f"repos/{repo_id}/pulls/{pr_id}")
         return response.json()
 
-    def get_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> List[Dict[str, Any]]:
+    async def iter_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> AsyncIterator[List[Dict[str, Any]]]:
         """
-        Fetch the list of files changed in a PR with their patches.
+        Stream the files changed in a PR page by page, following `Link: rel="next"`.
         """
-        response = self._request("GET", f"repos/{repo_id}/pulls/{pr_id}/files")
-        return response.json()
+        url = f"repos/{repo_id}/pulls/{pr_id}/files"
+        params = {"per_page": settings.SCM_PAGE_SIZE}
+        while url:
+            response = await self._request("GET", url, params=params)
+            yield response.json()
+            # The next link already carries per_page/page in its query string
+            url = response.links.get("next", {}).get("url")
+            params = None
+
+    async def get_compare_file_diffs(self, repo_id: str, base_ref: str, head_ref: str) -> List[Dict[str, Any]]:
+        """
+        Fetch the files changed between two commits.
+        """
+        response = await self._request("GET", f"repos/{repo_id}/compare/{base_ref}...{head_ref}")
+        return response.json().get("files", [])
 
-    def get_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
+    async def _fetch_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
         """
         Fetch the content of a specific file.
         """
         endpoint = f"repos/{repo_id}/contents/{file_path.lstrip('/')}"
         params = {"ref": ref} if ref else {}
-        response = self._request("GET", endpoint, params=params)
+        response = await self._request("GET", endpoint, params=params)
         
         # GitHub returns base64 encoded content for this endpoint
-        import base64
         data = response.json()
         content = base64.b64decode(data['content']).decode('utf-8')
         return content
 
+    async def _fetch_file_contents(self, repo_id: str, files: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Download many (file_path, ref) pairs using batched GraphQL
+        `object(expression:)` lookups instead of one REST call per file.
+        """
+        size = settings.SCM_CONTENT_BATCH_SIZE
+        batches = [files[i:i + size] for i in range(0, len(files), size)]
+        results: Dict[Tuple[str, str], Optional[str]] = {}
+        for batch_result in await self._gather_bounded(self._fetch_blob_batch(repo_id, b) for b in batches):
+            results.update(batch_result)
+
+        # Blobs GraphQL could not return inline (truncated) fall back to REST
+        for item in [k for k, v in results.items() if v is _TRUNCATED]:
+            try:
+                results[item] = await self._fetch_file_content(repo_id, item[0], ref=item[1])
+            except Exception as e:
+                logger.warning(f"Failed to fetch {item[0]}@{item[1]}: {e}")
+                results[item] = None
+        return results
+
+    async def _fetch_blob_batch(self, repo_id: str, batch: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Any]:
+        owner, name = repo_id.split("/", 1)
+        var_defs = ["$owner: String!", "$name: String!"]
+        fields = []
+        variables = {"owner": owner, "name": name}
+        for i, (path, ref) in enumerate(batch):
+            var_defs.append(f"$e{i}: String!")
+            fields.append(f"f{i}: object(expression: $e{i}) {{ ... on Blob {{ text isBinary isTruncated }} }}")
+            variables[f"e{i}"] = f"{ref}:{path.lstrip('/')}"
+        query = (
+            f"query({', '.join(var_defs)}) {{ repository(owner: $owner, name: $name) {{ "
+            + " ".join(fields)
+            + " } }"
+        )
+
+        response = await self._request(
+            "POST", settings.GITHUB_GRAPHQL_URL, json={"query": query, "variables": variables}
+        )
+
+        repository = (response.json().get("data") or {}).get("repository") or {}
+        results = {}
+        for i, item in enumerate(batch):
+            blob = repository.get(f"f{i}")
+            if not blob or blob.get("isBinary"):
+                results[item] = None
+            elif blob.get("isTruncated") or blob.get("text") is None:
+                results[item] = _TRUNCATED
+            else:
+                results[item] = blob["text"]
+        return results
+
 
+# Sentinel for blobs too large to be returned inline by GraphQL
+_TRUNCATED = object()
@@ -1,10 +1,11 @@
-import requests
+import httpx
 import logging
 import os
-import base64
-from typing import List, Dict, Any
+import urllib.parse
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from ..config import settings
 from .base_ops import BaseOps
+from .http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -14,22 +15,23 @@ class GitlabOps(BaseOps):
         self.headers = {
             "PRIVATE-TOKEN": os.getenv("GITLAB_TOKEN", "")
         }
+        self.http = get_http_client("gitlab", self.headers)
 
-    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+    async def _request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        url = endpoint if endpoint.startswith("http") else f"{self.base_url}/{endpoint.lstrip('/')}"
         try:
-            response = requests.request(method, url, headers=self.headers, timeout=30, **kwargs)
+            response = await self.http.request(method, url, **kwargs)
             if response.status_code not in (200, 201):
                 logger.error(f"GitLab API Error [{response.status_code}]: {response.text}")
                 response.raise_for_status()
             return response
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.exception(f"Request to GitLab failed: {e}")
             raise RuntimeError(f"Failed to communicate with GitLab: {str(e)}")
 
-    def get_pull_request(self, repo_id: str, pr_id: int) -> dict:
+    async def get_pull_request(self, repo_id: str, pr_id: int) -> dict:
         endpoint = f"projects/{repo_id}/merge_requests/{pr_id}"
-        response = self._request("GET", endpoint)
+        response = await self._request("GET", endpoint)
         data = response.json()
         # Normalize to look like GitHub if possible, or handle difference in workflow
         # For now just return the data, mainly needed for sha/ref
@@ -39,29 +41,83 @@ class GitlabOps(BaseOps):
             # Map other fields if necessary
         }
 
-    def get_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> List[Dict[str, Any]]:
-        endpoint = f"projects/{repo_id}/merge_requests/{pr_id}/changes"
-        response = self._request("GET", endpoint)
-        changes = response.json().get("changes", [])
-        
-        # Normalize to internal format
-        results = []
-        for c in changes:
-            results.append({
-                "filename": c.get("new_path"),
-                "patch": c.get("diff")
-            })
-        return results
+    async def iter_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream MR diffs page by page from the paginated `/diffs` endpoint
+        (`/changes` silently truncates large merge requests).
+        """
+        endpoint = f"projects/{repo_id}/merge_requests/{pr_id}/diffs"
+        page = 1
+        while page:
+            response = await self._request("GET", endpoint, params={"page": page, "per_page": settings.SCM_PAGE_SIZE})
+            yield [self._normalize_change(c) for c in response.json()]
+            next_page = response.headers.get("X-Next-Page")
+            page = int(next_page) if next_page else None
+
+    async def get_compare_file_diffs(self, repo_id: str, base_ref: str, head_ref: str) -> List[Dict[str, Any]]:
+        endpoint = f"projects/{repo_id}/repository/compare"
+        response = await self._request("GET", endpoint, params={"from": base_ref, "to": head_ref})
+        return [self._normalize_change(c) for c in response.json().get("diffs", [])]
+
+    @staticmethod
+    def _normalize_change(c: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize a GitLab diff entry to the internal (GitHub-like) format."""
+        return {
+            "filename": c.get("new_path"),
+            "previous_filename": c.get("old_path") if c.get("renamed_file") else None,
+            "patch": c.get("diff"),
+            "status": "added" if c.get("new_file") else "removed" if c.get("deleted_file") else "modified"
+        }
 
-    def get_pull_request_comments(self, repo_id: str, pr_id: int) -> List[Dict[str, Any]]:
+    async def get_pull_request_comments(self, repo_id: str, pr_id: int) -> List[Dict[str, Any]]:
         endpoint = f"projects/{repo_id}/merge_requests/{pr_id}/notes"
-        response = self._request("GET", endpoint)
+        response = await self._request("GET", endpoint)
         return response.json()
 
-    def get_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
-        import urllib.parse
+    async def _fetch_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
         safe_path = urllib.parse.quote(file_path, safe='')
         endpoint = f"projects/{repo_id}/repository/files/{safe_path}/raw"
         params = {"ref": ref} if ref else {}
-        response = self._request("GET", endpoint, params=params)
+        response = await self._request("GET", endpoint, params=params)
         return response.text
+
+    async def _fetch_file_contents(self, repo_id: str, files: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Download many (file_path, ref) pairs using the GraphQL `repository.blobs`
+        field, which resolves a list of paths at one ref in a single query.
+        """
+        if str(repo_id).isdigit():
+            # GraphQL addresses projects by full path only
+            return await super()._fetch_file_contents(repo_id, files)
+
+        paths_by_ref: Dict[str, List[str]] = {}
+        for path, ref in files:
+            paths_by_ref.setdefault(ref, []).append(path)
+
+        size = settings.SCM_CONTENT_BATCH_SIZE
+        batches = [
+            (ref, paths[i:i + size])
+            for ref, paths in paths_by_ref.items()
+            for i in range(0, len(paths), size)
+        ]
+        results: Dict[Tuple[str, str], Optional[str]] = {item: None for item in files}
+        for batch_result in await self._gather_bounded(self._fetch_blob_batch(repo_id, *b) for b in batches):
+            results.update(batch_result)
+        return results
+
+    async def _fetch_blob_batch(self, repo_id: str, ref: str, paths: List[str]) -> Dict[Tuple[str, str], Optional[str]]:
+        query = (
+            "query($project: ID!, $ref: String!, $paths: [String!]!) { "
+            "project(fullPath: $project) { repository { "
+            "blobs(ref: $ref, paths: $paths) { nodes { path rawTextBlob } } } } }"
+        )
+        response = await self._request(
+            "POST",
+            settings.GITLAB_GRAPHQL_URL,
+            headers={"Authorization": f"Bearer {self.headers['PRIVATE-TOKEN']}"},
+            json={"query": query, "variables": {"project": repo_id, "ref": ref, "paths": paths}}
+        )
+
+        project = (response.json().get("data") or {}).get("project") or {}
+        nodes = (((project.get("repository") or {}).get("blobs")) or {}).get("nodes") or []
+        return {(node["path"], ref): node.get("rawTextBlob") for node in nodes if node}
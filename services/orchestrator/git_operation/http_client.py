@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from ..config import settings
+from .rate_limiter import RateLimiter, PRIORITY_LOW
+from .response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# 'h2' is installed through the httpx[http2] dependency; without it, clients fall back to HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class ScmHttpClient:
+    """
+    Pooled, keep-alive async HTTP client shared by every SCM call of one provider.
+    Concurrency towards each host is capped so a large PR cannot flood the API,
+    and every request is paced by the provider's shared rate-limit budget.
+    GETs are revalidated against the shared response cache.
+    """
+    def __init__(self, provider: str, headers: Dict[str, str]):
+        self.headers = headers
+        self.rate_limiter = RateLimiter(provider)
+        self.response_cache = ResponseCache()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=settings.SCM_REQUEST_TIMEOUT,
+                http2=settings.SCM_HTTP2 and HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=settings.SCM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SCM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.SCM_KEEPALIVE_EXPIRY
+                )
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(settings.SCM_PER_HOST_CONCURRENCY)
+        return self._host_limits[host]
+
+    async def request(self, method: str, url: str, priority: str = PRIORITY_LOW, **kwargs) -> httpx.Response:
+        """
+        Sends a request once the rate-limit budget allows it. Rate-limit rejections
+        (429, or 403 with Retry-After / an empty budget) are retried after the
+        provider's back-off instead of being returned. A 304 to a conditional GET
+        comes back as the cached 200.
+        """
+        for attempt in range(settings.SCM_RATE_LIMIT_MAX_RETRIES + 1):
+            client = self._get_client()
+            request = client.build_request(method, url, **kwargs)
+            cached = await self.response_cache.prepare(request)
+            await self.rate_limiter.acquire(url, priority)
+            async with self._host_limit(url):
+                response = await client.send(request)
+            backoff, stored = await self.rate_limiter.record(url, response)
+            if backoff is None or attempt == settings.SCM_RATE_LIMIT_MAX_RETRIES:
+                return await self.response_cache.complete(request, response, cached)
+            logger.warning(f"Rate limited on {method} {url}, retrying in {backoff:.0f}s")
+            if not stored:
+                # acquire() cannot enforce a back-off that never reached Redis
+                await asyncio.sleep(min(backoff, settings.SCM_RATE_LIMIT_MAX_WAIT))
+        return response
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+_clients: Dict[str, ScmHttpClient] = {}
+
+def get_http_client(provider: str, headers: Dict[str, str]) -> ScmHttpClient:
+    """
+    Returns the process-wide client for a provider, creating it on first use.
+    """
+    if provider not in _clients:
+        _clients[provider] = ScmHttpClient(provider, headers)
+    return _clients[provider]
+
+async def close_http_clients():
+    """
+    Closes all pooled connections. Call once on worker shutdown.
+    """
+    for client in _clients.values():
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close SCM HTTP client: {e}")
@@ -0,0 +1,305 @@
+import asyncio
+import base64
+import fcntl
+import logging
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Type
+
+from ..config import settings
+from .base_ops import BaseOps
+from .github_ops import GithubOps
+from .gitlab_ops import GitlabOps
+
+logger = logging.getLogger(__name__)
+
+class LocalMirrorOps(BaseOps):
+    """
+    Serves PR reads from a local bare mirror of the repository instead of the REST API.
+
+    Each review fetches only the new objects of the branches and the PR refs, then
+    diffs, file contents and trees come from `git diff` / `git cat-file --batch`.
+    Subclasses describe the provider: where to clone from and how PR refs are named.
+    """
+    provider: str = ""
+    clone_url: str = ""
+    auth_user: str = ""
+    token_env: str = ""
+    pull_ref: str = ""
+    upstream_class: Type[BaseOps] = None
+
+    def __init__(self):
+        self.root = os.path.join(settings.SCM_MIRROR_ROOT, self.provider)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # (repo_id, pr_id) -> (resolved_at, base_sha, head_sha)
+        self._resolved: Dict[Tuple[str, int], Tuple[float, str, str]] = {}
+        # (repo_id, pr_id) -> resolution in progress, awaited by every concurrent caller
+        self._resolving: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._upstream: Optional[BaseOps] = None
+
+    def _path(self, repo_id: str) -> str:
+        return os.path.join(self.root, f"{repo_id}.git")
+
+    async def _git(self, repo_id: Optional[str], *args: str, input: bytes = None) -> bytes:
+        """
+        Runs a git command against the mirror and returns its stdout.
+        """
+        cmd = ["git"]
+        if repo_id is not None:
+            cmd += ["--git-dir", self._path(repo_id)]
+        cmd += list(args)
+
+        env = None
+        token = os.getenv(self.token_env, "")
+        if token and args and args[0] == "fetch":
+            # Passed through the environment, so the token never shows in the process list
+            credentials = base64.b64encode(f"{self.auth_user}:{token}".encode()).decode()
+            env = {
+                **os.environ,
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "http.extraHeader",
+                "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}"
+            }
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+        stdout, stderr = await process.communicate(input)
+        if process.returncode != 0:
+            raise RuntimeError(f"git {args[0]} failed for {repo_id}: {stderr.decode(errors='replace').strip()}")
+        return stdout
+
+    async def _ensure_mirror(self, repo_id: str):
+        path = self._path(repo_id)
+        if os.path.isdir(path):
+            return
+        logger.info(f"Creating bare mirror of {self.provider} {repo_id} in {path}")
+        await self._git(None, "init", "--bare", "--quiet", path)
+        await self._git(repo_id, "remote", "add", "origin", self.clone_url.format(repo=repo_id))
+
+    async def _fetch(self, repo_id: str, *refspecs: str):
+        """
+        Incrementally fetches the given refs. Fetches of one repository are serialized
+        in this process by an asyncio lock and across processes sharing the mirror
+        volume by a file lock next to the mirror.
+        """
+        lock = self._locks.setdefault(repo_id, asyncio.Lock())
+        async with lock:
+            lock_path = f"{self._path(repo_id)}.lock"
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+            with open(lock_path, "a") as lock_file:
+                await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    await self._ensure_mirror(repo_id)
+                    await self._git(repo_id, "fetch", "--quiet", "--prune", "--no-tags", "origin", *refspecs)
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    async def _has_commit(self, repo_id: str, sha: str) -> bool:
+        try:
+            await self._git(repo_id, "cat-file", "-e", f"{sha}^{{commit}}")
+            return True
+        except RuntimeError:
+            return False
+
+    async def _rev_parse(self, repo_id: str, rev: str) -> str:
+        return (await self._git(repo_id, "rev-parse", "--verify", "--quiet", rev)).decode().strip()
+
+    async def _resolve_pr(self, repo_id: str, pr_id: int) -> Tuple[str, str]:
+        """
+        Fetches the PR and returns (base, head), where base is the merge base the
+        provider diffs against. Resolutions younger than SCM_MIRROR_FETCH_TTL are reused,
+        and concurrent callers share the one in progress, so the metadata call and the
+        diff stream of one review share a single fetch.
+        """
+        key = (repo_id, pr_id)
+        cached = self._resolved.get(key)
+        if cached and time.monotonic() - cached[0] < settings.SCM_MIRROR_FETCH_TTL:
+            return cached[1], cached[2]
+
+        task = self._resolving.get(key)
+        if task is None:
+            task = asyncio.create_task(self._resolve_pr_refs(repo_id, pr_id))
+            self._resolving[key] = task
+            task.add_done_callback(lambda _: self._resolving.pop(key, None))
+        # A cancelled caller must not cancel the resolution the others are waiting on
+        base_sha, head_sha = await asyncio.shield(task)
+        self._resolved[key] = (time.monotonic(), base_sha, head_sha)
+        return base_sha, head_sha
+
+    async def _resolve_pr_refs(self, repo_id: str, pr_id: int) -> Tuple[str, str]:
+        head_ref = self.pull_ref.format(pr=pr_id, kind="head")
+        merge_ref = self.pull_ref.format(pr=pr_id, kind="merge")
+        await self._fetch(repo_id, "+refs/heads/*:refs/heads/*", f"+{head_ref}:{head_ref}")
+        head_sha = await self._rev_parse(repo_id, head_ref)
+
+        try:
+            # The merge ref's first parent is the target branch tip
+            await self._fetch(repo_id, f"+{merge_ref}:{merge_ref}")
+            target = await self._rev_parse(repo_id, f"{merge_ref}^1")
+        except RuntimeError:
+            # No merge ref (conflicts or disabled): ask the provider for the target once
+            pr_data = await self._get_upstream().get_pull_request(repo_id, pr_id)
+            target = (pr_data.get("base") or {}).get("sha")
+            if not target:
+                raise RuntimeError(f"Cannot resolve the target commit of {repo_id}#{pr_id}: no merge ref and no base SHA")
+            if not await self._has_commit(repo_id, target):
+                await self._fetch(repo_id, target)
+        base_sha = (await self._git(repo_id, "merge-base", target, head_sha)).decode().strip()
+        return base_sha, head_sha
+
+    def _get_upstream(self) -> BaseOps:
+        if self._upstream is None:
+            self._upstream = self.upstream_class()
+        return self._upstream
+
+    async def get_pull_request(self, repo_id: str, pr_id: int) -> dict:
+        """
+        Resolve the PR's base and head SHAs from the mirror.
+        """
+        self._resolved.pop((repo_id, pr_id), None)
+        base_sha, head_sha = await self._resolve_pr(repo_id, pr_id)
+        return {"base": {"sha": base_sha}, "head": {"sha": head_sha}}
+
+    async def iter_pull_request_file_diffs(self, repo_id: str, pr_id: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Diff the PR locally and yield it in pages of SCM_PAGE_SIZE files.
+        """
+        base_sha, head_sha = await self._resolve_pr(repo_id, pr_id)
+        files = await self._diff(repo_id, base_sha, head_sha)
+        for i in range(0, len(files), settings.SCM_PAGE_SIZE):
+            yield files[i:i + settings.SCM_PAGE_SIZE]
+
+    async def get_compare_file_diffs(self, repo_id: str, base_ref: str, head_ref: str) -> List[Dict[str, Any]]:
+        """
+        Diff two commits locally, fetching the branches first if either is unknown.
+        """
+        if not (await self._has_commit(repo_id, base_ref) and await self._has_commit(repo_id, head_ref)):
+            await self._fetch(repo_id, "+refs/heads/*:refs/heads/*")
+        return await self._diff(repo_id, base_ref, head_ref)
+
+    async def _diff(self, repo_id: str, base_sha: str, head_sha: str) -> List[Dict[str, Any]]:
+        """
+        Returns the changed files in the provider's format (filename, previous_filename,
+        status, sha, patch). The name-status listing and the patch come from two runs
+        with the same options, so their files are in the same order.
+        """
+        options = ["--no-color", "--no-ext-diff", "-M", "--full-index"]
+        listing = await self._git(repo_id, "diff", "--raw", "-z", "--no-abbrev", *options, base_sha, head_sha)
+        patch_output = await self._git(repo_id, "diff", *options, base_sha, head_sha)
+
+        fields = listing.decode("utf-8", errors="replace").split("\0")
+        patches = self._split_patches(patch_output.decode("utf-8", errors="replace"))
+        files = []
+        i = 0
+        while i < len(fields) - 1:
+            # ":old_mode new_mode old_sha new_sha status" then one path (two for renames/copies)
+            _, _, _, new_sha, status = fields[i].lstrip(":").split(" ")
+            if status[0] in "RC":
+                previous, filename = fields[i + 1], fields[i + 2]
+                i += 3
+            else:
+                previous, filename = None, fields[i + 1]
+                i += 2
+            files.append({
+                "filename": filename,
+                "previous_filename": previous,
+                "status": {"A": "added", "D": "removed", "R": "renamed", "C": "copied"}.get(status[0], "modified"),
+                "sha": None if status[0] == "D" else new_sha,
+                "patch": patches[len(files)] if len(files) < len(patches) else None
+            })
+        return files
+
+    @staticmethod
+    def _split_patches(output: str) -> List[Optional[str]]:
+        """
+        Splits `git diff` output per file and keeps only the hunks, like the provider
+        APIs do. Files without hunks (binary, mode-only) get None.
+        """
+        patches: List[Optional[str]] = []
+        hunks: Optional[List[str]] = None
+        for line in output.split("\n"):
+            if line.startswith("diff --git "):
+                if hunks is not None:
+                    patches.append("\n".join(hunks) if hunks else None)
+                hunks = []
+            elif hunks is not None and (hunks or line.startswith("@@")):
+                hunks.append(line)
+        if hunks is not None:
+            patches.append("\n".join(hunks).rstrip("\n") if hunks else None)
+        return patches
+
+    async def _fetch_file_content(self, repo_id: str, file_path: str, ref: str = None) -> str:
+        """
+        Read one file from the mirror.
+        """
+        content = (await self._fetch_file_contents(repo_id, [(file_path, ref or "HEAD")]))[(file_path, ref or "HEAD")]
+        if content is None:
+            raise RuntimeError(f"{file_path}@{ref} not found in mirror of {repo_id}")
+        return content
+
+    async def _fetch_file_contents(self, repo_id: str, files: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """
+        Read many (file_path, ref) pairs through a single `git cat-file --batch` process.
+        Missing and binary files map to None.
+        """
+        if not files:
+            return {}
+        requests = "".join(f"{ref}:{path.lstrip('/')}\n" for path, ref in files).encode("utf-8")
+        output = await self._git(repo_id, "cat-file", "--batch=%(objecttype) %(objectsize)", input=requests)
+
+        results: Dict[Tuple[str, str], Optional[str]] = {}
+        offset = 0
+        for item in files:
+            header_end = output.index(b"\n", offset)
+            header = output[offset:header_end]
+            offset = header_end + 1
+            if header.endswith((b" missing", b" ambiguous")):
+                results[item] = None
+                continue
+            kind, size = header.split(b" ")
+            data = output[offset:offset + int(size)]
+            offset += int(size) + 1
+            try:
+                results[item] = data.decode("utf-8") if kind == b"blob" and b"\0" not in data else None
+            except UnicodeDecodeError:
+                results[item] = None
+        return results
+
+    async def list_tree(self, repo_id: str, ref: str) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        List every blob of the tree at `ref` as [{"path", "sha"}], with the tree SHA.
+        """
+        tree_sha = await self._rev_parse(repo_id, f"{ref}^{{tree}}")
+        output = await self._git(repo_id, "ls-tree", "-r", "-z", tree_sha)
+        files = []
+        for entry in output.decode("utf-8", errors="replace").split("\0"):
+            if not entry:
+                continue
+            meta, path = entry.split("\t", 1)
+            _, kind, sha = meta.split(" ")
+            if kind == "blob":
+                files.append({"path": path, "sha": sha})
+        return tree_sha, files
+
+
+class GithubMirrorOps(LocalMirrorOps):
+    provider = "github"
+    clone_url = settings.GITHUB_CLONE_URL
+    auth_user = "x-access-token"
+    token_env = "GITHUB_TOKEN"
+    pull_ref = "refs/pull/{pr}/{kind}"
+    upstream_class = GithubOps
+
+
+class GitlabMirrorOps(LocalMirrorOps):
+    provider = "gitlab"
+    clone_url = settings.GITLAB_CLONE_URL
+    auth_user = "oauth2"
+    token_env = "GITLAB_TOKEN"
+    pull_ref = "refs/merge-requests/{pr}/{kind}"
+    upstream_class = GitlabOps
@@ -0,0 +1,112 @@
+import json
+import zlib
+import hashlib
+import logging
+from typing import Dict, Optional
+
+import httpx
+import redis.asyncio as aioredis
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "metrics:scm_http_cache"
+
+# Headers that describe the transfer, not the resource; never replayed
+_TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+
+class ResponseCache:
+    """
+    HTTP validator cache for SCM GETs, shared by every process through Redis.
+
+    Successful responses carrying an ETag or Last-Modified are stored per request
+    (method, URL with query, Accept and credentials). The next identical GET is sent
+    with If-None-Match / If-Modified-Since; a 304 is answered from the stored body,
+    and GitHub does not count it against the rate limit.
+    Fails open when Redis is unavailable.
+    """
+    def __init__(self):
+        self.redis = aioredis.from_url(settings.REDIS_URL)
+
+    @staticmethod
+    def _key(request: httpx.Request) -> str:
+        identity = "\n".join([
+            request.method,
+            str(request.url),
+            request.headers.get("Accept", ""),
+            request.headers.get("Authorization", "") or request.headers.get("PRIVATE-TOKEN", "")
+        ])
+        return f"http_cache:{hashlib.sha256(identity.encode('utf-8')).hexdigest()}"
+
+    async def prepare(self, request: httpx.Request) -> Optional[Dict[bytes, bytes]]:
+        """
+        Makes a GET conditional when a validated copy is cached; returns that copy.
+        """
+        if request.method != "GET" or not settings.SCM_HTTP_CACHE_ENABLED:
+            return None
+        try:
+            cached = await self.redis.hgetall(self._key(request))
+        except aioredis.RedisError as e:
+            logger.warning(f"HTTP cache unavailable: {e}")
+            return None
+        if not cached:
+            return None
+        if b"etag" in cached:
+            request.headers["If-None-Match"] = cached[b"etag"].decode()
+        if b"last_modified" in cached:
+            request.headers["If-Modified-Since"] = cached[b"last_modified"].decode()
+        return cached
+
+    async def complete(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        cached: Optional[Dict[bytes, bytes]]
+    ) -> httpx.Response:
+        """
+        Turns a 304 into the cached 200 and stores new cacheable responses.
+        """
+        if request.method != "GET" or not settings.SCM_HTTP_CACHE_ENABLED:
+            return response
+        try:
+            if response.status_code == 304 and cached:
+                await self.redis.hincrby(METRICS_KEY, "hits", 1)
+                await self.redis.expire(self._key(request), settings.SCM_HTTP_CACHE_TTL)
+                headers = json.loads(cached[b"headers"])
+                # Fresh rate-limit and validator headers win over the stored ones
+                headers.update({k: v for k, v in response.headers.items() if k.lower() not in _TRANSFER_HEADERS})
+                return httpx.Response(200, headers=headers, content=zlib.decompress(cached[b"body"]), request=request)
+
+            if response.status_code == 200:
+                await self.redis.hincrby(METRICS_KEY, "misses", 1)
+                await self._store(request, response)
+        except aioredis.RedisError as e:
+            logger.warning(f"HTTP cache unavailable: {e}")
+        return response
+
+    async def _store(self, request: httpx.Request, response: httpx.Response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not (etag or last_modified) or len(response.content) > settings.SCM_HTTP_CACHE_MAX_BODY_BYTES:
+            return
+        entry = {
+            "headers": json.dumps({k: v for k, v in response.headers.items() if k.lower() not in _TRANSFER_HEADERS}),
+            "body": zlib.compress(response.content)
+        }
+        if etag:
+            entry["etag"] = etag
+        if last_modified:
+            entry["last_modified"] = last_modified
+
+        key = self._key(request)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping=entry)
+        pipe.expire(key, settings.SCM_HTTP_CACHE_TTL)
+        await pipe.execute()
+
+    async def get_stats(self) -> Dict[str, int]:
+        stats = await self.redis.hgetall(METRICS_KEY)
+        return {"hits": int(stats.get(b"hits", 0)), "misses": int(stats.get(b"misses", 0))}
@@ -10,6 +10,8 @@ class ChunkStatus(str, Enum):
     COMMENT_READY = "COMMENT_READY"
     POSTED = "POSTED"
     FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+    COMPLETED = "COMPLETED"
 
 class Chunk(BaseModel):
     chunk_id: str
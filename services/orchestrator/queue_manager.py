@@ -1,6 +1,7 @@
 import json
 import asyncio
 import aio_pika
+from typing import List
 from .config import settings
 from .utils.logging_utils import get_logger
 
@@ -11,46 +12,66 @@ class QueueManager:
         self.url = settings.RABBITMQ_URL
         self.connection = None
         self.channel = None
+        self._declared = set()
 
     async def connect(self):
         if not self.connection or self.connection.is_closed:
             try:
                 self.connection = await aio_pika.connect_robust(self.url)
-                self.channel = await self.connection.channel()
+                self.channel = await self.connection.channel(publisher_confirms=True)
+                self._declared.clear()
                 logger.info("Connected to RabbitMQ")
             except Exception as e:
                 logger.error(f"Failed to connect to RabbitMQ: {e}")
                 raise e
 
-    async def enqueue(self, queue_name: str, payload: dict):
+    async def _ensure_queue(self, queue_name: str):
         if not self.channel or self.channel.is_closed:
             await self.connect()
+            self._declared.clear()
+
+        # Declare each queue once per channel instead of once per message
+        if queue_name not in self._declared:
+            await self.channel.declare_queue(queue_name, durable=True)
+            self._declared.add(queue_name)
 
-        # Ensure queue exists
-        await self.channel.declare_queue(queue_name, durable=True)
-        
-        message_body = json.dumps(payload).encode()
-        message = aio_pika.Message(
-            body=message_body,
+    def _build_message(self, payload: dict) -> aio_pika.Message:
+        return aio_pika.Message(
+            body=json.dumps(payload).encode(),
             delivery_mode=aio_pika.DeliveryMode.PERSISTENT
         )
-        
+
+    async def enqueue(self, queue_name: str, payload: dict):
+        await self._ensure_queue(queue_name)
         await self.channel.default_exchange.publish(
-            message,
+            self._build_message(payload),
             routing_key=queue_name
         )
 
-    async def consume(self, queue_name: str):
+    async def enqueue_many(self, queue_name: str, payloads: List[dict]):
+        """
+        Publishes many messages with their publisher confirms in flight together,
+        at most PUBLISH_BATCH_SIZE at a time. Raises if any message is not confirmed.
+        """
+        if not payloads:
+            return
+        await self._ensure_queue(queue_name)
+        exchange = self.channel.default_exchange
+        for i in range(0, len(payloads), settings.PUBLISH_BATCH_SIZE):
+            batch = payloads[i:i + settings.PUBLISH_BATCH_SIZE]
+            await asyncio.gather(*[
+                exchange.publish(self._build_message(payload), routing_key=queue_name)
+                for payload in batch
+            ])
+
+    async def get_queue(self, queue_name: str, prefetch_count: int = 1):
+        """
+        Declares a queue for consuming; prefetch_count caps unacked deliveries on this channel.
+        """
         if not self.channel or self.channel.is_closed:
             await self.connect()
-            
-        queue = await self.channel.declare_queue(queue_name, durable=True)
-        # Set persistent prefetch count to 1 for fair dispatch
-        await self.channel.set_qos(prefetch_count=1)
-        
-        # Return the async iterator
-        async with queue.iterator() as queue_iter:
-            async for message in queue_iter:
-                yield message
+
+        await self.channel.set_qos(prefetch_count=prefetch_count)
+        return await self.channel.declare_queue(queue_name, durable=True)
 
 queue_manager = QueueManager()
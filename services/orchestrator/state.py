@@ -1,44 +1,136 @@
 import json
-import redis
+import redis.asyncio as aioredis
 from typing import Optional, List, Dict, Any
 from .config import settings
-from .models import Chunk, ReviewRequest
+from .models import Chunk, ChunkStatus, ReviewRequest
+
+# Chunks in these states may still produce a comment; `review_inflight_chunks:{id}`
+# holds them so the git worker can tell a review finished without reading every chunk
+IN_FLIGHT_STATUSES = {
+    ChunkStatus.PENDING, ChunkStatus.LLM_IN_PROGRESS,
+    ChunkStatus.TOOL_REQUIRED, ChunkStatus.CONTEXT_READY
+}
+
+def track_in_flight(pipe, chunk: Chunk):
+    """Queues the in-flight set update for the chunk's current status on `pipe`."""
+    key = f"review_inflight_chunks:{chunk.review_request_id}"
+    if chunk.status in IN_FLIGHT_STATUSES:
+        pipe.sadd(key, chunk.chunk_id)
+    else:
+        pipe.srem(key, chunk.chunk_id)
 
 class StateManager:
+    """
+    Async Redis access for review requests, chunks and per-PR review state.
+    All calls share one connection pool, so concurrent tasks never block the event loop.
+    """
     def __init__(self):
-        self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+        self.pool = aioredis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True
+        )
+        self.redis = aioredis.Redis(connection_pool=self.pool)
+
+    async def close(self):
+        await self.redis.aclose()
+        await self.pool.disconnect()
 
-    def save_review_request(self, request: ReviewRequest):
+    async def save_review_request(self, request: ReviewRequest):
         key = f"review_request:{request.review_request_id}"
-        self.redis.set(key, request.model_dump_json())
+        await self.redis.set(key, request.model_dump_json())
 
-    def get_review_request(self, review_request_id: str) -> Optional[ReviewRequest]:
+    async def get_review_request(self, review_request_id: str) -> Optional[ReviewRequest]:
         key = f"review_request:{review_request_id}"
-        data = self.redis.get(key)
+        data = await self.redis.get(key)
         if data:
             return ReviewRequest.model_validate_json(data)
         return None
 
-    def save_chunk(self, chunk: Chunk):
+    async def save_chunk(self, chunk: Chunk):
         key = f"chunk:{chunk.chunk_id}"
-        self.redis.set(key, chunk.model_dump_json())
-        # Also add to a set for the review request
-        self.redis.sadd(f"review_request_chunks:{chunk.review_request_id}", chunk.chunk_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(key, chunk.model_dump_json())
+        track_in_flight(pipe, chunk)
+        # Also add to a set for the review request, and one for its file
+        pipe.sadd(f"review_request_chunks:{chunk.review_request_id}", chunk.chunk_id)
+        pipe.sadd(f"review_file_chunks:{chunk.review_request_id}:{chunk.filename}", chunk.chunk_id)
+        await pipe.execute()
 
-    def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
+    async def save_chunks(self, chunks: List[Chunk]):
+        """
+        Persists many chunks in MULTI/EXEC pipelines of CHUNK_WRITE_BATCH_SIZE,
+        one round trip per batch instead of two per chunk.
+        """
+        for i in range(0, len(chunks), settings.CHUNK_WRITE_BATCH_SIZE):
+            batch = chunks[i:i + settings.CHUNK_WRITE_BATCH_SIZE]
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.mset({f"chunk:{chunk.chunk_id}": chunk.model_dump_json() for chunk in batch})
+            by_request: Dict[str, List[str]] = {}
+            by_file: Dict[str, List[str]] = {}
+            for chunk in batch:
+                by_request.setdefault(chunk.review_request_id, []).append(chunk.chunk_id)
+                by_file.setdefault(f"{chunk.review_request_id}:{chunk.filename}", []).append(chunk.chunk_id)
+                track_in_flight(pipe, chunk)
+            for review_request_id, chunk_ids in by_request.items():
+                pipe.sadd(f"review_request_chunks:{review_request_id}", *chunk_ids)
+            for file_key, chunk_ids in by_file.items():
+                pipe.sadd(f"review_file_chunks:{file_key}", *chunk_ids)
+            await pipe.execute()
+
+    async def get_chunk(self, chunk_id: str) -> Optional[Chunk]:
         key = f"chunk:{chunk_id}"
-        data = self.redis.get(key)
+        data = await self.redis.get(key)
         if data:
             return Chunk.model_validate_json(data)
         return None
 
-    def get_chunks_for_request(self, review_request_id: str) -> List[Chunk]:
-        chunk_ids = self.redis.smembers(f"review_request_chunks:{review_request_id}")
-        chunks = []
-        for cid in chunk_ids:
-            chunk = self.get_chunk(cid)
-            if chunk:
-                chunks.append(chunk)
-        return chunks
+    async def get_chunk_statuses(self, chunk_ids: List[str]) -> Dict[str, Optional[ChunkStatus]]:
+        """Reads the status of many chunks with a single MGET."""
+        if not chunk_ids:
+            return {}
+        values = await self.redis.mget([f"chunk:{cid}" for cid in chunk_ids])
+        return {
+            cid: Chunk.model_validate_json(data).status if data else None
+            for cid, data in zip(chunk_ids, values)
+        }
+
+    async def get_chunks_for_request(self, review_request_id: str) -> List[Chunk]:
+        chunk_ids = await self.redis.smembers(f"review_request_chunks:{review_request_id}")
+        if not chunk_ids:
+            return []
+        values = await self.redis.mget([f"chunk:{cid}" for cid in chunk_ids])
+        return [Chunk.model_validate_json(data) for data in values if data]
+
+    async def is_review_cancelled(self, review_request_id: str) -> bool:
+        """True once the webhook has superseded this review with a newer head."""
+        return bool(await self.redis.exists(f"review_cancelled:{review_request_id}"))
+
+    # Incremental review state, tracked per PR across review requests
+
+    def _pr_key(self, prefix: str, provider: str, repo_id: str, pr_id: int) -> str:
+        return f"{prefix}:{provider}:{repo_id}:{pr_id}"
+
+    async def get_last_reviewed_head(self, provider: str, repo_id: str, pr_id: int) -> Optional[str]:
+        return await self.redis.get(self._pr_key("pr_last_reviewed_head", provider, repo_id, pr_id))
+
+    async def set_last_reviewed_head(self, provider: str, repo_id: str, pr_id: int, head_sha: str):
+        key = self._pr_key("pr_last_reviewed_head", provider, repo_id, pr_id)
+        await self.redis.set(key, head_sha, ex=settings.INCREMENTAL_STATE_TTL)
+
+    async def get_chunk_fingerprints(self, provider: str, repo_id: str, pr_id: int) -> Dict[str, Dict[str, Any]]:
+        """Maps hunk fingerprints of previously reviewed chunks to {chunk_id, filename}."""
+        data = await self.redis.hgetall(self._pr_key("pr_chunk_fingerprints", provider, repo_id, pr_id))
+        return {fp: json.loads(value) for fp, value in data.items()}
+
+    async def save_chunk_fingerprints(self, provider: str, repo_id: str, pr_id: int, chunks: List[Chunk]):
+        if not chunks:
+            return
+        key = self._pr_key("pr_chunk_fingerprints", provider, repo_id, pr_id)
+        await self.redis.hset(key, mapping={
+            chunk.metadata["fingerprint"]: json.dumps({"chunk_id": chunk.chunk_id, "filename": chunk.filename})
+            for chunk in chunks
+        })
+        await self.redis.expire(key, settings.INCREMENTAL_STATE_TTL)
 
 state_manager = StateManager()
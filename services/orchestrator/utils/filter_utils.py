@@ -7,13 +7,13 @@ def should_review_file(file_path: str) -> bool:
     """
     # 1. Check for ignored extensions
     _, ext = os.path.splitext(file_path)
-    ignored_extensions = [e.strip().lower() for e in settings.ignored_extensions.split(",")]
+    ignored_extensions = [e.strip().lower() for e in settings.IGNORED_EXTENSIONS.split(",")]
     if ext.lower() in ignored_extensions:
         return False
 
     # 2. Check for ignored filenames
     filename = os.path.basename(file_path)
-    ignored_files = [f.strip().lower() for f in settings.ignored_files.split(",")]
+    ignored_files = [f.strip().lower() for f in settings.IGNORED_FILES.split(",")]
     if filename.lower() in ignored_files:
         return False
 
@@ -23,7 +23,7 @@ def should_review_file(file_path: str) -> bool:
     if '/' in file_path:
         path_parts = file_path.split('/')
         
-    ignored_directories = [d.strip().lower() for d in settings.ignored_directories.split(",")]
+    ignored_directories = [d.strip().lower() for d in settings.IGNORED_DIRECTORIES.split(",")]
     for part in path_parts:
         if part.lower() in ignored_directories:
             return False
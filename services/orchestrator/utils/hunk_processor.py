@@ -1,6 +1,9 @@
 import re
-from typing import Generator, Dict, List, Any
+from typing import Generator, Dict, List, Any, Tuple
 from ..config import settings
+
+HUNK_HEADER_RE = re.compile(r'^@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@')
+
 class HunkProcessor:
     """
     Utility to process and chunk git diff patches into smaller pieces
@@ -12,18 +15,29 @@ class HunkProcessor:
     def chunk_patch(self, filename: str, patch: str) -> Generator[Dict[str, Any], None, None]:
         """
         Parses a unified diff patch and yields chunks limited by the number of changes (+/-).
-        Each chunk includes calculated line numbers for the NEW file.
+        Each chunk includes calculated line numbers for the NEW file, plus the exact
+        1-based line spans it covers in both versions ("old_range"/"new_range",
+        inclusive, empty when end < start).
         """
         if not patch:
             return
 
         lines = patch.splitlines()
-        hunk_header_re = re.compile(r'^@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@')
+        hunk_header_re = HUNK_HEADER_RE
         
         current_new_line = 0
+        current_old_line = 0
         chunk_lines = []
         change_count = 0
         chunk_start_line = 0
+        chunk_old_start = 0
+        old_count = new_count = 0
+
+        def ranges():
+            return {
+                "old_range": (chunk_old_start, chunk_old_start + old_count - 1),
+                "new_range": (chunk_start_line, chunk_start_line + new_count - 1)
+            }
 
         for line in lines:
             header_match = hunk_header_re.match(line)
@@ -35,7 +49,8 @@ class HunkProcessor:
                         "content": "\n".join(chunk_lines),
                         "start_line": chunk_start_line,
                         "end_line": current_new_line,
-                        "changes": change_count
+                        "changes": change_count,
+                        **ranges()
                     }
                     chunk_lines = []
                     change_count = 0
@@ -43,7 +58,10 @@ class HunkProcessor:
                 # Initialize new hunk tracking
                 # We care about the '+' part for the new file line numbers
                 current_new_line = int(header_match.group(3))
+                current_old_line = int(header_match.group(1))
                 chunk_start_line = current_new_line
+                chunk_old_start = current_old_line
+                old_count = new_count = 0
                 chunk_lines.append(line)  # Keep the header for context
                 continue
 
@@ -56,16 +74,22 @@ class HunkProcessor:
                 change_count += 1
                 chunk_lines.append(f"{current_new_line}: {line}")
                 current_new_line += 1
+                new_count += 1
             elif line.startswith('-'):
                 change_count += 1
                 # Deleted lines don't exist in the new file, 
                 # but we show them to the LLM for context. 
                 # We don't increment current_new_line.
                 chunk_lines.append(f"DEL: {line}")
+                current_old_line += 1
+                old_count += 1
             elif line.startswith(' '):
                 # Context line
                 chunk_lines.append(f"{current_new_line}: {line}")
                 current_new_line += 1
+                current_old_line += 1
+                new_count += 1
+                old_count += 1
             else:
                 # Metadata or other (like \ No newline at end of file)
                 chunk_lines.append(line)
@@ -77,12 +101,15 @@ class HunkProcessor:
                     "content": "\n".join(chunk_lines),
                     "start_line": chunk_start_line,
                     "end_line": current_new_line - 1 if current_new_line > chunk_start_line else chunk_start_line,
-                    "changes": change_count
+                    "changes": change_count,
+                    **ranges()
                 }
                 # Prepare for next chunk
                 chunk_lines = [f"@@ ... @@ (Continued focus on {filename})"]
                 chunk_start_line = current_new_line
+                chunk_old_start = current_old_line
                 change_count = 0
+                old_count = new_count = 0
 
         # Yield last chunk
         if chunk_lines and change_count > 0:
@@ -91,5 +118,19 @@ class HunkProcessor:
                 "content": "\n".join(chunk_lines),
                 "start_line": chunk_start_line,
                 "end_line": current_new_line - 1 if current_new_line > chunk_start_line else chunk_start_line,
-                "changes": change_count
+                "changes": change_count,
+                **ranges()
             }
+
+    def hunk_spans(self, patch: str) -> List[Tuple[int, int, int, int]]:
+        """
+        Returns (old_start, old_count, new_start, new_count) for every hunk header
+        of a unified diff; an omitted count means 1.
+        """
+        spans = []
+        for line in (patch or "").splitlines():
+            match = HUNK_HEADER_RE.match(line)
+            if match:
+                old_start, old_count, new_start, new_count = match.groups()
+                spans.append((int(old_start), int(old_count or 1), int(new_start), int(new_count or 1)))
+        return spans
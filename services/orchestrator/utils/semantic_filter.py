@@ -1,50 +1,153 @@
-
+import asyncio
 import logging
+import multiprocessing
+from itertools import zip_longest
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple
 from ..code_parser.tree_sitter_parser import UniversalParser
+from ..code_parser.language import EXTENSION_LANGUAGES, language_for_file
+from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+# ((old_start, old_end), (new_start, new_end)), 1-based inclusive line spans
+LineRanges = Tuple[Tuple[int, int], Tuple[int, int]]
+# (old_start, old_count, new_start, new_count) from a unified diff hunk header
+HunkSpan = Tuple[int, int, int, int]
+
 class SemanticFilter:
     """
     Service to determine if changes in a file are semantically meaningful
     or just noise (comments, whitespace, etc.).
+
+    Decisions are made per chunk, so comment-only hunks are dropped even when
+    the rest of the file changed. Parsing is CPU-bound, so large files are checked
+    in a pool of SEMANTIC_FILTER_WORKERS processes with their parsers already loaded.
     """
     def __init__(self):
         self.parser = UniversalParser()
+        self._pool: Optional[ProcessPoolExecutor] = None
 
-    def is_semantic_change(self, old_content: str, new_content: str, filename: str) -> bool:
+    def semantic_chunks(
+        self,
+        old_content: str,
+        new_content: str,
+        filename: str,
+        ranges: List[LineRanges],
+        hunks: Optional[List[HunkSpan]] = None
+    ) -> List[bool]:
         """
-        Returns True if the change between old and new content is semantic.
-        Returns False if it's only comments or whitespace.
+        Decides per chunk instead of per file. Each chunk is given as
+        ((old_start, old_end), (new_start, new_end)), 1-based inclusive line spans
+        (empty when end < start). A chunk is semantic unless the non-comment tokens
+        overlapping its span are identical in the base and head trees.
+
+        With the patch's hunk headers, the head tree is derived from the base tree by
+        incremental reparse. A head that fails to parse where the base did not
+        (e.g. an unterminated string swallowing the rest of the file) keeps every chunk.
         """
         language = self._get_language_from_filename(filename)
         if not language:
             # If we don't support the language, assume it's semantic to be safe
-            return True
-            
-        old_tokens = self.parser.get_semantic_tokens(old_content, language)
-        new_tokens = self.parser.get_semantic_tokens(new_content, language)
-        
-        # If both fail to parse (empty tokens), we can't be sure, so assume semantic
-        if not old_tokens and not new_tokens and old_content.strip() != new_content.strip():
-            return True
-            
-        return old_tokens != new_tokens
+            return [True] * len(ranges)
+        try:
+            old_tree, old_source = self.parser.parse(old_content, language)
+            reparsed = None
+            if hunks and settings.SEMANTIC_FILTER_INCREMENTAL:
+                reparsed = self.parser.reparse_with_hunks(old_tree, old_source, new_content, language, hunks)
+            if reparsed:
+                new_tree, new_source = reparsed
+            else:
+                new_tree, new_source = self.parser.parse(new_content, language)
+        except Exception as e:
+            logger.debug(f"Could not parse {filename} as {language}: {e}")
+            return [True] * len(ranges)
+
+        # A tree without any children means the grammar produced nothing usable
+        if not old_tree.root_node.child_count or not new_tree.root_node.child_count:
+            unchanged = old_content.strip() == new_content.strip()
+            return [not unchanged] * len(ranges)
+        # Broken structure can leak outside every chunk, so no chunk is safe to drop
+        if new_tree.root_node.has_error and not old_tree.root_node.has_error:
+            return [True] * len(ranges)
+
+        results = []
+        for (old_start, old_end), (new_start, new_end) in ranges:
+            old_tokens = self._span_tokens(old_tree, old_source, old_start, old_end)
+            new_tokens = self._span_tokens(new_tree, new_source, new_start, new_end)
+            results.append(any(a != b for a, b in zip_longest(old_tokens, new_tokens)))
+        return results
+
+    def _span_tokens(self, tree, source: bytes, start: int, end: int) -> Iterator[bytes]:
+        if end < start:
+            return iter(())
+        return self.parser.iter_tree_tokens(tree, source, start - 1, end - 1)
+
+    async def semantic_chunks_async(
+        self,
+        old_content: str,
+        new_content: str,
+        filename: str,
+        ranges: List[LineRanges],
+        hunks: Optional[List[HunkSpan]] = None
+    ) -> List[bool]:
+        """
+        Same as semantic_chunks, but keeps the event loop free: files above
+        SEMANTIC_FILTER_INLINE_MAX_CHARS are parsed in the worker pool.
+        """
+        pool = self._get_pool()
+        small = len(old_content) + len(new_content) <= settings.SEMANTIC_FILTER_INLINE_MAX_CHARS
+        if pool is None or small or not self._get_language_from_filename(filename):
+            return self.semantic_chunks(old_content, new_content, filename, ranges, hunks)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, _chunks_in_worker, old_content, new_content, filename, ranges, hunks)
+        except BrokenProcessPool as e:
+            logger.warning(f"Semantic filter pool crashed, checking {filename} inline: {e}")
+            self._pool = None
+            return self.semantic_chunks(old_content, new_content, filename, ranges, hunks)
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._pool is None and settings.SEMANTIC_FILTER_WORKERS > 0:
+            # 'spawn' keeps the children free of the event loop's threads and sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.SEMANTIC_FILTER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(sorted(set(EXTENSION_LANGUAGES.values())),)
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
 
     def _get_language_from_filename(self, filename: str) -> str:
         """Maps file extensions to tree-sitter language names."""
-        ext = filename.split('.')[-1].lower()
-        mapping = {
-            'py': 'python',
-            'js': 'javascript',
-            'ts': 'typescript',
-            'tsx': 'tsx',
-            'go': 'go',
-            'java': 'java',
-            'rs': 'rust',
-            'cpp': 'cpp',
-            'cc': 'cpp',
-            'c': 'c',
-            'rb': 'ruby'
-        }
-        return mapping.get(ext)
+        return language_for_file(filename)
+
+
+# Per-process state of pool workers
+_worker_filter: Optional[SemanticFilter] = None
+
+def _init_worker(languages):
+    """Builds the worker's filter and loads every available grammar up front."""
+    global _worker_filter
+    _worker_filter = SemanticFilter()
+    for language in languages:
+        try:
+            _worker_filter.parser.get_parser(language)
+        except ValueError:
+            # Grammar not installed; such files fall back to "semantic" anyway
+            pass
+
+def _chunks_in_worker(
+    old_content: str,
+    new_content: str,
+    filename: str,
+    ranges: List[LineRanges],
+    hunks: Optional[List[HunkSpan]]
+) -> List[bool]:
+    return _worker_filter.semantic_chunks(old_content, new_content, filename, ranges, hunks)
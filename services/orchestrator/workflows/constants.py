@@ -8,3 +8,4 @@ CONTEXT_READY = "CONTEXT_READY"
 COMMENT_READY = "COMMENT_READY"
 POSTED = "POSTED"
 FAILED = "FAILED"
+CANCELLED = "CANCELLED"
@@ -8,10 +8,11 @@ from ..utils.semantic_filter import SemanticFilter
 from ..utils.logging_utils import get_logger, log_execution_time
 from ..models import ReviewRequest, Chunk, ChunkStatus
 from ..state import state_manager
+from ..config import settings
 from ..queue_manager import queue_manager
 from .registry import ProviderRegistry
-from .constants import ORCHESTRATOR_QUEUE, LLM_QUEUE, FAILED
-from .pr_review_helpers import _fetch_pr_metadata, _process_single_file
+from .constants import ORCHESTRATOR_QUEUE, LLM_QUEUE, FAILED, CANCELLED
+from .pr_review_helpers import _fetch_review_scope, _load_previous_results, _process_file_page
 
 logger = get_logger(__name__)
 
@@ -58,51 +59,96 @@ class WorkflowManager:
             status="IN_PROGRESS",
             created_at=time.time()
         )
-        state_manager.save_review_request(review_req)
+        await state_manager.save_review_request(review_req)
 
+        if await state_manager.is_review_cancelled(review_request_id):
+            logger.info(f"Review {review_request_id} was superseded before it started, skipping.")
+            review_req.status = CANCELLED
+            await state_manager.save_review_request(review_req)
+            return
+
+        # Incremental mode: only review what changed since the last reviewed head
+        previous_head = None
+        done_fingerprints, retry_files = set(), set()
+        if payload.get("incremental") and settings.INCREMENTAL_REVIEW_ENABLED:
+            previous_head = await state_manager.get_last_reviewed_head(provider, repo_id, pr_id)
+            if previous_head:
+                done_fingerprints, retry_files = await _load_previous_results(provider, repo_id, pr_id)
+
+        # Step 1: Fetch Metadata (SHAs are needed before any file can be checked)
+        scope_task = asyncio.create_task(_fetch_review_scope(scm, repo_id, pr_id, previous_head))
+
+        # Step 2: Stream file pages; each page is filtered and chunked
+        # while the next one is still downloading
+        page_tasks = []
         try:
-            # Step 1: Fetch Diff & Metadata
-            file_changes, (base_sha, head_sha) = await asyncio.gather(
-                asyncio.to_thread(scm.get_pull_request_file_diffs, repo_id, pr_id),
-                _fetch_pr_metadata(scm, repo_id, pr_id)
-            )
-            
-            # Update metadata with SHAs
-            review_req.metadata["base_sha"] = base_sha
-            review_req.metadata["head_sha"] = head_sha
-            state_manager.save_review_request(review_req)
+            async for page in scm.iter_pull_request_file_diffs(repo_id, pr_id):
+                base_sha, head_sha, touched = await scope_task
+                if previous_head and previous_head == head_sha:
+                    break
+                if touched is not None:
+                    page = [fc for fc in page if fc.get("filename") in touched | retry_files]
+                page_tasks.append(asyncio.create_task(
+                    _process_file_page(page, repo_id, base_sha, head_sha, self, scm, review_request_id)
+                ))
         except Exception as e:
             logger.error(f"Failed to fetch PR data: {e}")
+            for task in page_tasks:
+                task.cancel()
+            scope_task.cancel()
             review_req.status = FAILED
-            state_manager.save_review_request(review_req)
+            await state_manager.save_review_request(review_req)
             return
 
-        # Step 2: Parallel File Processing
-        tasks = [
-            _process_single_file(fc, repo_id, base_sha, head_sha, self, scm, review_request_id)
-            for fc in file_changes
-        ]
-        
-        # Execute all file checks in parallel
-        results = await asyncio.gather(*tasks)
-        
-        # Step 3: Enqueue Valid Chunks
-        total_chunks = 0
-        for file_chunks in results:
-            for chunk in file_chunks:
-                state_manager.save_chunk(chunk)
-                await queue_manager.enqueue(ORCHESTRATOR_QUEUE, {
-                    "action": "EVALUATE_CHUNK",
-                    "chunk_id": chunk.chunk_id
-                })
-                total_chunks += 1
+        base_sha, head_sha, touched = await scope_task
+        review_req.metadata["base_sha"] = base_sha
+        review_req.metadata["head_sha"] = head_sha
+        if previous_head:
+            review_req.metadata["incremental_base_sha"] = previous_head
+        await state_manager.save_review_request(review_req)
+
+        if previous_head and previous_head == head_sha:
+            logger.info(f"No new commits on {repo_id}#{pr_id} since {head_sha}, skipping review.")
+            review_req.status = "COMPLETED"
+            review_req.metadata["reason"] = "No new commits since last review"
+            await state_manager.save_review_request(review_req)
+            return
+
+        # Wait for every page to finish filtering/chunking
+        results = await asyncio.gather(*page_tasks)
+        chunks = [chunk for page_chunks in results for chunk in page_chunks]
+
+        # Hunks identical to already reviewed ones keep their previous result
+        new_chunks = [c for c in chunks if c.metadata["fingerprint"] not in done_fingerprints]
+        if len(new_chunks) != len(chunks):
+            review_req.metadata["reused_chunks"] = len(chunks) - len(new_chunks)
+            logger.info(f"Reusing {len(chunks) - len(new_chunks)} previously reviewed chunks for {repo_id}#{pr_id}")
+
+        # A newer push may have superseded this review while it was being chunked
+        if await state_manager.is_review_cancelled(review_request_id):
+            logger.info(f"Review {review_request_id} was superseded, dropping {len(new_chunks)} chunks.")
+            review_req.status = CANCELLED
+            await state_manager.save_review_request(review_req)
+            return
+
+        # Step 3: Enqueue Valid Chunks (pipelined writes, then one batched publish)
+        await state_manager.save_chunks(new_chunks)
+        await queue_manager.enqueue_many(ORCHESTRATOR_QUEUE, [
+            {"action": "EVALUATE_CHUNK", "chunk_id": chunk.chunk_id}
+            for chunk in new_chunks
+        ])
+        total_chunks = len(new_chunks)
+
+        await state_manager.save_chunk_fingerprints(provider, repo_id, pr_id, new_chunks)
+        if head_sha:
+            await state_manager.set_last_reviewed_head(provider, repo_id, pr_id, head_sha)
 
         logger.info(f"Initialized review {review_request_id} with {total_chunks} chunks.")
         
         if total_chunks == 0:
             review_req.status = "COMPLETED"
             review_req.metadata["reason"] = "No reviewable changes found"
-            state_manager.save_review_request(review_req)
+            await state_manager.save_review_request(review_req)
 
     @log_execution_time
     async def evaluate_chunk(self, payload: Dict[str, Any]):
@@ -113,16 +159,22 @@ class WorkflowManager:
             enqueue LLM_CALL(chunk_id)
         """
         chunk_id = payload.get("chunk_id")
-        chunk = state_manager.get_chunk(chunk_id)
+        chunk = await state_manager.get_chunk(chunk_id)
         
         if not chunk:
             logger.error(f"Chunk {chunk_id} not found")
             return
 
+        if await state_manager.is_review_cancelled(chunk.review_request_id):
+            chunk.status = ChunkStatus.CANCELLED
+            await state_manager.save_chunk(chunk)
+            logger.info(f"Chunk {chunk_id} belongs to a superseded review, cancelled.")
+            return
+
         # Enforce valid state transitions
         if chunk.status in [ChunkStatus.PENDING, ChunkStatus.CONTEXT_READY]:
             chunk.status = ChunkStatus.LLM_IN_PROGRESS
-            state_manager.save_chunk(chunk)
+            await state_manager.save_chunk(chunk)
             
             # Enqueue to LLM Queue
             await queue_manager.enqueue(LLM_QUEUE, {
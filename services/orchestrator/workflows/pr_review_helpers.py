@@ -1,40 +1,140 @@
 import uuid
 import asyncio
-from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+import hashlib
+from typing import Dict, Any, List, Optional, Set, Tuple, TYPE_CHECKING
 
 from ..models import Chunk, ChunkStatus
 from ..utils.filter_utils import should_review_file
 from ..utils.logging_utils import get_logger
 from ..git_operation.base_ops import BaseOps
+from ..state import state_manager
 
 if TYPE_CHECKING:
     from .manager import WorkflowManager
 
 logger = get_logger(__name__)
 
+# Chunks in these states already have a final LLM result that a re-review can reuse
+DONE_STATUSES = {ChunkStatus.COMMENT_READY, ChunkStatus.POSTED, ChunkStatus.COMPLETED}
+
+def _chunk_fingerprint(filename: str, diff_snippet: str) -> str:
+    """Identifies a hunk by file and exact diff content (including its line numbers)."""
+    return hashlib.sha256(f"{filename}\n{diff_snippet}".encode("utf-8")).hexdigest()
+
 async def _fetch_pr_metadata(scm: BaseOps, repo_id: str, pr_id: int) -> Tuple[Optional[str], Optional[str]]:
     """Fetches base and head SHAs for the PR."""
     try:
-        pr_data = await asyncio.to_thread(scm.get_pull_request, repo_id, pr_id)
+        pr_data = await scm.get_pull_request(repo_id, pr_id)
         return pr_data.get("base", {}).get("sha"), pr_data.get("head", {}).get("sha")
     except Exception as e:
         logger.warning(f"[PR #{pr_id}] Failed to fetch metadata: {e}")
         return None, None
 
+async def _fetch_review_scope(
+    scm: BaseOps,
+    repo_id: str,
+    pr_id: int,
+    previous_head: Optional[str]
+) -> Tuple[Optional[str], Optional[str], Optional[Set[str]]]:
+    """
+    Fetches base/head SHAs and, for incremental reviews, the set of files
+    touched since `previous_head`. A None file set means "review every file".
+    """
+    base_sha, head_sha = await _fetch_pr_metadata(scm, repo_id, pr_id)
+    touched = None
+    if previous_head and head_sha and previous_head != head_sha:
+        try:
+            changes = await scm.get_compare_file_diffs(repo_id, previous_head, head_sha)
+            touched = {c.get("filename") for c in changes}
+        except Exception as e:
+            logger.warning(f"[PR #{pr_id}] Compare with {previous_head} failed, running full review: {e}")
+    return base_sha, head_sha, touched
+
+async def _load_previous_results(provider: str, repo_id: str, pr_id: int) -> Tuple[Set[str], Set[str]]:
+    """
+    Returns the fingerprints of previously finished chunks and the files that
+    still have unfinished (failed or in-flight) chunks and must be re-reviewed.
+    """
+    fingerprints = await state_manager.get_chunk_fingerprints(provider, repo_id, pr_id)
+    statuses = await state_manager.get_chunk_statuses([info["chunk_id"] for info in fingerprints.values()])
+    done, retry_files = set(), set()
+    for fingerprint, info in fingerprints.items():
+        if statuses.get(info["chunk_id"]) in DONE_STATUSES:
+            done.add(fingerprint)
+        else:
+            retry_files.add(info["filename"])
+    return done, retry_files
+
+async def _prefetch_file_contents(
+    scm: BaseOps,
+    repo_id: str,
+    file_changes: List[Dict[str, Any]],
+    base_sha: Optional[str],
+    head_sha: Optional[str]
+) -> Dict[Tuple[str, str], Optional[str]]:
+    """
+    Fetches base and head contents of every reviewable file in one batched call,
+    so the semantic check does not cost two SCM round trips per file.
+    """
+    if not base_sha or not head_sha:
+        return {}
+
+    files = []
+    # GitHub lists the head blob SHA of each file, which lets unchanged
+    # files be served from the blob cache across re-reviews
+    blob_shas = {}
+    for fc in file_changes:
+        filename = fc.get("filename")
+        if not fc.get("patch") or not should_review_file(filename):
+            continue
+        status = fc.get("status")
+        if status != "added":
+            files.append((fc.get("previous_filename") or filename, base_sha))
+        if status != "removed":
+            files.append((filename, head_sha))
+            if fc.get("sha"):
+                blob_shas[(filename, head_sha)] = fc["sha"]
+
+    try:
+        return await scm.get_file_contents(repo_id, files, blob_shas)
+    except Exception as e:
+        logger.warning(f"Bulk content fetch failed, semantic check disabled: {e}")
+        return {}
+
+async def _process_file_page(
+    file_changes: List[Dict[str, Any]],
+    repo_id: str,
+    base_sha: Optional[str],
+    head_sha: Optional[str],
+    manager: 'WorkflowManager',
+    scm: BaseOps,
+    review_request_id: str
+) -> List[Chunk]:
+    """
+    Filters and chunks one page of file changes:
+    prefetches the page's contents in bulk, then processes its files in parallel.
+    """
+    contents = await _prefetch_file_contents(scm, repo_id, file_changes, base_sha, head_sha)
+    results = await asyncio.gather(*[
+        _process_single_file(fc, repo_id, base_sha, head_sha, manager, contents, review_request_id)
+        for fc in file_changes
+    ])
+    return [chunk for file_chunks in results for chunk in file_chunks]
+
 async def _process_single_file(
     fc: Dict[str, Any],
     repo_id: str,
     base_sha: Optional[str],
     head_sha: Optional[str],
     manager: 'WorkflowManager',
-    scm: BaseOps,
+    contents: Dict[Tuple[str, str], Optional[str]],
     review_request_id: str
 ) -> List[Chunk]:
     """
     Processes a single file change:
     1. Checks if file is relevant (extension)
-    2. checks if changes are semantic
-    3. chunks the diff
+    2. chunks the diff
+    3. drops chunks that only touch comments/whitespace
     """
     filename = fc.get("filename")
     patch = fc.get("patch")
@@ -43,36 +143,45 @@ async def _process_single_file(
     if not patch or not should_review_file(filename):
         return []
 
-    # 2. Semantic Check
-    if base_sha and head_sha:
+    # 2. Chunking
+    try:
+        hunks = list(manager.hunk_processor.chunk_patch(filename, patch))
+    except Exception as e:
+        logger.error(f"Error chunking {filename}: {e}")
+        return []
+
+    # 3. Semantic Check per chunk (contents are prefetched; missing sides mean added/removed files)
+    old_content = contents.get((fc.get("previous_filename") or filename, base_sha))
+    new_content = contents.get((filename, head_sha))
+    if hunks and old_content is not None and new_content is not None:
         try:
-            old_content = await asyncio.to_thread(scm.get_file_content, repo_id, filename, ref=base_sha)
-            new_content = await asyncio.to_thread(scm.get_file_content, repo_id, filename, ref=head_sha)
-            
-            if not manager.semantic_filter.is_semantic_change(old_content, new_content, filename):
+            keep = await manager.semantic_filter.semantic_chunks_async(
+                old_content, new_content, filename,
+                [(h["old_range"], h["new_range"]) for h in hunks],
+                manager.hunk_processor.hunk_spans(patch)
+            )
+            if not any(keep):
                 logger.info(f"Skipping {filename}: Non-semantic change.")
-                return []
+            elif not all(keep):
+                logger.info(f"Dropping {keep.count(False)} non-semantic chunks of {filename}.")
+            hunks = [h for h, semantic in zip(hunks, keep) if semantic]
         except Exception as e:
             logger.warning(f"Semantic check failed for {filename}, proceeding: {e}")
 
-    # 3. Chunking
     chunks = []
-    try:
-        hunks = list(manager.hunk_processor.chunk_patch(filename, patch))
-        for c_data in hunks:
-            chunk = Chunk(
-                chunk_id=str(uuid.uuid4()),
-                review_request_id=review_request_id,
-                filename=filename,
-                diff_snippet=c_data["content"],
-                status=ChunkStatus.PENDING,
-                metadata={
-                    "start_line": c_data["start_line"],
-                    "end_line": c_data["end_line"]
-                }
-            )
-            chunks.append(chunk)
-    except Exception as e:
-        logger.error(f"Error chunking {filename}: {e}")
+    for c_data in hunks:
+        chunk = Chunk(
+            chunk_id=str(uuid.uuid4()),
+            review_request_id=review_request_id,
+            filename=filename,
+            diff_snippet=c_data["content"],
+            status=ChunkStatus.PENDING,
+            metadata={
+                "start_line": c_data["start_line"],
+                "end_line": c_data["end_line"],
+                "fingerprint": _chunk_fingerprint(filename, c_data["content"])
+            }
+        )
+        chunks.append(chunk)
     
     return chunks
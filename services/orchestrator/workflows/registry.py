@@ -2,6 +2,8 @@ from typing import Dict, Type
 from ..git_operation.base_ops import BaseOps
 from ..git_operation.github_ops import GithubOps
 from ..git_operation.gitlab_ops import GitlabOps
+from ..git_operation.mirror_ops import GithubMirrorOps, GitlabMirrorOps
+from ..config import settings
 
 class ProviderRegistry:
     """
@@ -19,3 +21,7 @@ class ProviderRegistry:
     @classmethod
     def register_provider(cls, name: str, provider_class: Type[BaseOps]):
         cls._scm_providers[name.lower()] = provider_class
+
+if settings.SCM_READ_BACKEND == "mirror":
+    ProviderRegistry.register_provider("github", GithubMirrorOps)
+    ProviderRegistry.register_provider("gitlab", GitlabMirrorOps)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request, HTTPException, Header
 from typing import Optional
 from handler.github_handler import GitHubEventHandler
 from utils import logger, log_execution_time
+from dedup import delivery_dedup
 
 router = APIRouter(prefix="/webhook")
 
@@ -24,15 +25,26 @@ async def github_webhook(
         logger.warning(f"Invalid webhook signature received for delivery {x_github_delivery}")
         raise HTTPException(status_code=401, detail="Invalid signature")
 
-    # 2. Parse Payload
+    # 2. Drop Redeliveries
+    if not await delivery_dedup.claim("github", x_github_delivery):
+        logger.info(f"Duplicate delivery {x_github_delivery} ignored")
+        return {"status": "success", "message": "Duplicate delivery ignored"}
+
+    # 3. Parse Payload
     try:
         payload = await request.json()
     except Exception as e:
         logger.error(f"Failed to parse JSON payload for delivery {x_github_delivery}: {e}")
+        await delivery_dedup.release("github", x_github_delivery)
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
-    # 3. Handle Event (validate event/action and enqueue)
-    await GitHubEventHandler.handle_event(x_github_event, payload, x_github_delivery)
+    # 4. Handle Event (validate event/action and enqueue)
+    try:
+        await GitHubEventHandler.handle_event(x_github_event, payload, x_github_delivery)
+    except Exception:
+        # Let the provider's retry through
+        await delivery_dedup.release("github", x_github_delivery)
+        raise
 
-    # 4. Acknowledge Receipt
+    # 5. Acknowledge Receipt
     return {"status": "success", "message": "Event received"}
\ No newline at end of file
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request, HTTPException, Header
 from typing import Optional
 from handler.gitlab_handler import GitLabEventHandler
 from utils import logger, log_execution_time
+from dedup import delivery_dedup
 
 router = APIRouter(prefix="/webhook")
 
@@ -22,15 +23,26 @@ async def gitlab_webhook(
         logger.warning(f"Invalid GitLab token received for delivery {x_gitlab_event_uuid}")
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    # 2. Parse Payload
+    # 2. Drop Redeliveries
+    if not await delivery_dedup.claim("gitlab", x_gitlab_event_uuid):
+        logger.info(f"Duplicate delivery {x_gitlab_event_uuid} ignored")
+        return {"status": "success", "message": "Duplicate delivery ignored"}
+
+    # 3. Parse Payload
     try:
         payload = await request.json()
     except Exception as e:
         logger.error(f"Failed to parse JSON payload for delivery {x_gitlab_event_uuid}: {e}")
+        await delivery_dedup.release("gitlab", x_gitlab_event_uuid)
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
-    # 3. Handle Event
-    await GitLabEventHandler.handle_event(x_gitlab_event, payload, x_gitlab_event_uuid)
+    # 4. Handle Event
+    try:
+        await GitLabEventHandler.handle_event(x_gitlab_event, payload, x_gitlab_event_uuid)
+    except Exception:
+        # Let the provider's retry through
+        await delivery_dedup.release("gitlab", x_gitlab_event_uuid)
+        raise
 
-    # 4. Acknowledge Receipt
+    # 5. Acknowledge Receipt
     return {"status": "success", "message": "Event received"}
@@ -0,0 +1,164 @@
+import json
+import time
+import asyncio
+from typing import Optional, Set
+import redis.asyncio as aioredis
+from config import settings
+from utils import logger
+from queue_manager import queue_manager
+
+# Flush deadlines of every pending PR, shared by all webhook replicas
+PENDING_SET = "pr_pending_reviews"
+
+# Takes a due pending task by pushing its deadline one lease ahead, so exactly one
+# replica flushes it and a replica that dies mid-flush is retried after the lease
+_CLAIM_SCRIPT = """
+local deadline = redis.call('ZSCORE', KEYS[1], KEYS[2])
+if not deadline or tonumber(deadline) > tonumber(ARGV[1]) then
+    return false
+end
+local pending = redis.call('GET', KEYS[2])
+if not pending then
+    redis.call('ZREM', KEYS[1], KEYS[2])
+    return false
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[2]), KEYS[2])
+return pending
+"""
+
+# Removes the pending task once enqueued, unless a newer event replaced it meanwhile
+_COMPLETE_SCRIPT = """
+local pending = redis.call('GET', KEYS[2])
+if pending and cjson.decode(pending)['review_request_id'] ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+redis.call('ZREM', KEYS[1], KEYS[2])
+return 1
+"""
+
+class ReviewCoalescer:
+    """
+    Collapses bursts of PR events into a single review of the latest head.
+
+    Every event overwrites the pending task of its PR in Redis and moves the PR's flush
+    deadline `coalesce_window_seconds` ahead in the `pr_pending_reviews` sorted set.
+    Every replica sweeps the set; a due task is claimed, enqueued and only then deleted,
+    so neither a failed enqueue nor a crashed replica loses the review.
+    When a review is enqueued, the previously active review of the same PR is flagged
+    as cancelled so the orchestrator and LLM worker stop spending work on a stale head.
+    """
+    def __init__(self):
+        self.redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+        self._sweeper: Optional[asyncio.Task] = None
+        # Pending keys this process submitted, flushed early on shutdown
+        self._submitted: Set[str] = set()
+
+    @staticmethod
+    def _pr_key(prefix: str, task: dict) -> str:
+        return f"{prefix}:{task['provider']}:{task['repo']}:{task['pr_number']}"
+
+    def start(self):
+        """
+        Starts sweeping due flushes in the background. Idempotent.
+        """
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def submit(self, task: dict):
+        """
+        Records the task as the latest event for its PR and pushes back its flush deadline.
+        """
+        if settings.coalesce_window_seconds <= 0:
+            await self.enqueue(task)
+            return
+
+        pending_key = self._pr_key("pr_pending_review", task)
+        ttl = int(settings.coalesce_window_seconds * 10 + settings.coalesce_flush_lease_seconds) + 60
+        try:
+            previous = await self.redis.set(pending_key, json.dumps(task), ex=ttl, get=True)
+            if previous:
+                previous = json.loads(previous)
+                # A full review (open/reopen) in the burst must not be downgraded to incremental
+                if task.get("incremental") and not previous.get("incremental"):
+                    task = {**task, "incremental": False}
+                    await self.redis.set(pending_key, json.dumps(task), ex=ttl)
+                logger.info(f"Coalescing review {previous['review_request_id']} into {task['review_request_id']} ({pending_key})")
+            await self.redis.zadd(PENDING_SET, {pending_key: time.time() + settings.coalesce_window_seconds})
+        except aioredis.RedisError as e:
+            logger.warning(f"Coalescing unavailable, enqueueing directly: {e}")
+            await self.enqueue(task)
+            return
+
+        self._submitted.add(pending_key)
+        self.start()
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Failed to sweep coalesced reviews: {e}")
+            await asyncio.sleep(settings.coalesce_sweep_seconds)
+
+    async def sweep(self):
+        """
+        Flushes every pending review whose window has closed.
+        """
+        now = time.time()
+        for pending_key in await self.redis.zrangebyscore(PENDING_SET, "-inf", now):
+            await self._flush(pending_key, now)
+
+    async def _flush(self, pending_key: str, now: float):
+        pending = await self.redis.eval(
+            _CLAIM_SCRIPT, 2, PENDING_SET, pending_key, now, settings.coalesce_flush_lease_seconds
+        )
+        if not pending:
+            return
+        task = json.loads(pending)
+        try:
+            await self.enqueue(task)
+        except Exception as e:
+            logger.error(
+                f"Failed to enqueue coalesced review {task['review_request_id']}, "
+                f"retrying in {settings.coalesce_flush_lease_seconds:.0f}s: {e}"
+            )
+            return
+        await self.redis.eval(_COMPLETE_SCRIPT, 2, PENDING_SET, pending_key, task["review_request_id"])
+        self._submitted.discard(pending_key)
+
+    async def enqueue(self, task: dict):
+        """
+        Enqueues the review and cancels the in-flight review of the same PR, if any.
+        """
+        await queue_manager.enqueue(settings.orchestrator_queue, task)
+        active_key = self._pr_key("pr_active_review", task)
+        try:
+            previous = await self.redis.set(active_key, task["review_request_id"], ex=settings.cancel_flag_ttl, get=True)
+            if previous and previous != task["review_request_id"]:
+                await self.redis.set(f"review_cancelled:{previous}", task["review_request_id"], ex=settings.cancel_flag_ttl)
+                logger.info(f"Review {previous} superseded by {task['review_request_id']}, flagged as cancelled.")
+        except Exception as e:
+            logger.warning(f"Failed to supersede previous review for {active_key}: {e}")
+        logger.info(f"TASK ENQUEUED: START_PR_REVIEW | RequestID: {task['review_request_id']} | Repo: {task['repo']} | PR: #{task['pr_number']}")
+
+    async def drain(self):
+        """
+        Stops sweeping and flushes this replica's pending windows immediately.
+        Call on shutdown; windows that still fail stay in Redis for the other replicas.
+        """
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        submitted, self._submitted = self._submitted, set()
+        if not submitted:
+            return
+        now = time.time()
+        try:
+            await self.redis.zadd(PENDING_SET, {key: now for key in submitted}, xx=True)
+            for pending_key in submitted:
+                await self._flush(pending_key, now)
+        except aioredis.RedisError as e:
+            logger.error(f"Failed to flush pending reviews on shutdown: {e}")
+
+review_coalescer = ReviewCoalescer()
@@ -0,0 +1,49 @@
+import redis.asyncio as aioredis
+from typing import Dict
+from config import settings
+from utils import logger
+
+METRICS_KEY = "metrics:webhook_dedup"
+
+class DeliveryDeduplicator:
+    """
+    Drops webhook redeliveries by their delivery ID (X-GitHub-Delivery / X-Gitlab-Event-UUID).
+
+    Each ID is claimed with a single SET NX EX, so a repeat is rejected in one round trip
+    before anything is parsed or enqueued. Hits and misses are counted in a Redis hash
+    shared by all webhook replicas.
+    """
+    def __init__(self):
+        self.redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+
+    @staticmethod
+    def _key(provider: str, delivery_id: str) -> str:
+        return f"webhook_delivery:{provider}:{delivery_id}"
+
+    async def claim(self, provider: str, delivery_id: str) -> bool:
+        """
+        Returns True the first time a delivery is seen, False for a repeat.
+        Fails open when Redis is unavailable: a duplicate review beats a lost one.
+        """
+        try:
+            claimed = await self.redis.set(self._key(provider, delivery_id), 1, nx=True, ex=settings.delivery_dedup_ttl)
+            await self.redis.hincrby(METRICS_KEY, "misses" if claimed else "hits", 1)
+            return bool(claimed)
+        except aioredis.RedisError as e:
+            logger.warning(f"Delivery dedup unavailable, accepting {delivery_id}: {e}")
+            return True
+
+    async def release(self, provider: str, delivery_id: str):
+        """
+        Forgets a delivery whose processing failed, so the provider's retry is accepted.
+        """
+        try:
+            await self.redis.delete(self._key(provider, delivery_id))
+        except aioredis.RedisError as e:
+            logger.warning(f"Failed to release delivery {delivery_id}: {e}")
+
+    async def get_stats(self) -> Dict[str, int]:
+        stats = await self.redis.hgetall(METRICS_KEY)
+        return {"hits": int(stats.get("hits", 0)), "misses": int(stats.get("misses", 0))}
+
+delivery_dedup = DeliveryDeduplicator()
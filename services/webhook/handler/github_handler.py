@@ -5,7 +5,7 @@ from config import settings
 from schemas.github_model import PullRequestEvent
 from schemas.task_schema import StartPRReviewTask
 from utils import logger, log_execution_time, generate_id
-from queue_manager import queue_manager
+from coalescer import review_coalescer
 
 class GitHubEventHandler:
     """
@@ -73,13 +73,15 @@ class GitHubEventHandler:
             provider="github",
             repo=pr_event.repository.full_name,
             pr_number=pr_event.number,
-            delivery_id=delivery_id
+            delivery_id=delivery_id,
+            # New commits on an already reviewed PR: only review what changed
+            incremental=pr_event.action == "synchronize"
         )
 
-        # Push to the orchestrator_queue via Redis
+        # Hand over to the coalescer, which enqueues the latest event of a burst
         try:
-            await queue_manager.enqueue(settings.orchestrator_queue, task.model_dump())
-            logger.info(f"TASK ENQUEUED: START_PR_REVIEW | RequestID: {review_request_id} | Repo: {task.repo} | PR: #{task.pr_number}")
+            await review_coalescer.submit(task.model_dump())
+            logger.info(f"TASK ACCEPTED: START_PR_REVIEW | RequestID: {review_request_id} | Repo: {task.repo} | PR: #{task.pr_number}")
         except Exception as e:
             logger.error(f"Failed to enqueue task: {e}")
             raise HTTPException(status_code=500, detail="Failed to enqueue task")
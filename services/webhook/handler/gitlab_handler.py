@@ -3,7 +3,7 @@ from config import settings
 from schemas.gitlab_model import MergeRequestEvent
 from schemas.task_schema import StartPRReviewTask
 from utils import logger, log_execution_time, generate_id
-from queue_manager import queue_manager
+from coalescer import review_coalescer
 
 class GitLabEventHandler:
     """
@@ -61,13 +61,15 @@ class GitLabEventHandler:
             provider="gitlab",
             repo=mr_event.project.path_with_namespace,
             pr_number=mr_event.object_attributes.iid,
-            delivery_id=delivery_id
+            delivery_id=delivery_id,
+            # New commits on an already reviewed MR: only review what changed
+            incremental=mr_event.object_attributes.action == "update"
         )
 
-        # Push to the orchestrator_queue via Redis
+        # Hand over to the coalescer, which enqueues the latest event of a burst
         try:
-            await queue_manager.enqueue(settings.orchestrator_queue, task.model_dump())
-            logger.info(f"TASK ENQUEUED: START_PR_REVIEW | RequestID: {review_request_id} | Repo: {task.repo} | MR: !{task.pr_number}")
+            await review_coalescer.submit(task.model_dump())
+            logger.info(f"TASK ACCEPTED: START_PR_REVIEW | RequestID: {review_request_id} | Repo: {task.repo} | MR: !{task.pr_number}")
         except Exception as e:
             logger.error(f"Failed to enqueue task: {e}")
             raise HTTPException(status_code=500, detail="Failed to enqueue task")
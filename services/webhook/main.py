@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from api import github_api, gitlab_api
 from utils import logger
 
@@ -17,11 +17,29 @@ async def startup_event():
     logger.info("Webhook service is starting up...")
     from queue_manager import queue_manager
     await queue_manager.connect()
+    # Flush coalesced reviews whose window closed, including those of crashed replicas
+    from coalescer import review_coalescer
+    review_coalescer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Enqueue reviews still waiting in a coalescing window
+    from coalescer import review_coalescer
+    await review_coalescer.drain()
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    from dedup import delivery_dedup
+    try:
+        return {"delivery_dedup": await delivery_dedup.get_stats()}
+    except Exception as e:
+        logger.error(f"Failed to read metrics: {e}")
+        raise HTTPException(status_code=503, detail="Metrics unavailable")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -8,3 +8,4 @@ class StartPRReviewTask(BaseModel):
     repo: str
     pr_number: int
     delivery_id: str
+    incremental: bool = False
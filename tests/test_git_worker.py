@@ -0,0 +1,575 @@
+import sys
+import os
+import hashlib
+import zlib
+import pytest
+from unittest.mock import MagicMock, patch, AsyncMock
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.git_worker.git_operations.blob_cache import BlobCache, _ByteLRU
+
+HEAD_SHA = "a" * 40
+
+
+class FakePipeline:
+    def __init__(self, store):
+        self.store = store
+        self.commands = []
+
+    def set(self, key, value, ex=None, nx=False):
+        self.commands.append((key, value, nx))
+
+    def __len__(self):
+        return len(self.commands)
+
+    async def execute(self):
+        for key, value, nx in self.commands:
+            if nx and key in self.store:
+                continue
+            self.store[key] = value.encode() if isinstance(value, str) else value
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store)
+
+
+def test_blob_sha_matches_git_hash_object():
+    """Test that blob keys are git blob SHAs, so identical file versions share one entry."""
+    content = "print('hello')\n"
+    expected = hashlib.sha1(f"blob {len(content)}\0{content}".encode()).hexdigest()
+    assert BlobCache.blob_sha(content) == expected
+
+@pytest.mark.asyncio
+async def test_blob_cache_round_trip_through_redis():
+    """Test that a fresh process (empty LRU) is served from the shared Redis tier."""
+    redis = FakeRedis()
+    writer = BlobCache()
+    writer.redis = redis
+    await writer.put_many("owner/repo", {("app.py", HEAD_SHA): "x = 1", ("main.py", "main"): "y = 2"})
+
+    reader = BlobCache()
+    reader.redis = redis
+    cached = await reader.get_many("owner/repo", [("app.py", HEAD_SHA), ("main.py", "main")])
+
+    # Branch refs are mutable and never cached
+    assert cached == {("app.py", HEAD_SHA): "x = 1"}
+    assert zlib.decompress(redis.store[f"blob:{BlobCache.blob_sha('x = 1')}"]) == b"x = 1"
+
+def test_byte_lru_evicts_least_recently_used():
+    """Test that the in-process tier is bounded by total size, not entry count."""
+    lru = _ByteLRU(max_bytes=10)
+    lru.put("a", "12345")
+    lru.put("b", "12345")
+    lru.get("a")
+    lru.put("c", "123")
+
+    assert lru.get("b") is None
+    assert lru.get("a") == "12345"
+    assert lru.size == 8
+
+@pytest.mark.asyncio
+async def test_git_inline_comment_skips_already_posted_comment():
+    """
+    Test that a comment whose idempotency marker exists is not posted again.
+    """
+    from services.git_worker.models import Chunk, ChunkStatus, ReviewRequest
+    from services.git_worker.workflow import workflow_manager
+
+    chunk = Chunk(chunk_id="c1", review_request_id="r1", diff_snippet="+x",
+                  filename="a.py", line_number=3, comment_body="Avoid this.")
+    state = AsyncMock()
+    state.get_chunk.return_value = chunk
+    state.get_review_request.return_value = ReviewRequest(
+        review_request_id="r1", repo_id="owner/repo", pr_id=1, provider="github",
+        created_at=0.0, metadata={"head_sha": HEAD_SHA}
+    )
+    state.is_comment_posted.return_value = True
+
+    with patch("services.git_worker.workflow.state_manager", state), \
+         patch.object(workflow_manager.github_ops, "post_pr_comment", new_callable=AsyncMock) as post:
+        await workflow_manager.git_inline_comment({"chunk_id": "c1"})
+
+    post.assert_not_awaited()
+    assert state.save_chunk.await_args.args[0].status == ChunkStatus.POSTED
+
+
+class FakeStateRedis:
+    """In-memory stand-in for the hash commands used by the symbol index."""
+    def __init__(self):
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            def hset(self, key, mapping):
+                self.ops.append(lambda: redis.hashes.setdefault(key, {}).update(mapping))
+
+            def expire(self, key, ttl):
+                self.ops.append(lambda: True)
+
+            def exists(self, key):
+                self.ops.append(lambda: int(key in redis.hashes))
+
+            def hgetall(self, key):
+                self.ops.append(lambda: dict(redis.hashes.get(key, {})))
+
+            async def execute(self):
+                return [op() for op in self.ops]
+        return _Pipeline()
+
+    async def exists(self, key):
+        return int(key in self.hashes)
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+@pytest.mark.asyncio
+async def test_symbol_index_returns_only_the_requested_function():
+    """
+    Test that function lookups return just that definition and reuse the index per blob.
+    """
+    pytest.importorskip("tree_sitter_python")
+    from services.git_worker.symbol_index import SymbolIndex
+
+    content = "import os\n\nclass Repo:\n    def load(self):\n        return 1\n\ndef helper():\n    return 2\n"
+    fake_redis = FakeStateRedis()
+    index = SymbolIndex()
+
+    with patch("services.git_worker.symbol_index.state_manager", MagicMock(redis=fake_redis)):
+        assert await index.get_symbol_source(content, "repo.py", "helper") == "def helper():\n    return 2"
+        with patch.object(index.parser, "extract_symbols", side_effect=AssertionError("re-parsed")):
+            assert await index.get_symbol_source(content, "repo.py", "load") == "def load(self):\n        return 1"
+            assert await index.get_symbol_source(content, "repo.py", "missing") == ""
+            assert await index.get_symbol_source(content, "repo.py", "") == ""
+            assert await index.get_outline(content, "repo.py") == \
+                "Line 3: Class Repo\nLine 4: Function load\nLine 7: Function helper"
+        assert await index.get_outline(content, "README") is None
+
+def make_tree_scm(files):
+    """SCM stub serving a fixed tree; blob SHAs are real git blob hashes."""
+    from services.git_worker.git_operations.base_ops import BaseOps
+
+    class FakeTreeScm(BaseOps):
+        def __init__(self):
+            self.files = files
+            self.fetches = []
+
+        async def post_pr_comment(self, *args, **kwargs):
+            return True
+
+        async def _fetch_file_content(self, repo_id, file_path, ref):
+            self.fetches.append(file_path)
+            return self.files[file_path]
+
+        async def list_tree(self, repo_id, ref, path_filter=None, max_files=None):
+            return f"tree-{ref}", [
+                {"path": path, "sha": BlobCache.blob_sha(content)} for path, content in self.files.items()
+                if path_filter is None or path_filter(path)
+            ][:max_files]
+    return FakeTreeScm()
+
+@pytest.mark.asyncio
+async def test_find_definition_indexes_only_blobs_changed_since_last_tree():
+    """
+    Test that a definition in another file is found in one call, and that a new tree
+    only fetches the blobs it changed.
+    """
+    pytest.importorskip("tree_sitter_python")
+    from services.git_worker.definition_index import DefinitionIndex
+
+    files = {
+        "app/models.py": "class User:\n    pass\n",
+        "app/utils.py": "def slugify(text):\n    return text.lower()\n",
+        "README.md": "# docs\n",
+    }
+    scm = make_tree_scm(files)
+    blob_cache = AsyncMock()
+    blob_cache.get_many.return_value = {}
+    fake_redis = FakeStateRedis()
+    state = MagicMock(redis=fake_redis)
+
+    with patch("services.git_worker.symbol_index.state_manager", state), \
+         patch("services.git_worker.definition_index.state_manager", state), \
+         patch("services.git_worker.git_operations.base_ops.blob_cache", blob_cache):
+        index = DefinitionIndex()
+        result = await index.find_definition(scm, "owner/repo", "sha1", "slugify")
+        assert result.startswith("app/utils.py (Line 1, Function):\ndef slugify(text):")
+        assert scm.fetches == ["app/models.py", "app/utils.py", "app/utils.py"]
+
+        scm.files["app/utils.py"] = "import re\n\ndef slugify(text):\n    return re.sub('x', '', text)\n"
+        scm.fetches.clear()
+        result = await index.find_definition(scm, "owner/repo", "sha2", "slugify")
+        assert result.startswith("app/utils.py (Line 3, Function)")
+        # models.py is reused from its blob index
+        assert scm.fetches == ["app/utils.py", "app/utils.py"]
+        assert "No definition of 'missing'" in await index.find_definition(scm, "owner/repo", "sha2", "missing")
+
+@pytest.mark.asyncio
+async def test_gitlab_tree_listing_stops_paging_at_the_file_cap():
+    """
+    Test that a filtered, capped GitLab tree listing stops requesting pages once enough files matched.
+    """
+    import httpx
+    from services.git_worker.git_operations.gitlab_ops import GitlabOps
+
+    pages = []
+
+    async def request(method, endpoint, params=None, **kwargs):
+        page = int(params["page"])
+        pages.append(page)
+        items = [{"type": "blob", "path": f"f{page}_{i}.{'py' if i % 2 else 'md'}", "id": f"{page}{i}"} for i in range(4)]
+        return httpx.Response(200, json=items, headers={"X-Next-Page": str(page + 1)})
+
+    gitlab = GitlabOps()
+    with patch.object(gitlab, "_request", side_effect=request):
+        key, files = await gitlab.list_tree("7", "sha1", path_filter=lambda p: p.endswith(".py"), max_files=3)
+
+    assert key == "sha1" and pages == [1, 2]
+    assert [f["path"] for f in files] == ["f1_1.py", "f1_3.py", "f2_1.py"]
+
+class FakeBudgetRedis:
+    """Hash store plus a Python twin of the limiter's acquire script."""
+    def __init__(self, clock):
+        self.clock = clock
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipeline:
+            def hset(self, key, field=None, value=None, mapping=None):
+                redis.hashes.setdefault(key, {}).update(mapping or {field: value})
+
+            def expireat(self, key, when):
+                pass
+
+            def hincrby(self, key, field, amount):
+                redis.hashes.setdefault(key, {})[field] = int(redis.hashes.get(key, {}).get(field, 0)) + amount
+
+            async def execute(self):
+                return []
+        return _Pipeline()
+
+    async def hincrby(self, key, field, amount):
+        self.pipeline().hincrby(key, field, amount)
+
+    async def acquire(self, keys, args):
+        state = self.hashes.get(keys[0], {})
+        now, reserve = args
+        if float(state.get("blocked_until", 0)) > now:
+            return str(float(state["blocked_until"]) - now)
+        if "remaining" not in state or float(state["reset"]) <= now:
+            return "0"
+        if int(state["remaining"]) > reserve:
+            state["remaining"] = int(state["remaining"]) - 1
+            return "0"
+        return str(float(state["reset"]) - now)
+
+@pytest.mark.asyncio
+async def test_rate_limited_requests_are_delayed_and_comments_use_the_reserve():
+    """
+    Test that a 403 rate-limit response is retried after Retry-After, and that reads
+    wait for the window reset once only the comment-posting reserve is left.
+    """
+    import httpx
+    from services.git_worker.git_operations.http_client import ScmHttpClient
+    from services.git_worker.git_operations.rate_limiter import PRIORITY_HIGH
+
+    clock = [1000.0]
+    fake_redis = FakeBudgetRedis(lambda: clock[0])
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        clock[0] += seconds
+
+    reset = str(int(clock[0]) + 600)
+    responses = [
+        httpx.Response(403, headers={"Retry-After": "2", "X-RateLimit-Remaining": "4000", "X-RateLimit-Reset": reset}),
+        httpx.Response(200, headers={"X-RateLimit-Remaining": "150", "X-RateLimit-Reset": reset}),
+        httpx.Response(201, headers={"X-RateLimit-Remaining": "149", "X-RateLimit-Reset": reset}),
+        httpx.Response(200, headers={"X-RateLimit-Remaining": "5000", "X-RateLimit-Reset": str(int(reset) + 3600)}),
+    ]
+    client = ScmHttpClient("github", {})
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+    client.rate_limiter.redis = fake_redis
+    client.rate_limiter._acquire = fake_redis.acquire
+
+    with patch("services.git_worker.git_operations.rate_limiter.time.time", lambda: clock[0]), \
+         patch("services.git_worker.git_operations.rate_limiter.asyncio.sleep", fake_sleep), \
+         patch("services.git_worker.git_operations.response_cache.settings.SCM_HTTP_CACHE_ENABLED", False):
+        assert (await client.request("GET", "https://api.github.com/repos/o/r/contents/a.py")).status_code == 200
+        assert slept == [2.0]
+
+        # 150 left is below the reserve: comments still go, reads wait for the reset
+        assert (await client.request("POST", "https://api.github.com/repos/o/r/pulls/1/comments", priority=PRIORITY_HIGH)).status_code == 201
+        assert slept == [2.0]
+        assert (await client.request("GET", "https://api.github.com/repos/o/r/contents/b.py")).status_code == 200
+        assert slept == [2.0, 598.0]
+
+    metrics = fake_redis.hashes["metrics:scm_rate_limit"]
+    assert metrics["github:core:throttled"] == 1 and metrics["github:core:delayed"] == 2
+    assert metrics["github:core:remaining"] == "5000"
+
+@pytest.mark.asyncio
+async def test_rate_limit_backoff_is_slept_locally_when_redis_is_down():
+    """Test that a 429 is still retried after its back-off when the limiter cannot store it."""
+    import httpx
+    import redis.asyncio as aioredis
+    from services.git_worker.git_operations.http_client import ScmHttpClient
+
+    class DownRedis:
+        def pipeline(self, transaction=True):
+            return MagicMock(execute=AsyncMock(side_effect=aioredis.ConnectionError("down")))
+
+    async def acquire(keys, args):
+        raise aioredis.ConnectionError("down")
+
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    responses = [httpx.Response(429, headers={"Retry-After": "3"}), httpx.Response(200)]
+    client = ScmHttpClient("github", {})
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+    client.rate_limiter.redis = DownRedis()
+    client.rate_limiter._acquire = acquire
+
+    with patch("services.git_worker.git_operations.http_client.asyncio.sleep", fake_sleep), \
+         patch("services.git_worker.git_operations.response_cache.settings.SCM_HTTP_CACHE_ENABLED", False):
+        assert (await client.request("GET", "https://api.github.com/repos/o/r/contents/a.py")).status_code == 200
+
+    assert slept == [3.0]
+
+class FakeCacheRedis:
+    """Byte-valued hash store for the HTTP response cache."""
+    def __init__(self):
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipeline:
+            def delete(self, key):
+                redis.hashes.pop(key, None)
+
+            def hset(self, key, mapping):
+                redis.hashes[key] = {k.encode(): v if isinstance(v, bytes) else v.encode() for k, v in mapping.items()}
+
+            def expire(self, key, ttl):
+                pass
+
+            async def execute(self):
+                return []
+        return _Pipeline()
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hincrby(self, key, field, amount):
+        self.hashes.setdefault(key, {})[field] = self.hashes.get(key, {}).get(field, 0) + amount
+
+    async def expire(self, key, ttl):
+        pass
+
+@pytest.mark.asyncio
+async def test_conditional_get_serves_cached_body_on_304():
+    """
+    Test that a repeated GET is sent with If-None-Match and a 304 returns the stored body.
+    """
+    import httpx
+    from services.git_worker.git_operations.http_client import ScmHttpClient
+
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"', "X-RateLimit-Remaining": "4999"})
+        return httpx.Response(200, json={"sha": "abc"}, headers={
+            "ETag": '"v1"', "Link": '<https://api.github.com/x?page=2>; rel="next"'
+        })
+
+    client = ScmHttpClient("github", {"Authorization": "token t"})
+    client._client = httpx.AsyncClient(headers=client.headers, transport=httpx.MockTransport(handler))
+    client.response_cache.redis = FakeCacheRedis()
+
+    with patch("services.git_worker.git_operations.rate_limiter.settings.SCM_RATE_LIMIT_ENABLED", False):
+        first = await client.request("GET", "https://api.github.com/repos/o/r/pulls/1", params={"a": "1"})
+        second = await client.request("GET", "https://api.github.com/repos/o/r/pulls/1", params={"a": "1"})
+
+    assert seen == [None, '"v1"']
+    assert second.status_code == 200 and second.json() == first.json() == {"sha": "abc"}
+    assert second.links["next"]["url"] == "https://api.github.com/x?page=2"
+    assert second.headers["X-RateLimit-Remaining"] == "4999"
+    assert client.response_cache.redis.hashes["metrics:scm_http_cache"] == {"hits": 1, "misses": 1}
+
+class FakeBufferRedis:
+    """List/string commands used by the review comment buffer."""
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            def rpush(self, key, value):
+                self.ops.append(lambda: redis.store.setdefault(key, []).append(value) or len(redis.store[key]))
+
+            def expire(self, key, ttl):
+                self.ops.append(lambda: True)
+
+            def set(self, key, value, nx=False, ex=None):
+                self.ops.append(lambda: None if nx and key in redis.store else redis.store.__setitem__(key, str(value)) or True)
+
+            def get(self, key):
+                self.ops.append(lambda: redis.store.get(key))
+
+            def lrange(self, key, start, end):
+                self.ops.append(lambda: list(redis.store.get(key, [])))
+
+            def delete(self, *keys):
+                self.ops.append(lambda: sum(redis.store.pop(k, None) is not None for k in keys))
+
+            def zadd(self, key, mapping, nx=False):
+                def op():
+                    scores = redis.store.setdefault(key, {})
+                    scores.update({m: v for m, v in mapping.items() if not (nx and m in scores)})
+                self.ops.append(op)
+
+            def zscore(self, key, member):
+                self.ops.append(lambda: redis.store.get(key, {}).get(member))
+
+            def zrem(self, key, member):
+                self.ops.append(lambda: redis.store.get(key, {}).pop(member, None))
+
+            async def execute(self):
+                results = [op() for op in self.ops]
+                # Empty sorted sets disappear, like in Redis
+                for key in [k for k, v in redis.store.items() if v == {}]:
+                    del redis.store[key]
+                return results
+        return _Pipeline()
+
+    async def zrangebyscore(self, key, low, high):
+        return [m for m, score in self.store.get(key, {}).items() if score <= high]
+
+    async def zrem(self, key, member):
+        self.store.get(key, {}).pop(member, None)
+
+@pytest.mark.asyncio
+async def test_comments_are_buffered_and_posted_as_one_review():
+    """
+    Test that ready comments wait in the buffer while chunks are in flight and are
+    posted as a single review once the last chunk of the review finishes.
+    """
+    from services.git_worker.models import Chunk, ChunkStatus, ReviewRequest
+    from services.git_worker.workflow import workflow_manager
+    from services.git_worker.review_batcher import review_batcher
+    from services.git_worker.state import IN_FLIGHT_STATUSES
+
+    chunks = {
+        cid: Chunk(chunk_id=cid, review_request_id="r1", diff_snippet="+x", filename="a.py",
+                   line_number=line, comment_body=f"Issue {cid}", status=ChunkStatus.COMMENT_READY)
+        for cid, line in (("c1", 3), ("c2", 9))
+    }
+    statuses = {"c1": "COMMENT_READY", "c2": "LLM_IN_PROGRESS", "c3": "LLM_IN_PROGRESS"}
+    state = AsyncMock()
+    state.redis = FakeBufferRedis()
+    state.get_chunk.side_effect = lambda cid: chunks[cid].model_copy()
+    state.get_chunks.side_effect = lambda ids: [chunks[cid].model_copy() for cid in ids]
+    state.count_in_flight.side_effect = lambda rrid: sum(s in IN_FLIGHT_STATUSES for s in statuses.values())
+    state.get_review_request.return_value = ReviewRequest(
+        review_request_id="r1", repo_id="owner/repo", pr_id=1, provider="github",
+        created_at=0.0, metadata={"head_sha": HEAD_SHA}
+    )
+    state.is_comment_posted.return_value = False
+
+    with patch("services.git_worker.workflow.state_manager", state), \
+         patch("services.git_worker.review_batcher.state_manager", state), \
+         patch.object(workflow_manager.github_ops, "_request", new_callable=AsyncMock) as request:
+        await workflow_manager.git_inline_comment({"chunk_id": "c1"})
+        request.assert_not_awaited()
+
+        statuses.update({"c2": "COMMENT_READY", "c3": "COMPLETED"})
+        await workflow_manager.git_inline_comment({"chunk_id": "c2"})
+
+    request.assert_awaited_once()
+    method, endpoint = request.await_args.args
+    assert (method, endpoint) == ("POST", "repos/owner/repo/pulls/1/reviews")
+    review = request.await_args.kwargs["json"]
+    assert review["commit_id"] == HEAD_SHA and review["event"] == "COMMENT"
+    assert [(c["line"], c["body"]) for c in review["comments"]] == [(3, "Issue c1"), (9, "Issue c2")]
+    saved = {call.args[0].chunk_id: call.args[0].status for call in state.save_chunk.await_args_list}
+    assert saved == {"c1": ChunkStatus.POSTED, "c2": ChunkStatus.POSTED}
+    assert state.mark_comment_posted.await_count == 2
+    assert "r1" not in review_batcher._buffered and state.redis.store == {}
+
+@pytest.mark.asyncio
+async def test_overdue_buffer_of_a_crashed_worker_is_swept_and_failed_gitlab_drafts_are_deleted():
+    """
+    Test that another replica's sweep flushes a buffer past its deadline, and that
+    GitLab drafts created in an attempt whose bulk_publish fails are deleted.
+    """
+    import time
+    import httpx
+    from services.git_worker.models import Chunk, ChunkStatus, ReviewRequest
+    from services.git_worker.review_batcher import ReviewBatcher, DUE_KEY
+    from services.git_worker.git_operations.gitlab_ops import GitlabOps
+
+    chunks = {"c1": Chunk(chunk_id="c1", review_request_id="r1", diff_snippet="+x", filename="a.py",
+                          line_number=3, comment_body="Issue", status=ChunkStatus.COMMENT_READY)}
+    state = AsyncMock()
+    state.redis = FakeBufferRedis()
+    state.get_chunks.side_effect = lambda ids: [chunks[cid].model_copy() for cid in ids]
+    state.count_in_flight.return_value = 1
+    state.get_review_request.return_value = ReviewRequest(
+        review_request_id="r1", repo_id="7", pr_id=1, provider="gitlab",
+        created_at=0.0, metadata={"head_sha": HEAD_SHA}
+    )
+    state.is_comment_posted.return_value = False
+    gitlab = GitlabOps()
+    calls = []
+
+    async def request(method, endpoint, **kwargs):
+        calls.append((method, endpoint))
+        if endpoint.endswith("bulk_publish"):
+            raise RuntimeError("Failed to communicate with GitLab: 500")
+        return httpx.Response(201, json={"id": 41})
+
+    with patch("services.git_worker.review_batcher.state_manager", state), \
+         patch.object(gitlab, "_request", side_effect=request):
+        # The worker that buffered the comment dies before its deadline
+        await ReviewBatcher().add(gitlab, state.get_review_request.return_value, chunks["c1"])
+        assert calls == []
+        state.redis.store[DUE_KEY]["r1"] = time.time() - 1
+
+        await ReviewBatcher().sweep(lambda provider: gitlab)
+
+    assert calls == [
+        ("POST", "projects/7/merge_requests/1/draft_notes"),
+        ("POST", "projects/7/merge_requests/1/draft_notes/bulk_publish"),
+        ("DELETE", "projects/7/merge_requests/1/draft_notes/41"),
+    ]
+    assert state.save_chunk.await_args.args[0].status == ChunkStatus.FAILED
+    assert state.redis.store == {}
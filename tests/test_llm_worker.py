@@ -0,0 +1,365 @@
+import sys
+import os
+import json
+import pytest
+from unittest.mock import patch
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_worker.llms.json_stream import JsonStreamAssembler
+
+
+def test_json_stream_assembler_detects_end_of_answer():
+    """Test that the answer is complete at its closing brace, even with braces inside strings."""
+    assembler = JsonStreamAssembler()
+    deltas = ['```json\n{"model": "answer", ', '"content": [{"comment": "use \\"{}\\" here"}', '], "tool_call": {}', '}\n```']
+    results = [assembler.feed(d) for d in deltas]
+
+    assert results == [False, False, False, True]
+    assert json.loads(assembler.text)["content"][0]["comment"] == 'use "{}" here'
+
+@pytest.mark.asyncio
+async def test_openai_stream_is_closed_once_the_answer_is_complete():
+    """
+    Test that a streamed completion is assembled from SSE deltas on the pooled client
+    and that text after the complete JSON answer is left out.
+    """
+    import httpx
+    from services.llm_worker.llms import http_client
+    from services.llm_worker.llms.open_ai_client import OpenAILLM
+
+    answer = {"model": "answer", "content": [], "tool_call": {}}
+    text = json.dumps(answer)
+    events = [{"choices": [{"delta": {"content": text[i:i + 7]}}]} for i in range(0, len(text), 7)]
+    events.append({"choices": [{"delta": {"content": " trailing"}}]})
+    body = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content))
+        return httpx.Response(200, content=body.encode())
+
+    client = OpenAILLM()
+    client.api_key = "sk-test"
+    with patch.object(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler))):
+        assert json.loads(await client.agenerate_response([{"role": "user", "content": "hi"}], stream=True)) == answer
+        assert http_client.get_http_client() is http_client._client
+
+    assert seen[0]["stream"] is True and seen[0]["response_format"] == {"type": "json_object"}
+
+class FakeClaimRedis:
+    """In-memory stand-in for the claim keys of the chunk batcher."""
+    def __init__(self):
+        self.claims = {}
+
+    async def eval(self, script, numkeys, key, owner, ttl):
+        return int(self.claims.setdefault(key, owner) == owner)
+
+    async def get(self, key):
+        return self.claims.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.claims[key] = value
+
+    def pipeline(self, transaction=True):
+        return FakeLruRedis.pipeline(self)
+
+
+def make_batch_state(chunks):
+    """State whose saved chunks are what the next message reads back."""
+    from unittest.mock import AsyncMock
+    from services.llm_worker.models import ReviewRequest
+
+    state = AsyncMock()
+    state.redis = FakeClaimRedis()
+    state.is_review_cancelled.return_value = False
+    state.get_chunk.side_effect = lambda cid: chunks[cid].model_copy(deep=True)
+    state.get_file_chunks.side_effect = lambda rrid, filename: [
+        c.model_copy(deep=True) for c in chunks.values() if c.filename == filename
+    ]
+    state.save_chunk.side_effect = lambda chunk: chunks.__setitem__(chunk.chunk_id, chunk.model_copy(deep=True))
+    state.get_review_request.return_value = ReviewRequest(
+        review_request_id="r1", repo_id="owner/repo", pr_id=1, provider="github", created_at=0.0
+    )
+    return state
+
+def make_chunks():
+    from services.llm_worker.models import Chunk, ChunkStatus
+
+    return {
+        cid: Chunk(chunk_id=cid, review_request_id="r1", diff_snippet=f"{line}: +x = {cid}", filename=name,
+                   status=ChunkStatus.LLM_IN_PROGRESS, metadata={"start_line": line})
+        for cid, name, line in (("c1", "a.py", 1), ("c2", "a.py", 40), ("c3", "b.py", 1))
+    }
+
+@pytest.mark.asyncio
+async def test_small_chunks_of_one_file_share_one_request():
+    """
+    Test that the first chunk's message reviews its same-file siblings in one request,
+    demultiplexes the answer per chunk_id, and that the siblings' messages are skipped.
+    A sibling the orchestrator has not handed over yet is left alone.
+    """
+    from unittest.mock import AsyncMock, MagicMock
+    from services.llm_worker.models import Chunk, ChunkStatus
+    from services.llm_worker.workflow import workflow_manager
+
+    chunks = make_chunks()
+    chunks["c4"] = Chunk(chunk_id="c4", review_request_id="r1", diff_snippet="80: +y = 1", filename="a.py",
+                         status=ChunkStatus.PENDING, metadata={"start_line": 80})
+    state = make_batch_state(chunks)
+    conversations = MagicMock(fetch_conversation=AsyncMock(return_value=[]))
+    llm = MagicMock(agenerate_response=AsyncMock(return_value=json.dumps({"reviews": [
+        {"chunk_id": "c2", "model": "answer", "content": [], "tool_call": {}},
+        {"chunk_id": "c1", "model": "answer", "content": [{"file": "a.py", "line": 1, "comment": "Bad."}], "tool_call": {}},
+    ]})))
+    queue = MagicMock(enqueue=AsyncMock())
+
+    with patch("services.llm_worker.workflow.state_manager", state), \
+         patch("services.llm_worker.chunk_batcher.state_manager", state), \
+         patch("services.llm_worker.workflow.conversation_manager", conversations), \
+         patch("services.llm_worker.workflow.queue_manager", queue), \
+         patch.object(workflow_manager, "llm", llm):
+        await workflow_manager.pr_review_workflow({"chunk_id": "c1"})
+        await workflow_manager.pr_review_workflow({"chunk_id": "c2"})
+
+    llm.agenerate_response.assert_awaited_once()
+    prompt = llm.agenerate_response.await_args.args[0][1]["content"]
+    assert "### Chunk c1" in prompt and "### Chunk c2" in prompt and "c3" not in prompt and "c4" not in prompt
+    assert chunks["c1"].status == ChunkStatus.COMMENT_READY and chunks["c1"].comment_body == "Bad."
+    assert chunks["c2"].status == ChunkStatus.COMPLETED and chunks["c4"].status == ChunkStatus.PENDING
+    queue.enqueue.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_chunk_left_out_of_a_batch_is_reviewed_once():
+    """
+    Test that a sibling the batch answer leaves out is re-enqueued on its own, and that
+    its original and re-enqueued messages together make one more request and one comment.
+    """
+    from unittest.mock import AsyncMock, MagicMock
+    from services.llm_worker.models import Action, ChunkStatus
+    from services.llm_worker.workflow import workflow_manager
+
+    chunks = make_chunks()
+    state = make_batch_state(chunks)
+    conversations = MagicMock(fetch_conversation=AsyncMock(return_value=[]), append_messages=AsyncMock())
+    llm = MagicMock(agenerate_response=AsyncMock(side_effect=[
+        json.dumps({"reviews": [{"chunk_id": "c1", "model": "answer", "content": [], "tool_call": {}}]}),
+        json.dumps({"model": "answer", "content": [{"file": "a.py", "line": 40, "comment": "Bad."}], "tool_call": {}})
+    ]))
+    queue = MagicMock(enqueue=AsyncMock())
+
+    with patch("services.llm_worker.workflow.state_manager", state), \
+         patch("services.llm_worker.chunk_batcher.state_manager", state), \
+         patch("services.llm_worker.workflow.conversation_manager", conversations), \
+         patch("services.llm_worker.workflow.queue_manager", queue), \
+         patch.object(workflow_manager, "llm", llm):
+        await workflow_manager.pr_review_workflow({"chunk_id": "c1"})
+        assert queue.enqueue.await_args.args[1] == {"chunk_id": "c2"}
+        await workflow_manager.pr_review_workflow({"chunk_id": "c2"})
+        await workflow_manager.pr_review_workflow({"chunk_id": "c2"})
+
+    assert llm.agenerate_response.await_count == 2
+    comments = [c for c in queue.enqueue.await_args_list if c.args[1].get("action") == Action.GIT_COMMENT.value]
+    assert [c.args[1]["chunk_id"] for c in comments] == ["c2"]
+    assert chunks["c1"].status == ChunkStatus.COMPLETED and chunks["c2"].status == ChunkStatus.COMMENT_READY
+
+@pytest.mark.asyncio
+async def test_anthropic_marks_static_prefix_cacheable_and_records_cache_hits():
+    """
+    Test that the system prompt and conversation prefix carry cache_control breakpoints
+    and that cache-read tokens from the stream are recorded per provider.
+    """
+    import httpx
+    from unittest.mock import AsyncMock
+    from services.llm_worker.llms import http_client
+    from services.llm_worker.llms.anthropic_client import AnthropicLLM
+    from services.llm_worker.usage import usage_recorder
+
+    answer = json.dumps({"model": "answer", "content": [], "tool_call": {}})
+    events = [
+        {"type": "message_start", "message": {"usage": {"input_tokens": 50, "cache_read_input_tokens": 1800,
+                                                        "cache_creation_input_tokens": 0, "output_tokens": 1}}},
+        {"type": "content_block_delta", "delta": {"type": "text_delta", "text": answer}},
+        {"type": "message_delta", "usage": {"output_tokens": 30}}
+    ]
+    body = "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content))
+        return httpx.Response(200, content=body.encode())
+
+    client = AnthropicLLM()
+    client.api_key = "test"
+    messages = [
+        {"role": "system", "content": "static rules"},
+        {"role": "user", "content": "diff"},
+        {"role": "assistant", "content": "tool call"},
+        {"role": "user", "content": "context"}
+    ]
+    with patch.object(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler))), \
+            patch.object(usage_recorder, "record", AsyncMock()) as record:
+        assert await client.agenerate_response(messages, stream=True) == answer
+
+    assert seen[0]["system"] == [{"type": "text", "text": "static rules", "cache_control": {"type": "ephemeral"}}]
+    assert seen[0]["messages"][-1]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert messages[-1]["content"] == "context"
+    # A first turn only caches the system prompt
+    first_turn = {"system": "static rules", "messages": [{"role": "user", "content": "diff"}]}
+    AnthropicLLM._add_cache_breakpoints(first_turn)
+    assert first_turn["messages"] == [{"role": "user", "content": "diff"}]
+    provider, usage = record.await_args.args
+    assert provider == "Anthropic" and usage["cached_input_tokens"] == 1800 and usage["input_tokens"] == 50
+    # Reported by the final message_delta, after the answer is complete
+    assert usage["output_tokens"] == 30
+
+
+class FakeLruRedis:
+    """In-memory stand-in for the hash and sorted-set commands of the response cache."""
+    def __init__(self):
+        self.hashes = {}
+        self.zset = {}
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            async def execute(self):
+                return [await getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+        return _Pipeline()
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    async def hincrby(self, key, field, amount):
+        entry = self.hashes.setdefault(key, {})
+        entry[field] = str(int(entry.get(field, 0)) + amount)
+
+    async def expire(self, key, ttl):
+        pass
+
+    async def zadd(self, key, mapping):
+        self.zset.update(mapping)
+
+    async def zcard(self, key):
+        return len(self.zset)
+
+    async def zpopmin(self, key, count):
+        popped = sorted(self.zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del self.zset[member]
+        return popped
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.hashes.pop(key, None)
+
+@pytest.mark.asyncio
+async def test_identical_snippet_in_another_pr_is_answered_from_cache():
+    """
+    Test that the same chunk in another review hits the cache without a completion,
+    that hits and tokens saved are counted, and that the least recently used entry is evicted.
+    """
+    from unittest.mock import AsyncMock, MagicMock
+    from services.llm_worker.models import Chunk, ChunkStatus
+    from services.llm_worker.workflow import workflow_manager
+    from services.llm_worker.response_cache import response_cache
+
+    redis = FakeLruRedis()
+    state = AsyncMock()
+    state.redis = redis
+    state.get_review_request.return_value = None
+    answer = json.dumps({"model": "answer", "content": [], "tool_call": {}})
+    llm = MagicMock(agenerate_response=AsyncMock(return_value=answer))
+    llm.name, llm.model = "OpenAI", "gpt-4"
+    conversations = MagicMock(append_messages=AsyncMock())
+
+    def chunk(review, snippet):
+        return Chunk(chunk_id=f"{review}-c", review_request_id=review, diff_snippet=snippet,
+                     filename="vendor/lib.py", status=ChunkStatus.PENDING)
+
+    with patch("services.llm_worker.workflow.state_manager", state), \
+         patch("services.llm_worker.response_cache.state_manager", state), \
+         patch("services.llm_worker.workflow.conversation_manager", conversations), \
+         patch("services.llm_worker.response_cache.settings.LLM_RESPONSE_CACHE_MAX_ENTRIES", 1), \
+         patch.object(workflow_manager, "llm", llm):
+        await workflow_manager.review_chunk(chunk("r1", "10: +x = 1\r\n"), [])
+        await workflow_manager.review_chunk(chunk("r2", "10: +x = 1  \n"), [])
+        assert llm.agenerate_response.await_count == 1
+
+        await workflow_manager.review_chunk(chunk("r3", "10: +x = 2\n"), [])
+        stats = await response_cache.get_stats()
+
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["tokens_saved"] > 0
+    assert stats["evictions"] == 1 and len(redis.zset) == 1
+
+
+class FakeListRedis:
+    """In-memory stand-in for the list commands of the conversation store."""
+    def __init__(self):
+        self.lists = {}
+
+    def pipeline(self, transaction=True):
+        return FakeLruRedis.pipeline(self)
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    async def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        end = len(items) if end == -1 else end + 1
+        return items[start:end] if start >= 0 else items[max(len(items) + start, 0):end]
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def expire(self, key, ttl):
+        pass
+
+@pytest.mark.asyncio
+async def test_conversation_keeps_diff_and_a_budgeted_window_of_tool_rounds():
+    """
+    Test that turns are appended to a list, whole-file tool outputs are cut to their
+    budget, and a fetch sends the pinned diff plus the latest rounds that fit.
+    """
+    from services.llm_worker.conversation_manager import conversation_manager
+    from services.llm_worker.utils.tokens import estimate_tokens
+
+    from services.llm_worker.state import StateManager
+
+    redis = FakeListRedis()
+    state = StateManager.__new__(StateManager)
+    state.redis = redis
+
+    make = conversation_manager.create_message
+    big_file = "\n".join(f"line {i} = {'x' * 60}" for i in range(2000))
+    with patch("services.llm_worker.conversation_manager.state_manager", state), \
+         patch("services.llm_worker.conversation_manager.settings.LLM_CONVERSATION_TOKEN_BUDGET", 5000), \
+         patch("services.llm_worker.conversation_manager.settings.LLM_TOOL_OUTPUT_TOKEN_BUDGET", 1500):
+        await conversation_manager.append_messages("r1", "c1", [make("system", "rules"), make("user", "the diff"),
+                                                                make("assistant", "tool 0")])
+        for i in range(1, 4):
+            output = conversation_manager.fit_tool_output(big_file)
+            assert estimate_tokens(output) <= 1520 and "omitted" in output and output.endswith(big_file[-60:])
+            await conversation_manager.append_messages("r1", "c1", [make("user", output), make("assistant", f"tool {i}")])
+
+        conversation = await conversation_manager.fetch_conversation("r1", "c1")
+
+    assert len(redis.lists["conversation:r1:c1"]) == 9
+    assert [m["content"] for m in conversation[:2]] == ["rules", "the diff"]
+    # The 6-message window starts on a tool output, which is dropped to resume on an assistant turn
+    assert [m["role"] for m in conversation[2:]] == ["assistant", "user", "assistant", "user", "assistant"]
+    assert conversation[-1]["content"] == "tool 3" and conversation[2]["content"] == "tool 1"
+    assert all(set(m) == {"role", "content"} for m in conversation)
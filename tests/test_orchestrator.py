@@ -1,6 +1,8 @@
 import sys
 import os
+import json
 import asyncio
+import difflib
 import pytest
 from unittest.mock import MagicMock, patch, AsyncMock
 
@@ -10,12 +12,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Import components
 # Note: we mock the dependencies of main/worker to avoid side effects
 with patch("services.orchestrator.main.setup_logging"):
-    from services.orchestrator.main import worker_loop
+    from services.orchestrator.main import handle_task
 
 @pytest.mark.asyncio
-async def test_worker_loop_start_pr_review():
+async def test_handle_task_start_pr_review():
     """
-    Test that the worker loop correctly handles a START_PR_REVIEW action.
+    Test that the worker correctly dispatches a START_PR_REVIEW action.
     """
     # Mocking task data
     mock_task = {
@@ -25,81 +27,527 @@ async def test_worker_loop_start_pr_review():
         "pr_number": 1
     }
 
-    # Mocking queue_manager.dequeue to return a task then None (to break loop)
-    # We use a side_effect to return the task once, then raise an exception or stop
-    with patch("services.orchestrator.main.queue_manager") as mock_queue:
-        with patch("services.orchestrator.main.workflow_manager") as mock_workflow:
-            mock_queue.dequeue.side_effect = [mock_task, None]
-            
-            # Since worker_loop is a 'while True' loop, we need a way to stop it.
-            # We'll use a timeout and cancel the task.
-            try:
-                task = asyncio.create_task(worker_loop())
-                # Give it enough time to process one item
-                await asyncio.sleep(0.1) 
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
-            except Exception:
-                pass
-
-            # Assertions
-            mock_workflow.pr_review_workflow.assert_called_once_with(mock_task)
+    with patch("services.orchestrator.main.workflow_manager") as mock_workflow:
+        mock_workflow.pr_review_workflow = AsyncMock()
+        await handle_task(mock_task)
+
+        # Assertions
+        mock_workflow.pr_review_workflow.assert_awaited_once_with(mock_task)
 
 @pytest.mark.asyncio
-async def test_worker_loop_evaluate_chunk():
+async def test_handle_task_evaluate_chunk():
     """
-    Test that the worker loop correctly handles an EVALUATE_CHUNK action.
+    Test that the worker correctly dispatches an EVALUATE_CHUNK action.
     """
     mock_task = {
         "action": "EVALUATE_CHUNK",
         "chunk_id": "chunk-456"
     }
 
-    with patch("services.orchestrator.main.queue_manager") as mock_queue:
-        with patch("services.orchestrator.main.workflow_manager") as mock_workflow:
-            mock_queue.dequeue.side_effect = [mock_task, None]
-            
-            try:
-                task = asyncio.create_task(worker_loop())
-                await asyncio.sleep(0.1)
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
-            except Exception:
-                pass
-
-            mock_workflow.evaluate_chunk.assert_called_once_with(mock_task)
+    with patch("services.orchestrator.main.workflow_manager") as mock_workflow:
+        mock_workflow.evaluate_chunk = AsyncMock()
+        await handle_task(mock_task)
+
+        mock_workflow.evaluate_chunk.assert_awaited_once_with(mock_task)
 
 @pytest.mark.asyncio
-async def test_worker_loop_unknown_action():
+async def test_handle_task_unknown_action():
     """
-    Test that the worker loop handles unknown actions gracefully.
+    Test that the worker handles unknown actions gracefully.
     """
     mock_task = {
         "action": "UNKNOWN_ACTION"
     }
 
-    with patch("services.orchestrator.main.queue_manager") as mock_queue:
-        with patch("services.orchestrator.main.workflow_manager") as mock_workflow:
-            with patch("services.orchestrator.main.logger") as mock_logger:
-                mock_queue.dequeue.side_effect = [mock_task, None]
-                
-                try:
-                    task = asyncio.create_task(worker_loop())
-                    await asyncio.sleep(0.1)
-                    task.cancel()
-                    try:
-                        await task
-                    except asyncio.CancelledError:
-                        pass
-                except Exception:
-                    pass
-
-                mock_logger.warning.assert_called_with("Unknown action received: %s", "UNKNOWN_ACTION")
-                mock_workflow.pr_review_workflow.assert_not_called()
-                mock_workflow.evaluate_chunk.assert_not_called()
+    with patch("services.orchestrator.main.workflow_manager") as mock_workflow:
+        with patch("services.orchestrator.main.logger") as mock_logger:
+            await handle_task(mock_task)
+
+            mock_logger.warning.assert_called_with("Unknown action received: %s", "UNKNOWN_ACTION")
+            mock_workflow.pr_review_workflow.assert_not_called()
+            mock_workflow.evaluate_chunk.assert_not_called()
+
+class FakeMessage:
+    """aio_pika-like message whose process() context records the ack."""
+    def __init__(self, body):
+        self.body = json.dumps(body).encode()
+        self.acked = False
+
+    def process(self, requeue=False):
+        message = self
+
+        class _Context:
+            async def __aenter__(self):
+                return message
+
+            async def __aexit__(self, exc_type, exc, tb):
+                message.acked = exc_type is None
+                return False
+        return _Context()
+
+@pytest.mark.asyncio
+async def test_consumer_bounds_in_flight_handlers_and_drains():
+    """
+    Test that the consumer runs handlers concurrently up to its limit and drains them on stop.
+    """
+    from services.orchestrator.consumer import Consumer
+
+    in_flight, peak, handled = 0, 0, []
+
+    async def handler(task):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        handled.append(task["n"])
+
+    consumer = Consumer("orchestrator_queue", handler, concurrency=2)
+    messages = [FakeMessage({"n": i}) for i in range(5)]
+    for message in messages:
+        await consumer._on_message(message)
+    await consumer.drain()
+
+    assert peak == 2
+    assert sorted(handled) == [0, 1, 2, 3, 4]
+    assert all(m.acked for m in messages)
+
+@pytest.mark.asyncio
+async def test_prefetch_file_contents_batches_base_and_head():
+    """
+    Test that base/head contents for all reviewable files are requested in one bulk call.
+    """
+    from services.orchestrator.workflows.pr_review_helpers import _prefetch_file_contents
+
+    scm = MagicMock()
+    scm.get_file_contents = AsyncMock(return_value={("app.py", "base"): "a", ("app.py", "head"): "b"})
+    file_changes = [
+        {"filename": "app.py", "patch": "@@ -1 +1 @@", "status": "modified"},
+        {"filename": "new.py", "patch": "@@ -0,0 +1 @@", "status": "added"},
+        {"filename": "poetry.lock", "patch": "@@ -1 +1 @@", "status": "modified"},
+    ]
+
+    contents = await _prefetch_file_contents(scm, "owner/repo", file_changes, "base", "head")
+
+    scm.get_file_contents.assert_awaited_once_with(
+        "owner/repo", [("app.py", "base"), ("app.py", "head"), ("new.py", "head")], {}
+    )
+    assert contents[("app.py", "head")] == "b"
+
+@pytest.mark.asyncio
+async def test_github_get_file_contents_uses_graphql_batches():
+    """
+    Test that GithubOps resolves many blobs with a single GraphQL request per batch.
+    """
+    from services.orchestrator.git_operation.github_ops import GithubOps
+
+    ops = GithubOps()
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"data": {"repository": {
+        "f0": {"text": "print(1)", "isBinary": False, "isTruncated": False},
+        "f1": {"text": None, "isBinary": True, "isTruncated": False},
+        "f2": None,
+    }}}
+
+    with patch.object(ops.http, "request", AsyncMock(return_value=response)) as mock_request, \
+         patch("services.orchestrator.git_operation.base_ops.blob_cache") as mock_cache:
+        mock_cache.get_many = AsyncMock(return_value={})
+        mock_cache.put_many = AsyncMock()
+        result = await ops.get_file_contents(
+            "owner/repo", [("a.py", "s1"), ("logo.png", "s1"), ("gone.py", "s1")]
+        )
+
+    assert mock_request.await_count == 1
+    assert mock_request.call_args.kwargs["json"]["variables"]["e0"] == "s1:a.py"
+    assert result == {("a.py", "s1"): "print(1)", ("logo.png", "s1"): None, ("gone.py", "s1"): None}
+
+def test_scm_http_client_is_shared_per_provider():
+    """
+    Test that all ops instances of a provider reuse one pooled HTTP client.
+    """
+    from services.orchestrator.git_operation.github_ops import GithubOps
+    from services.orchestrator.git_operation.gitlab_ops import GitlabOps
+
+    assert GithubOps().http is GithubOps().http
+    assert GithubOps().http is not GitlabOps().http
+
+@pytest.mark.asyncio
+async def test_github_file_diffs_follow_link_pagination():
+    """
+    Test that PR file listing follows Link rel="next" and yields each page as it arrives.
+    """
+    import httpx
+    from services.orchestrator.git_operation.github_ops import GithubOps
+
+    ops = GithubOps()
+    next_url = "https://api.github.com/repos/owner/repo/pulls/1/files?per_page=100&page=2"
+    page_1 = httpx.Response(
+        200,
+        json=[{"filename": "a.py"}],
+        headers={"Link": f'<{next_url}>; rel="next"'},
+        request=httpx.Request("GET", "https://api.github.com/repos/owner/repo/pulls/1/files"),
+    )
+    page_2 = httpx.Response(200, json=[{"filename": "b.py"}], request=httpx.Request("GET", next_url))
+
+    with patch.object(ops.http, "request", AsyncMock(side_effect=[page_1, page_2])) as mock_request:
+        pages = [page async for page in ops.iter_pull_request_file_diffs("owner/repo", 1)]
+
+    assert pages == [[{"filename": "a.py"}], [{"filename": "b.py"}]]
+    assert mock_request.call_args_list[1].args[1] == next_url
+
+
+from services.orchestrator.git_operation.base_ops import BaseOps
+
+
+class FakeScm(BaseOps):
+    """In-memory SCM provider: files maps filename -> (patch, base content, head content)."""
+    def __init__(self, files, base_sha="base", head_sha="head", compare=None):
+        self.files = files
+        self.base_sha = base_sha
+        self.head_sha = head_sha
+        self.compare = compare or []
+
+    async def iter_pull_request_file_diffs(self, repo_id, pr_id):
+        yield [{"filename": name, "patch": patch, "status": "modified"} for name, (patch, _, _) in self.files.items()]
+
+    async def get_compare_file_diffs(self, repo_id, base_ref, head_ref):
+        return [{"filename": name} for name in self.compare]
+
+    async def get_pull_request(self, repo_id, pr_id):
+        return {"base": {"sha": self.base_sha}, "head": {"sha": self.head_sha}}
+
+    async def _fetch_file_content(self, repo_id, file_path, ref=None):
+        _, base, head = self.files[file_path]
+        return base if ref == self.base_sha else head
+
+
+async def run_pr_review(scm, payload, state=None, cancelled=False):
+    """Runs pr_review_workflow against a fake SCM with Redis/RabbitMQ mocked out."""
+    from services.orchestrator.workflows.manager import WorkflowManager
+
+    state = state or AsyncMock()
+    state.is_review_cancelled.return_value = cancelled
+    with patch.object(WorkflowManager, "get_scm", return_value=scm), \
+         patch("services.orchestrator.workflows.manager.state_manager", state), \
+         patch("services.orchestrator.workflows.pr_review_helpers.state_manager", state), \
+         patch("services.orchestrator.workflows.manager.queue_manager") as queue:
+        queue.enqueue = AsyncMock()
+        queue.enqueue_many = AsyncMock()
+        await WorkflowManager().pr_review_workflow(
+            {"review_request_id": "req-1", "provider": "github", "repo": "owner/repo", "pr_number": 1, **payload}
+        )
+    return state, queue
+
+
+@pytest.mark.asyncio
+async def test_incremental_review_only_chunks_files_touched_since_last_head():
+    """
+    Test that a synchronize re-review only chunks files changed since the last reviewed head.
+    """
+    files = {
+        "a.py": ("@@ -1,1 +1,2 @@\n x = 1\n+y = 2", "x = 1\n", "x = 1\ny = 2\n"),
+        "b.py": ("@@ -1,1 +1,2 @@\n x = 1\n+z = 3", "x = 1\n", "x = 1\nz = 3\n"),
+    }
+    state = AsyncMock()
+    state.get_last_reviewed_head.return_value = "previous-head"
+    state.get_chunk_fingerprints.return_value = {}
+
+    state, queue = await run_pr_review(FakeScm(files, compare=["a.py"]), {"incremental": True}, state)
+
+    saved = [chunk.filename for chunk in state.save_chunks.call_args.args[0]]
+    assert saved == ["a.py"]
+    state.set_last_reviewed_head.assert_called_once_with("github", "owner/repo", 1, "head")
+
+@pytest.mark.asyncio
+async def test_incremental_review_reuses_finished_chunks():
+    """
+    Test that hunks identical to already reviewed ones are not sent to the LLM again.
+    """
+    from services.orchestrator.models import ChunkStatus
+    from services.orchestrator.workflows.pr_review_helpers import _chunk_fingerprint
+
+    patch_text = "@@ -1,1 +1,2 @@\n x = 1\n+y = 2"
+    files = {"a.py": (patch_text, "x = 1\n", "x = 1\ny = 2\n")}
+    snippet = "@@ -1,1 +1,2 @@\n1:  x = 1\n2: +y = 2"
+    state = AsyncMock()
+    state.get_last_reviewed_head.return_value = "previous-head"
+    state.get_chunk_fingerprints.return_value = {
+        _chunk_fingerprint("a.py", snippet): {"chunk_id": "old-chunk", "filename": "a.py"}
+    }
+    state.get_chunk_statuses.return_value = {"old-chunk": ChunkStatus.POSTED}
+
+    state, queue = await run_pr_review(FakeScm(files, compare=["a.py"]), {"incremental": True}, state)
+
+    state.save_chunks.assert_called_once_with([])
+    assert queue.enqueue_many.await_args.args[1] == []
+
+@pytest.mark.asyncio
+async def test_incremental_review_skips_when_head_already_reviewed():
+    """
+    Test that an update event without new commits does not start a new review.
+    """
+    files = {"a.py": ("@@ -1,1 +1,2 @@\n x = 1\n+y = 2", "x = 1\n", "x = 1\ny = 2\n")}
+    state = AsyncMock()
+    state.get_last_reviewed_head.return_value = "head"
+    state.get_chunk_fingerprints.return_value = {}
+
+    state, queue = await run_pr_review(FakeScm(files), {"incremental": True}, state)
+
+    state.save_chunks.assert_not_called()
+    assert state.save_review_request.call_args.args[0].status == "COMPLETED"
+
+@pytest.mark.asyncio
+async def test_superseded_review_is_not_enqueued():
+    """
+    Test that a review cancelled by a newer push does not enqueue chunks or advance the reviewed head.
+    """
+    files = {"a.py": ("@@ -1,1 +1,2 @@\n x = 1\n+y = 2", "x = 1\n", "x = 1\ny = 2\n")}
+
+    state, queue = await run_pr_review(FakeScm(files), {}, cancelled=True)
+
+    queue.enqueue_many.assert_not_awaited()
+    state.set_last_reviewed_head.assert_not_called()
+    assert state.save_review_request.call_args.args[0].status == "CANCELLED"
+
+@pytest.mark.asyncio
+async def test_enqueue_many_declares_queue_once_and_publishes_in_batches():
+    """
+    Test that a bulk publish declares the queue once and publishes every payload.
+    """
+    from services.orchestrator.queue_manager import QueueManager
+
+    qm = QueueManager()
+    qm.channel = MagicMock()
+    qm.channel.is_closed = False
+    qm.channel.declare_queue = AsyncMock()
+    qm.channel.default_exchange.publish = AsyncMock()
+
+    with patch("services.orchestrator.queue_manager.settings.PUBLISH_BATCH_SIZE", 2):
+        await qm.enqueue_many("orchestrator_queue", [{"chunk_id": str(i)} for i in range(5)])
+        await qm.enqueue("orchestrator_queue", {"chunk_id": "5"})
+
+    qm.channel.declare_queue.assert_awaited_once_with("orchestrator_queue", durable=True)
+    bodies = [json.loads(c.args[0].body) for c in qm.channel.default_exchange.publish.await_args_list]
+    assert [b["chunk_id"] for b in bodies] == [str(i) for i in range(6)]
+
+@pytest.mark.asyncio
+async def test_save_chunks_uses_one_transaction_per_batch():
+    """
+    Test that bulk chunk persistence issues one MULTI/EXEC pipeline per batch.
+    """
+    from services.orchestrator.state import StateManager
+    from services.orchestrator.models import Chunk
+
+    manager = StateManager.__new__(StateManager)
+    manager.redis = MagicMock()
+    manager.redis.pipeline.return_value.execute = AsyncMock()
+    chunks = [Chunk(chunk_id=str(i), review_request_id="req-1", diff_snippet="+x") for i in range(3)]
+
+    with patch("services.orchestrator.state.settings.CHUNK_WRITE_BATCH_SIZE", 2):
+        await manager.save_chunks(chunks)
+
+    assert manager.redis.pipeline.call_count == 2
+    pipe = manager.redis.pipeline.return_value
+    assert pipe.execute.call_count == 2
+    pipe.sadd.assert_any_call("review_request_chunks:req-1", "0", "1")
+
+def test_semantic_filter_pool_ignores_comment_only_changes():
+    """
+    Test that the process-pool mode classifies changes like the inline parser does.
+    """
+    pytest.importorskip("tree_sitter_python")
+    from services.orchestrator.utils.semantic_filter import SemanticFilter
+
+    old = "def f(x):\n    return x + 1\n"
+    commented = "def f(x):\n    # add one\n    return x + 1\n"
+    changed = "def f(x):\n    return x + 2\n"
+
+    semantic_filter = SemanticFilter()
+    with patch("services.orchestrator.utils.semantic_filter.settings.SEMANTIC_FILTER_WORKERS", 1), \
+         patch("services.orchestrator.utils.semantic_filter.settings.SEMANTIC_FILTER_INLINE_MAX_CHARS", 0):
+        async def check():
+            return (
+                await semantic_filter.semantic_chunks_async(old, commented, "app.py", [((1, 2), (1, 3))]),
+                await semantic_filter.semantic_chunks_async(old, changed, "app.py", [((2, 2), (2, 2))]),
+            )
+        try:
+            assert asyncio.run(check()) == ([False], [True])
+            assert semantic_filter._pool is not None
+        finally:
+            semantic_filter.shutdown()
+
+def test_semantic_filter_drops_comment_only_chunks_of_a_changed_file():
+    """
+    Test that comment-only hunks are dropped while real changes in the same file are kept.
+    """
+    pytest.importorskip("tree_sitter_python")
+    from services.orchestrator.utils.hunk_processor import HunkProcessor
+    from services.orchestrator.utils.semantic_filter import SemanticFilter
+
+    old = "".join(f"v{i} = {i}\n" for i in range(1, 21))
+    new_lines = old.splitlines(keepends=True)
+    new_lines[2] = "v3 = 3  # explained\n"
+    new_lines[15] = "v16 = 160\n"
+    new = "".join(new_lines)
+    patch_text = (
+        "@@ -2,3 +2,3 @@\n v2 = 2\n-v3 = 3\n+v3 = 3  # explained\n v4 = 4\n"
+        "@@ -15,3 +15,3 @@\n v15 = 15\n-v16 = 16\n+v16 = 160\n v17 = 17"
+    )
+
+    hunks = list(HunkProcessor().chunk_patch("vals.py", patch_text))
+    assert [(h["old_range"], h["new_range"]) for h in hunks] == [((2, 4), (2, 4)), ((15, 17), (15, 17))]
+
+    keep = SemanticFilter().semantic_chunks(old, new, "vals.py", [(h["old_range"], h["new_range"]) for h in hunks])
+    assert keep == [False, True]
+
+def test_semantic_tokens_walk_is_iterative_and_stops_early():
+    """
+    Test that token iteration survives deeply nested code and can stop after the first tokens.
+    """
+    pytest.importorskip("tree_sitter_python")
+    from services.orchestrator.code_parser.tree_sitter_parser import UniversalParser
+
+    parser = UniversalParser()
+    deep = "x = " + "(" * 2000 + "1" + ")" * 2000 + "\n"
+    tokens = parser.iter_tree_tokens(*parser.parse(deep, "python"))
+    assert [next(tokens), next(tokens)] == [b"x", b"="]
+    assert sum(1 for _ in parser.iter_tree_tokens(*parser.parse(deep, "python"))) == 4003
+
+def test_incremental_reparse_matches_full_parse_and_rejects_stale_patches():
+    """
+    Test that applying the diff hunks as tree edits yields the same head tree as a full parse.
+    """
+    pytest.importorskip("tree_sitter_python")
+    from services.orchestrator.code_parser.tree_sitter_parser import UniversalParser
+    from services.orchestrator.utils.hunk_processor import HunkProcessor
+
+    parser = UniversalParser()
+    old = "".join(f"v{i} = {i}\n" for i in range(1, 21))
+    new = old.replace("v3 = 3\n", "v3 = 3\nw = [\n    1,\n]\n").replace("v16 = 16\n", "")
+    patch_text = (
+        "@@ -2,3 +2,6 @@\n v2 = 2\n v3 = 3\n+w = [\n+    1,\n+]\n v4 = 4\n"
+        "@@ -15,3 +18,2 @@\n v15 = 15\n-v16 = 16\n v17 = 17"
+    )
+    hunks = HunkProcessor().hunk_spans(patch_text)
+    old_tree, old_source = parser.parse(old, "python")
+
+    new_tree, new_source = parser.reparse_with_hunks(old_tree, old_source, new, "python", hunks)
+    assert str(new_tree.root_node) == str(parser.parse(new, "python")[0].root_node)
+    assert list(parser.iter_tree_tokens(new_tree, new_source)) == list(parser.iter_tree_tokens(*parser.parse(new, "python")))
+
+    # The base tree is left untouched
+    assert str(old_tree.root_node) == str(parser.parse(old, "python")[0].root_node)
+    # Hunks that do not produce the head are refused
+    assert parser.reparse_with_hunks(old_tree, old_source, new + "extra = 1\n", "python", hunks) is None
+
+def test_incremental_semantic_filter_on_a_large_file_with_several_hunks():
+    """
+    Test that a comment-only hunk far from a real change in a large file is dropped, call after call.
+    """
+    pytest.importorskip("tree_sitter_python")
+    from services.orchestrator.utils.hunk_processor import HunkProcessor
+    from services.orchestrator.utils.semantic_filter import SemanticFilter
+
+    old_lines = [f"def f{i}(a, b):\n    return a + {i} * b\n\n" for i in range(2000)]
+    new_lines = list(old_lines)
+    new_lines[300] = "def f300(a, b):\n    # scaled by the index\n    return a + 300 * b\n\n"
+    new_lines[1700] = "def f1700(a, b):\n    return a - 1700 * b\n\n"
+    old, new = "".join(old_lines), "".join(new_lines)
+    patch_text = "".join(difflib.unified_diff(old.splitlines(True), new.splitlines(True), n=3)).split("\n", 2)[2]
+
+    processor = HunkProcessor()
+    ranges = [(h["old_range"], h["new_range"]) for h in processor.chunk_patch("big.py", patch_text)]
+    spans = processor.hunk_spans(patch_text)
+    assert len(spans) == 2
+
+    semantic_filter = SemanticFilter()
+    for _ in range(20):
+        assert semantic_filter.semantic_chunks(old, new, "big.py", ranges, spans) == [False, True]
+
+@pytest.mark.asyncio
+async def test_mirror_backend_serves_pr_reads_from_a_local_clone(tmp_path):
+    """
+    Test that the bare-mirror backend resolves, diffs and reads a PR without any API call.
+    """
+    import shutil
+    import subprocess
+    if not shutil.which("git"):
+        pytest.skip("git is not installed")
+    from services.orchestrator.git_operation.mirror_ops import GithubMirrorOps
+
+    origin = tmp_path / "origin"
+    def git(*args):
+        return subprocess.run(["git", "-C", str(origin), *args], check=True, capture_output=True, text=True).stdout.strip()
+
+    origin.mkdir()
+    git("init", "-q", "-b", "main")
+    git("config", "user.email", "dev@example.com")
+    git("config", "user.name", "dev")
+    (origin / "app.py").write_text("def run():\n    return 1\n")
+    (origin / "old.py").write_text("x = 1\n")
+    git("add", ".")
+    git("commit", "-q", "-m", "base")
+    base = git("rev-parse", "HEAD")
+    git("checkout", "-q", "-b", "feature")
+    (origin / "app.py").write_text("def run():\n    return 2\n")
+    git("mv", "old.py", "new.py")
+    (origin / "logo.bin").write_bytes(b"\x00\x01")
+    git("add", ".")
+    git("commit", "-q", "-m", "change")
+    head = git("rev-parse", "HEAD")
+    git("update-ref", "refs/pull/7/head", head)
+    git("update-ref", "refs/pull/7/merge", git("commit-tree", f"{head}^{{tree}}", "-p", base, "-p", head, "-m", "merge"))
+
+    with patch.object(GithubMirrorOps, "clone_url", str(origin)), \
+         patch("services.orchestrator.git_operation.mirror_ops.settings.SCM_MIRROR_ROOT", str(tmp_path / "mirrors")), \
+         patch.object(GithubMirrorOps, "upstream_class", side_effect=AssertionError("API called")):
+        scm = GithubMirrorOps()
+        assert await scm.get_pull_request("owner/repo", 7) == {"base": {"sha": base}, "head": {"sha": head}}
+        # Concurrent callers share one resolution and its fetches
+        scm._resolved.clear()
+        with patch.object(scm, "_fetch", wraps=scm._fetch) as fetch:
+            resolved = await asyncio.gather(*(scm._resolve_pr("owner/repo", 7) for _ in range(3)))
+        assert resolved == [(base, head)] * 3 and fetch.await_count == 2
+        files = {f["filename"]: f async for page in scm.iter_pull_request_file_diffs("owner/repo", 7) for f in page}
+
+        assert files["app.py"]["status"] == "modified"
+        assert files["app.py"]["patch"] == "@@ -1,2 +1,2 @@\n def run():\n-    return 1\n+    return 2"
+        assert files["new.py"]["previous_filename"] == "old.py" and files["new.py"]["patch"] is None
+        assert files["logo.bin"]["status"] == "added" and files["logo.bin"]["patch"] is None
+
+        contents = await scm._fetch_file_contents("owner/repo", [("app.py", base), ("app.py", head), ("logo.bin", head), ("gone.py", head)])
+        assert contents == {
+            ("app.py", base): "def run():\n    return 1\n", ("app.py", head): "def run():\n    return 2\n",
+            ("logo.bin", head): None, ("gone.py", head): None
+        }
+        tree_sha, tree = await scm.list_tree("owner/repo", head)
+        assert tree_sha == git("rev-parse", f"{head}^{{tree}}")
+        assert {f["path"] for f in tree} == {"app.py", "new.py", "logo.bin"}
+
+@pytest.mark.asyncio
+async def test_mirror_fetch_keeps_token_off_the_command_line(tmp_path):
+    """
+    Test that fetch credentials go through GIT_CONFIG_* variables rather than argv,
+    and that fetches take the file lock shared by every process using the mirror.
+    """
+    from services.orchestrator.git_operation.mirror_ops import GithubMirrorOps
+
+    launched = []
+
+    async def fake_exec(*cmd, env=None, **kwargs):
+        launched.append((cmd, env))
+        process = MagicMock(returncode=0)
+        process.communicate = AsyncMock(return_value=(b"", b""))
+        return process
+
+    with patch.dict(os.environ, {"GITHUB_TOKEN": "s3cret"}), \
+         patch("services.orchestrator.git_operation.mirror_ops.settings.SCM_MIRROR_ROOT", str(tmp_path)), \
+         patch("asyncio.create_subprocess_exec", side_effect=fake_exec):
+        scm = GithubMirrorOps()
+        (tmp_path / "github" / "owner" / "repo.git").mkdir(parents=True)
+        await scm._fetch("owner/repo", "+refs/heads/*:refs/heads/*")
+
+    cmd, env = launched[-1]
+    assert "fetch" in cmd and not any("s3cret" in arg or "extraHeader" in arg for arg in cmd)
+    assert env["GIT_CONFIG_KEY_0"] == "http.extraHeader" and env["GIT_CONFIG_VALUE_0"].startswith("Authorization: Basic ")
+    assert (tmp_path / "github" / "owner" / "repo.git.lock").exists()
@@ -4,7 +4,8 @@ import json
 import pytest
 import os
 import sys
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Add the webhook service directory to sys.path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services", "webhook"))
@@ -17,10 +18,14 @@ os.environ["ORCHESTRATOR_QUEUE"] = "test_orchestrator_queue"
 
 # Mock queue_manager before it's imported by handlers
 mock_queue = MagicMock()
+mock_queue.enqueue = AsyncMock()
 # Since we added services/webhook to sys.path, queue_manager is imported as a top-level module
 with patch("queue_manager.queue_manager", mock_queue):
     from services.webhook.main import app
     from services.webhook.config import settings
+    import coalescer
+    from dedup import delivery_dedup
+    from coalescer import review_coalescer
 
 from fastapi.testclient import TestClient
 client = TestClient(app)
@@ -119,3 +124,140 @@ def test_github_webhook_ignored_action():
     
     assert response.status_code == 200
     assert response.json() == {"status": "success", "message": "Event received"}
+
+
+class FakeAsyncRedis:
+    """Minimal in-memory stand-in for the redis.asyncio calls made by the coalescer."""
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, ex=None, get=False, nx=False):
+        previous = self.data.get(key)
+        if nx and previous is not None:
+            return None
+        self.data[key] = value
+        return previous if get else True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def hincrby(self, key, field, amount):
+        counters = self.data.setdefault(key, {})
+        counters[field] = counters.get(field, 0) + amount
+
+    async def hgetall(self, key):
+        return self.data.get(key, {})
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def zadd(self, key, mapping, xx=False):
+        scores = self.data.setdefault(key, {})
+        scores.update({m: s for m, s in mapping.items() if not xx or m in scores})
+
+    async def zrangebyscore(self, key, low, high):
+        return [m for m, s in self.data.get(key, {}).items() if s <= high]
+
+    async def eval(self, script, numkeys, zset, pending_key, *args):
+        # In-memory versions of the coalescer's claim and complete scripts
+        scores = self.data.setdefault(zset, {})
+        pending = self.data.get(pending_key)
+        if script == coalescer._CLAIM_SCRIPT:
+            now, lease = args
+            if pending_key not in scores or scores[pending_key] > now:
+                return None
+            if not pending:
+                scores.pop(pending_key)
+                return None
+            scores[pending_key] = now + lease
+            return pending
+        if pending and json.loads(pending)["review_request_id"] != args[0]:
+            return 0
+        self.data.pop(pending_key, None)
+        scores.pop(pending_key, None)
+        return 1
+
+@pytest.mark.asyncio
+async def test_coalescer_collapses_bursts_and_supersedes_active_review():
+    """Test that rapid pushes enqueue one review of the latest event and cancel the previous review."""
+    fake_redis = FakeAsyncRedis()
+    mock_queue.enqueue.reset_mock()
+    task = {"provider": "github", "repo": "owner/repo", "pr_number": 1, "delivery_id": "d"}
+
+    with patch.object(review_coalescer, "redis", fake_redis), \
+         patch.object(coalescer.settings, "coalesce_window_seconds", 0.01), \
+         patch.object(coalescer.settings, "coalesce_sweep_seconds", 0.005):
+        await review_coalescer.submit({**task, "review_request_id": "r1", "incremental": False})
+        await review_coalescer.submit({**task, "review_request_id": "r2", "incremental": True})
+        await review_coalescer.submit({**task, "review_request_id": "r3", "incremental": True})
+        await asyncio.sleep(0.05)
+
+        mock_queue.enqueue.assert_awaited_once()
+        enqueued = mock_queue.enqueue.await_args.args[1]
+        assert enqueued["review_request_id"] == "r3"
+        # The burst started with 'opened', so the merged review stays a full one
+        assert enqueued["incremental"] is False
+
+        await review_coalescer.submit({**task, "review_request_id": "r4", "incremental": True})
+        await asyncio.sleep(0.05)
+
+    assert mock_queue.enqueue.await_count == 2
+    assert fake_redis.data["review_cancelled:r3"] == "r4"
+    await review_coalescer.drain()
+
+@pytest.mark.asyncio
+async def test_coalesced_review_survives_failed_enqueue_and_crashed_replica():
+    """
+    Test that a failed enqueue keeps the pending review, and that another replica
+    sweeping the shared deadlines enqueues it once the claim's lease runs out.
+    """
+    fake_redis = FakeAsyncRedis()
+    task = {"provider": "github", "repo": "owner/repo", "pr_number": 2, "delivery_id": "d", "review_request_id": "r1"}
+    crashed, survivor = coalescer.ReviewCoalescer(), coalescer.ReviewCoalescer()
+    crashed.redis = survivor.redis = fake_redis
+    broken_queue = MagicMock(enqueue=AsyncMock(side_effect=ConnectionError("broker down")))
+
+    with patch.object(coalescer.settings, "coalesce_window_seconds", 0.01), \
+         patch.object(coalescer.settings, "coalesce_flush_lease_seconds", 0.02), \
+         patch.object(crashed, "start"):
+        await crashed.submit(task)
+        await asyncio.sleep(0.02)
+        with patch.object(coalescer, "queue_manager", broken_queue):
+            await crashed.sweep()
+        broken_queue.enqueue.assert_awaited_once()
+        assert "pr_pending_review:github:owner/repo:2" in fake_redis.data
+
+        mock_queue.enqueue.reset_mock()
+        # Still leased by the replica that failed
+        await survivor.sweep()
+        mock_queue.enqueue.assert_not_awaited()
+        await asyncio.sleep(0.03)
+        await survivor.sweep()
+        await survivor.sweep()
+
+    mock_queue.enqueue.assert_awaited_once()
+    assert mock_queue.enqueue.await_args.args[1]["review_request_id"] == "r1"
+    assert "pr_pending_review:github:owner/repo:2" not in fake_redis.data
+    assert fake_redis.data[coalescer.PENDING_SET] == {}
+
+def test_github_redelivery_is_ignored():
+    """Test that a redelivered webhook is acknowledged without being processed again."""
+    payload = {"action": "labeled", "number": 1}
+    body = json.dumps(payload).encode("utf-8")
+    headers = {
+        "X-GitHub-Event": "pull_request",
+        "X-GitHub-Delivery": "redelivered-id",
+        "X-Hub-Signature-256": get_signature(body, settings.github_webhook_secret),
+        "Content-Type": "application/json"
+    }
+
+    with patch.object(delivery_dedup, "redis", FakeAsyncRedis()), \
+         patch("api.github_api.GitHubEventHandler.handle_event", new_callable=AsyncMock) as handle_event:
+        first = client.post("/webhook/github", content=body, headers=headers)
+        second = client.post("/webhook/github", content=body, headers=headers)
+        metrics = client.get("/metrics")
+
+    assert first.json()["message"] == "Event received"
+    assert second.json()["message"] == "Duplicate delivery ignored"
+    handle_event.assert_awaited_once()
+    assert metrics.json() == {"delivery_dedup": {"hits": 1, "misses": 1}}